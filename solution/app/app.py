@@ -5,14 +5,20 @@ from datetime import datetime
 from weasyprint import HTML
 
 # Импорты из utils
-from utils.database import get_db_session, login_required, _calculate_age
+from utils.database import get_db_session, init_db, login_required, read_only, _calculate_age
 from utils.consultation_helpers import prepare_consultation_data
 
 # Импорты моделей и контроллеров
-from models.database_models import Doctor, Consultation, Patient
+from models.database_models import Doctor, Consultation
+from repositories.consultation_repository import ConsultationRepository
 from controllers.patient_controller import patient_controller
 from services.auth_service import AuthService
+from services.patient_service import PatientService
 from controllers.consultation_controller import consultation_controller
+from controllers.metrics_controller import metrics_controller
+from controllers.knowledge_base_controller import knowledge_base_controller
+from services.knowledge_base_watcher import start_knowledge_base_watcher
+from utils.serving import is_prefork, preload
 
 # Конфигурация путей
 base_dir = os.path.dirname(os.path.abspath(__file__))
@@ -29,9 +35,14 @@ app.secret_key = os.getenv('SECRET_KEY')
 app.config['SESSION_TYPE'] = 'filesystem'
 app.config['DEBUG'] = os.getenv('DEBUG', 'False').lower() == 'true'
 
+# Движок БД с пулом соединений на процесс и сессия на запрос
+init_db(app)
+
 # Регистрируем контроллеры
 consultation_controller(app)
 patient_controller(app)
+metrics_controller(app)
+knowledge_base_controller(app)
 
 def _get_auth_service():
     """Вспомогательная функция для получения сервиса аутентификации"""
@@ -67,7 +78,6 @@ def api_register():
             return _json_response(False, 'Пароли не совпадают', status_code=400)
         
         doctor = auth_service.register_doctor(data)
-        db_session.close()
         
         return _json_response(True, 'Регистрация успешна', 
                             {'doctor': doctor.to_dict()}, 201)
@@ -85,7 +95,6 @@ def api_login():
         
         doctor = auth_service.login_doctor(data.get('email'), data.get('password'))
         _update_session(doctor)
-        db_session.close()
         
         return _json_response(True, 'Вход выполнен успешно', 
                             {'doctor': doctor.to_dict()})
@@ -111,7 +120,6 @@ def api_profile():
             session.clear()
             return _json_response(False, 'Пользователь не найден', status_code=404)
         
-        db_session.close()
         return _json_response(True, 'Профиль получен', {'doctor': doctor.to_dict()})
         
     except Exception as e:
@@ -178,7 +186,6 @@ def api_profile_update():
         
         db_session.commit()
         _update_session(doctor)
-        db_session.close()
         
         return _json_response(True, 'Профиль успешно обновлен', 
                             {'doctor': doctor.to_dict()})
@@ -217,7 +224,6 @@ def api_change_password():
         hashed_password = bcrypt.hashpw(new_password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
         doctor.password = hashed_password
         db_session.commit()
-        db_session.close()
         
         return _json_response(True, 'Пароль успешно изменен')
         
@@ -238,21 +244,22 @@ def patient_new():
 
 @app.route('/dashboard')
 @login_required
+@read_only
 def dashboard():
     try:
-        db_session = get_db_session()
-        patients = db_session.query(Patient).all()
+        # Три последних зарегистрированных пациента и итог без чтения всей таблицы
+        page = PatientService(get_db_session()).get_patients_page(sort='registered', limit=3)
+        patients = page.items
         
         # Добавляем возраст для отображения
         for patient in patients:
             patient.age = _calculate_age(patient.birthday) if patient.birthday else None
         
-        db_session.close()
-        return render_template('dashboard.html', patients=patients)
+        return render_template('dashboard.html', patients=patients, total=page.total)
         
     except Exception as e:
         print(f"Ошибка при загрузке dashboard: {str(e)}")
-        return render_template('dashboard.html', patients=[])
+        return render_template('dashboard.html', patients=[], total=None)
 
 @app.route('/consultation/<int:consultation_id>/export-pdf')
 @login_required
@@ -262,12 +269,12 @@ def export_consultation_pdf(consultation_id):
         consultation = db_session.query(Consultation).filter_by(id=consultation_id).first()
         
         if not consultation:
-            db_session.close()
             return "Консультация не найдена", 404
         
         patient = consultation.patient
         doctor = consultation.doctor
-        diagnosis_result = prepare_consultation_data(consultation)
+        answers = [answer.to_dict() for answer in ConsultationRepository(db_session).get_answers(consultation_id)]
+        diagnosis_result = prepare_consultation_data(consultation, answers)
         
         # Расчет возраста
         birth_date = patient.birthday
@@ -294,7 +301,6 @@ def export_consultation_pdf(consultation_id):
         response.headers['Content-Type'] = 'application/pdf'
         response.headers['Content-Disposition'] = f'attachment; filename=consultation_{consultation_id}_{datetime.now().strftime("%Y%m%d")}.pdf'
         
-        db_session.close()
         return response
         
     except Exception as e:
@@ -307,6 +313,14 @@ def export_consultation_pdf(consultation_id):
 def health():
     return "OK"
 
+# Отслеживание изменений базы знаний без перезапуска. В pre-fork режиме
+# мастер только загружает общие данные (после регистрации всех маршрутов),
+# наблюдение запускается в каждом воркере после fork (см. gunicorn.conf.py)
+if is_prefork():
+    preload(app)
+else:
+    start_knowledge_base_watcher()
+
 if __name__ == '__main__':
     debug_mode = app.config['DEBUG']
     app.run(host='0.0.0.0', port=8080, debug=debug_mode)
\ No newline at end of file
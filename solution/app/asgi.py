@@ -0,0 +1,45 @@
+"""ASGI-приложение: асинхронный JSON API консультаций и пациентов рядом с Flask
+
+Маршруты /api/consultation/* и /api/patients* обслуживаются асинхронно
+(Starlette, асинхронный движок SQLAlchemy), поэтому ожидание PostgreSQL не
+занимает поток. Остальное - HTML-страницы, авторизация, профиль, экспорт
+PDF - обслуживает прежнее приложение Flask, смонтированное в корень через
+a2wsgi (в пуле потоков). Сессия врача общая: API читает подписанную
+cookie сессии Flask.
+
+Запуск из каталога solution/app:
+    uvicorn asgi:app --host 0.0.0.0 --port 8080
+"""
+import asyncio
+from contextlib import asynccontextmanager
+
+from a2wsgi import WSGIMiddleware
+from starlette.applications import Starlette
+
+from app import app as flask_app
+from controllers.async_consultation_controller import async_consultation_controller
+from controllers.async_patient_controller import async_patient_controller
+from services.consultation_service import get_diagnosis_service
+from utils.asgi_helpers import init_asgi_helpers
+from utils.async_database import dispose_async_engine, get_async_engine
+
+@asynccontextmanager
+async def lifespan(app):
+    get_async_engine()
+    # База знаний и структуры консультаций готовятся до первого запроса, вне цикла событий
+    await asyncio.to_thread(lambda: get_diagnosis_service().prepare_consultations())
+    yield
+    await dispose_async_engine()
+
+def create_asgi_app(flask_app):
+    """Асинхронные маршруты API, все остальные запросы - в приложение Flask"""
+    init_asgi_helpers(flask_app)
+    app = Starlette(lifespan=lifespan)
+
+    # Маршруты проверяются по порядку: монтирование Flask в корень - последним
+    async_consultation_controller(app)
+    async_patient_controller(app)
+    app.mount('/', WSGIMiddleware(flask_app))
+    return app
+
+app = create_asgi_app(flask_app)
@@ -0,0 +1,125 @@
+"""Бенчмарк записи ответов: перезапись JSON консультации против журнала ответов
+
+Для двух консультаций по N ответов замеряет объем WAL (pg_current_wal_insert_lsn)
+и время записи каждого ответа:
+    json blob  - прежняя схема: вся история ответов внутри
+                 sub_graph_find_diagnosis, UPDATE всего JSON на каждый ответ;
+    answer log - вставка строки в consultation_answers и UPDATE небольшого
+                 состояния консультации (ConsultationRepository.append_answers).
+Реальные пути в базе знаний короткие, поэтому N задается отдельно, чтобы
+показать рост стоимости ответа с длиной консультации.
+
+Нужен PostgreSQL со схемой после миграций (лучше без посторонней нагрузки):
+    python benchmarks/bench_answer_log_wal.py --database-url postgresql://... [--answers 60]
+"""
+import argparse
+import os
+import sys
+import time
+from datetime import date, datetime
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+from models.database_models import Consultation, Doctor, Patient
+from repositories.consultation_repository import ConsultationRepository
+
+QUESTION = 'Есть ли перикорнеальная или смешанная инъекция конъюнктивы, вопрос {}?'
+
+def wal_position(db_session) -> str:
+    return db_session.execute(text('SELECT pg_current_wal_insert_lsn()')).scalar()
+
+def wal_bytes(db_session, start: str, end: str) -> int:
+    return int(db_session.execute(text('SELECT pg_wal_lsn_diff(:end, :start)'), {'start': start, 'end': end}).scalar())
+
+def state(seq: int) -> dict:
+    """Состояние консультации без истории ответов"""
+    path = ['yes' if step % 2 else 'no' for step in range(seq)]
+    return {
+        'current_path': path,
+        'current_node': seq,
+        'frontier': [[seq, 1, 1.0]],
+        'kb_hash': '0' * 64,
+        'current_question': QUESTION.format(seq + 1),
+        'answer_count': seq,
+        'started_at': datetime.utcnow().isoformat()
+    }
+
+def write_blob(db_session, consultation_id: int, seq: int, answers: dict):
+    """Прежняя запись: история ответов внутри JSON консультации"""
+    answers[f"q{seq}"] = {'question': QUESTION.format(seq), 'answer': 'yes', 'timestamp': datetime.utcnow().isoformat()}
+    diagnosis_data = dict(state(seq), answers=answers)
+    db_session.query(Consultation)\
+        .filter(Consultation.id == consultation_id)\
+        .update({Consultation.sub_graph_find_diagnosis: diagnosis_data}, synchronize_session=False)
+    db_session.commit()
+
+def write_log(db_session, consultation_id: int, seq: int, answers: dict):
+    """Новая запись: строка журнала и состояние без истории"""
+    ConsultationRepository(db_session).append_answers(consultation_id, [{
+        'seq': seq,
+        'node': seq,
+        'question': QUESTION.format(seq),
+        'answer': 'yes',
+        'ts': datetime.utcnow()
+    }], state(seq), expected_version=seq)
+
+def run(db_session, consultation_id: int, answers: int, write):
+    """WAL и время записи каждого ответа"""
+    history = {}
+    samples = []
+    for seq in range(1, answers + 1):
+        start = wal_position(db_session)
+        db_session.commit()
+        started = time.perf_counter()
+        write(db_session, consultation_id, seq, history)
+        elapsed = time.perf_counter() - started
+        samples.append((wal_bytes(db_session, start, wal_position(db_session)), elapsed))
+        db_session.commit()
+    return samples
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--database-url', default=os.getenv('DATABASE_URL'))
+    parser.add_argument('--answers', type=int, default=60)
+    args = parser.parse_args()
+    if not args.database_url or not args.database_url.startswith('postgresql'):
+        sys.exit('Нужен --database-url PostgreSQL (WAL есть только там)')
+
+    db_session = sessionmaker(autocommit=False, autoflush=False, bind=create_engine(args.database_url))()
+    doctor = Doctor(last_name='Бенчмарк', first_name='WAL', email=f'wal-{os.getpid()}-{time.time_ns()}@example.com', password='-')
+    patient = Patient(last_name='Бенчмарк', first_name='WAL', birthday=date(1980, 1, 1), sex='M')
+    db_session.add_all([doctor, patient])
+    db_session.flush()
+    consultations = [Consultation(doctor_id=doctor.id, patient_id=patient.id, status='active', sub_graph_find_diagnosis=state(0))
+                     for _ in range(2)]
+    db_session.add_all(consultations)
+    db_session.commit()
+    consultation_ids = [consultation.id for consultation in consultations]
+
+    try:
+        results = {
+            'json blob': run(db_session, consultation_ids[0], args.answers, write_blob),
+            'answer log': run(db_session, consultation_ids[1], args.answers, write_log)
+        }
+
+        checkpoints = sorted({n for n in (1, 10, args.answers // 2, args.answers) if 1 <= n <= args.answers})
+        header = ''.join(f"{'WAL B @' + str(n):>12}" for n in checkpoints)
+        print(f"{'mode':<12}{header}{'total WAL KiB':>15}{'avg ms':>9}{'p95 ms':>9}")
+        for name, samples in results.items():
+            wal = [bytes_written for bytes_written, _ in samples]
+            latencies = sorted(elapsed for _, elapsed in samples)
+            row = ''.join(f"{wal[n - 1]:>12}" for n in checkpoints)
+            print(f"{name:<12}{row}{sum(wal) / 1024:>15.1f}"
+                  f"{sum(latencies) / len(latencies) * 1000:>9.2f}{latencies[int(len(latencies) * 0.95) - 1] * 1000:>9.2f}")
+    finally:
+        db_session.rollback()
+        for consultation_id in consultation_ids:
+            db_session.query(Consultation).filter(Consultation.id == consultation_id).delete()
+        db_session.delete(doctor)
+        db_session.delete(patient)
+        db_session.commit()
+
+if __name__ == '__main__':
+    main()
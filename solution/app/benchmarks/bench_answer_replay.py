@@ -0,0 +1,77 @@
+"""Повтор последовательности ответов: по одному запросу против пакета
+
+Берет самый длинный путь базы знаний (до --answers ответов) и вводит его
+в новую консультацию тремя способами, считая SQL-запросы, коммиты и время:
+    per answer, cold   - save_consultation_answer на каждый ответ, кэш
+                         состояния пуст (как при запросах на разные воркеры);
+    per answer, cached - то же с заполненным кэшем;
+    batch replay       - один вызов replay_answers (/answers:batch).
+Путь повторяется по кругу, если он короче --answers (через новые консультации).
+
+Запуск из каталога solution/app (по умолчанию SQLite в памяти):
+    python benchmarks/bench_answer_replay.py [--answers 20] [--database-url postgresql://...]
+"""
+import argparse
+import os
+import sys
+import time
+
+from sqlalchemy import event
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+from check_save_answer_queries import QueryCounter, create_consultation, create_session
+from models.compiled_graph import unpack_path
+from services.consultation_service import ConsultationService, get_consultation_state_cache
+
+def longest_path(service: ConsultationService):
+    """Самый длинный путь от корня до диагноза"""
+    _, packed = max(service.diagnosis_service.graph.iter_diagnoses(), key=lambda item: item[1].bit_length())
+    return unpack_path(packed)
+
+def per_answer(cached: bool):
+    def method(db_session, consultation_id, chunk):
+        for answer in chunk:
+            if not cached:
+                get_consultation_state_cache().clear()
+            ConsultationService(db_session).save_consultation_answer(consultation_id, answer)
+    return method
+
+def batch_replay(db_session, consultation_id, chunk):
+    ConsultationService(db_session).replay_answers(consultation_id, chunk)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--answers', type=int, default=20)
+    parser.add_argument('--database-url', default='sqlite://')
+    args = parser.parse_args()
+
+    engine, db_session = create_session(args.database_url)
+    path = longest_path(ConsultationService(db_session))
+    counter = QueryCounter(engine)
+    commits = []
+    event.listen(engine, 'commit', lambda conn: commits.append(1))
+    print(f"{args.answers} answers, longest path {len(path)} answers")
+
+    print(f"{'method':<22}{'queries':>9}{'commits':>9}{'ms':>10}")
+    for name, method in (('per answer, cold', per_answer(False)),
+                         ('per answer, cached', per_answer(True)),
+                         ('batch replay', batch_replay)):
+        measured_queries = measured_commits = 0
+        elapsed = 0.0
+        done = 0
+        while done < args.answers:
+            chunk = path[:args.answers - done]
+            consultation_id = create_consultation(db_session)
+            db_session.expunge_all()
+            counter.reset()
+            commits.clear()
+            started = time.perf_counter()
+            method(db_session, consultation_id, chunk)
+            elapsed += time.perf_counter() - started
+            measured_queries += len(counter.statements)
+            measured_commits += len(commits)
+            done += len(chunk)
+        print(f"{name:<22}{measured_queries:>9}{measured_commits:>9}{elapsed * 1000:>10.1f}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,146 @@
+"""Нагрузка на /api/consultation/save-answer: Flask (WSGI) против API на ASGI
+
+20, 100 и 500 врачей одновременно отвечают на вопросы своих консультаций:
+каждый врач отправляет следующий ответ сразу после получения предыдущего,
+поэтому число запросов в работе равно числу врачей. Ответы идут по самому
+длинному пути базы знаний; дойдя до диагноза, врач переходит к следующей
+заранее созданной консультации. Для каждого уровня и числа врачей
+создаются свои врачи, пациенты и консультации, сессии врачей подписываются
+SECRET_KEY серверов (как после входа).
+
+Серверы запускаются отдельно на одной БД и с одним SECRET_KEY, например:
+    python app.py                                   # Flask, порт 8080
+    uvicorn asgi:app --port 8082                    # Flask + асинхронный API
+
+Нужен PostgreSQL со схемой после миграций и httpx:
+    python benchmarks/bench_async_save_answer.py --database-url postgresql://... --secret-key ... \\
+        --flask-url http://localhost:8080 --asgi-url http://localhost:8082 [--doctors 20 100 500] [--requests 20]
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import sys
+import time
+from datetime import date
+
+import httpx
+from flask import Flask
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+from models.compiled_graph import unpack_path
+from models.database_models import Consultation, Doctor, Patient
+from services.consultation_service import ConsultationService
+
+def create_consultations(Session, doctors: int, per_doctor: int, tag: str):
+    """Врачи с пациентом и per_doctor активными консультациями: [(doctor_id, [consultation_id])]"""
+    db_session = Session()
+    try:
+        service = ConsultationService(db_session)
+        initial = service._create_initial_diagnosis_data(service.diagnosis_service.get_initial_question())
+
+        stamp = f"{tag}-{os.getpid()}-{time.time_ns()}"
+        doctor_rows = [Doctor(last_name='Нагрузка', first_name='Тест', email=f'load-{stamp}-{index}@example.com', password='-')
+                       for index in range(doctors)]
+        patient_rows = [Patient(last_name='Нагрузка', first_name='Тест', birthday=date(1980, 1, 1), sex='M')
+                        for _ in range(doctors)]
+        db_session.add_all(doctor_rows + patient_rows)
+        db_session.flush()
+
+        consultation_rows = [[Consultation(patient_id=patient.id, doctor_id=doctor.id, status='active',
+                                           sub_graph_find_diagnosis=json.loads(json.dumps(initial)))
+                              for _ in range(per_doctor)]
+                             for doctor, patient in zip(doctor_rows, patient_rows)]
+        db_session.add_all([row for rows in consultation_rows for row in rows])
+        db_session.commit()
+        return [(doctor.id, [row.id for row in rows]) for doctor, rows in zip(doctor_rows, consultation_rows)]
+    finally:
+        db_session.close()
+
+async def doctor_loop(client, base_url: str, cookie: str, consultation_ids, path, requests: int, latencies, errors):
+    cookies = {'session': cookie}
+    consultation_iter = iter(consultation_ids)
+    consultation_id = next(consultation_iter)
+    step = 0
+    for _ in range(requests):
+        if step == len(path):
+            consultation_id, step = next(consultation_iter), 0
+        started = time.perf_counter()
+        try:
+            response = await client.post(f'{base_url}/api/consultation/save-answer', cookies=cookies,
+                                         json={'consultation_id': consultation_id, 'answer': path[step]})
+            latencies.append(time.perf_counter() - started)
+            if response.status_code != 200:
+                errors.append(response.status_code)
+        except httpx.HTTPError as e:
+            latencies.append(time.perf_counter() - started)
+            errors.append(type(e).__name__)
+        step += 1
+
+async def run(base_url: str, doctors, sign, path, requests: int):
+    latencies, errors = [], []
+    limits = httpx.Limits(max_connections=len(doctors), max_keepalive_connections=len(doctors))
+    async with httpx.AsyncClient(limits=limits, timeout=60) as client:
+        started = time.perf_counter()
+        await asyncio.gather(*(
+            doctor_loop(client, base_url, sign(doctor_id), consultation_ids, path, requests, latencies, errors)
+            for doctor_id, consultation_ids in doctors
+        ))
+        elapsed = time.perf_counter() - started
+    return elapsed, sorted(latencies), errors
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--database-url', default=os.getenv('DATABASE_URL'))
+    parser.add_argument('--secret-key', default=os.getenv('SECRET_KEY'))
+    parser.add_argument('--flask-url', required=True)
+    parser.add_argument('--asgi-url', required=True)
+    parser.add_argument('--doctors', type=int, nargs='+', default=[20, 100, 500])
+    parser.add_argument('--requests', type=int, default=20, help='ответов на врача')
+    args = parser.parse_args()
+    if not args.database_url or not args.database_url.startswith('postgresql'):
+        sys.exit('Нужен --database-url PostgreSQL')
+    if not args.secret_key:
+        sys.exit('Нужен --secret-key (SECRET_KEY серверов)')
+
+    engine = create_engine(args.database_url)
+    Session = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+    # Подпись cookie той же сериализацией, что у сессии Flask
+    signer = Flask(__name__)
+    signer.secret_key = args.secret_key
+    serializer = signer.session_interface.get_signing_serializer(signer)
+    sign = lambda doctor_id: serializer.dumps({'logged_in': True, 'doctor_id': doctor_id})
+
+    db_session = Session()
+    snapshot = ConsultationService(db_session).diagnosis_service
+    db_session.close()
+    _, packed = max(snapshot.graph.iter_diagnoses(), key=lambda item: item[1].bit_length())
+    path = unpack_path(packed)
+    per_doctor = math.ceil(args.requests / len(path))
+
+    print(f"path {len(path)} answers, {args.requests} answers per doctor")
+    print(f"{'tier':<7}{'doctors':>9}{'requests':>10}{'errors':>8}{'rps':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}")
+    try:
+        for count in args.doctors:
+            for tier, base_url in (('flask', args.flask_url), ('asgi', args.asgi_url)):
+                # Прогрев на отдельных консультациях: соединения пулов и база знаний в воркерах
+                warmup = create_consultations(Session, min(count, 10), 1, f'{tier}-warmup')
+                asyncio.run(run(base_url, warmup, sign, path, len(path)))
+                doctors = create_consultations(Session, count, per_doctor, tier)
+                elapsed, latencies, errors = asyncio.run(run(base_url, doctors, sign, path, args.requests))
+                latencies = latencies or [0.0]
+                print(f"{tier:<7}{count:>9}{len(latencies):>10}{len(errors):>8}{len(latencies) / elapsed:>9.1f}"
+                      f"{latencies[len(latencies) // 2] * 1000:>9.2f}"
+                      f"{latencies[int(len(latencies) * 0.95) - 1] * 1000:>9.2f}"
+                      f"{latencies[int(len(latencies) * 0.99) - 1] * 1000:>9.2f}")
+                if errors:
+                    print(f"        error statuses: {sorted(set(map(str, errors)))}")
+    finally:
+        engine.dispose()
+
+if __name__ == '__main__':
+    main()
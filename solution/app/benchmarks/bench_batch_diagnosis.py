@@ -0,0 +1,92 @@
+"""Бенчмарк пакетного прогона ответов: NumPy против пошагового цикла
+
+Генерирует N случайных путей от корня до листа по реальной базе знаний
+и прогоняет их через BatchDiagnoser (матрица ответов и упакованные пути)
+и через DiagnosisService.get_next_question по одному шагу. Пошаговый
+цикл замеряется на выборке и пересчитывается на N строк.
+
+Запуск из каталога solution/app:
+    python benchmarks/bench_batch_diagnosis.py [--rows 1000000] [--loop-sample 20000]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+from models.compiled_graph import pack_path
+from services.batch_diagnosis import paths_to_matrix
+from services.diagnosis_service import DiagnosisService
+
+DATA_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'statistics', 'data.json')
+
+def random_paths(service: DiagnosisService, count: int, seed: int = 42):
+    """Случайные пути от корня до листа"""
+    graph = service.graph
+    rng = random.Random(seed)
+    paths = []
+    for _ in range(count):
+        node_id, path = graph.root, []
+        while not graph.is_final(node_id):
+            answer = 'yes' if rng.random() < 0.5 else 'no'
+            path.append(answer)
+            node_id = graph.child(node_id, answer)
+        paths.append(path)
+    return paths
+
+def step_loop(service: DiagnosisService, paths):
+    """Пошаговый прогон через get_next_question, как при консультации"""
+    diagnoses = []
+    for path in paths:
+        question = service.get_initial_question()
+        for step in range(len(path)):
+            question = service.get_next_question(path[:step], path[step])
+        diagnoses.append(question['text'] if question and question['is_final'] else None)
+    return diagnoses
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=1000000)
+    parser.add_argument('--loop-sample', type=int, default=20000)
+    parser.add_argument('--data', default=DATA_PATH)
+    args = parser.parse_args()
+
+    service = DiagnosisService(args.data)
+    batch = service.batch
+
+    # Уникальных путей к листьям немного: берем выборку и тиражируем индексами
+    sample = random_paths(service, min(args.rows, 50000))
+    rows = np.random.default_rng(42).integers(0, len(sample), args.rows)
+    matrix = paths_to_matrix(sample)[rows]
+    packed = np.array([pack_path(path) for path in sample], dtype=np.int64)[rows]
+    print(f"{args.rows} rows, matrix {matrix.shape[0]}x{matrix.shape[1]}, graph {len(service.graph)} nodes")
+
+    started = time.perf_counter()
+    matrix_result = batch.run_matrix(matrix)
+    matrix_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    packed_result = batch.run_packed(packed)
+    packed_seconds = time.perf_counter() - started
+
+    loop_paths = [sample[row] for row in rows[:args.loop_sample]]
+    started = time.perf_counter()
+    loop_diagnoses = step_loop(service, loop_paths)
+    loop_seconds = (time.perf_counter() - started) * args.rows / len(loop_paths)
+
+    assert matrix_result.is_final.all() and packed_result.is_final.all()
+    assert (matrix_result.node_ids == packed_result.node_ids).all()
+    assert list(matrix_result.diagnoses[:len(loop_paths)]) == loop_diagnoses
+
+    print(f"{'method':<28}{'seconds':>10}{'rows/s':>14}")
+    for name, seconds in (('numpy answer matrix', matrix_seconds),
+                          ('numpy packed paths', packed_seconds),
+                          (f'step loop (from {len(loop_paths)})', loop_seconds)):
+        print(f"{name:<28}{seconds:>10.3f}{args.rows / seconds:>14,.0f}")
+    print(f"speedup: {loop_seconds / matrix_seconds:.0f}x (matrix), {loop_seconds / packed_seconds:.0f}x (packed)")
+
+if __name__ == '__main__':
+    main()
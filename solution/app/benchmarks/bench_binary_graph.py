@@ -0,0 +1,120 @@
+"""Бенчмарк загрузки базы знаний: data.json против mmap файла .okg
+
+Генерирует синтетическое полное бинарное дерево (~1M узлов), сохраняет
+его в обоих форматах и замеряет время загрузки и прирост памяти процесса.
+Каждый вариант запускается в отдельном процессе.
+
+Запуск из каталога solution/app:
+    python benchmarks/bench_binary_graph.py [--depth 19] [--workdir /tmp]
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import resource
+import sys
+import time
+from array import array
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+from models.binary_graph import load_binary_graph, write_binary_graph
+from models.compiled_graph import CompiledGraph, NO_NODE
+
+def build_synthetic_graph(depth: int) -> CompiledGraph:
+    """Полное бинарное дерево заданной глубины в порядке обхода в глубину"""
+    questions = [f"Синтетический вопрос №{i}?" for i in range(5000)]
+    diagnoses = [f"Синтетический диагноз №{i}" for i in range(500)]
+    texts = questions + diagnoses
+    yes, no, text_index = array('i'), array('i'), array('i')
+    rng = random.Random(42)
+
+    stack = [(NO_NODE, None, 0)]
+    while stack:
+        parent_id, answer, level = stack.pop()
+        node_id = len(yes)
+        yes.append(NO_NODE)
+        no.append(NO_NODE)
+        if level == depth:
+            text_index.append(len(questions) + rng.randrange(len(diagnoses)))
+        else:
+            text_index.append(rng.randrange(len(questions)))
+            stack.append((node_id, 'no', level + 1))
+            stack.append((node_id, 'yes', level + 1))
+        if parent_id != NO_NODE:
+            (yes if answer == 'yes' else no)[parent_id] = node_id
+    return CompiledGraph(yes, no, text_index, texts, preallocate_views=False)
+
+def write_json(graph: CompiledGraph, path: str):
+    """Потоковая запись графа во вложенный JSON формата data.json"""
+    with open(path, 'w', encoding='utf-8') as f:
+        stack = [('node', graph.root)]
+        while stack:
+            kind, value = stack.pop()
+            if kind == 'raw':
+                f.write(value)
+                continue
+            f.write('{"text":' + json.dumps(graph.text(value), ensure_ascii=False))
+            stack.append(('raw', '}'))
+            # Стек обратный: 'no' кладем первым, чтобы 'yes' было записано раньше
+            for answer in ('no', 'yes'):
+                child_id = graph.child(value, answer)
+                if child_id == NO_NODE:
+                    stack.append(('raw', f',"{answer}":null'))
+                else:
+                    stack.append(('node', child_id))
+                    stack.append(('raw', f',"{answer}":'))
+
+def _measure(loader_name: str, path: str, queue):
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    started = time.perf_counter()
+    if loader_name == 'json':
+        with open(path, 'r', encoding='utf-8') as f:
+            graph = CompiledGraph.from_dict(json.load(f))
+    else:
+        graph = load_binary_graph(path)
+    loaded = time.perf_counter() - started
+
+    # Первые запросы после загрузки: 1000 случайных путей от корня до листа
+    rng = random.Random(7)
+    started = time.perf_counter()
+    for _ in range(1000):
+        node_id = graph.root
+        while not graph.is_final(node_id):
+            node_id = graph.child(node_id, rng.choice(('yes', 'no')))
+        graph.text(node_id)
+    walks = time.perf_counter() - started
+
+    rss_after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    queue.put((loaded, walks, (rss_after - rss_before) / 1024, len(graph)))
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--depth', type=int, default=19, help="Глубина дерева (19 -> ~1M узлов)")
+    parser.add_argument('--workdir', default='/tmp')
+    args = parser.parse_args()
+
+    json_path = os.path.join(args.workdir, 'synthetic_graph.json')
+    binary_path = os.path.join(args.workdir, 'synthetic_graph.okg')
+    graph = build_synthetic_graph(args.depth)
+    write_json(graph, json_path)
+    write_binary_graph(graph, binary_path)
+    print(f"nodes: {len(graph)}, data.json: {os.path.getsize(json_path) / 2**20:.1f} MiB, "
+          f".okg: {os.path.getsize(binary_path) / 2**20:.1f} MiB")
+    del graph
+
+    context = multiprocessing.get_context('spawn')
+    for name, path in (('json', json_path), ('mmap', binary_path)):
+        queue = context.Queue()
+        process = context.Process(target=_measure, args=(name, path, queue))
+        process.start()
+        loaded, walks, rss_mib, nodes = queue.get()
+        process.join()
+        print(f"{name:<5} load {loaded * 1000:9.1f} ms   1000 walks {walks * 1000:7.1f} ms   "
+              f"+RSS {rss_mib:7.1f} MiB   nodes {nodes}")
+
+    os.remove(json_path)
+    os.remove(binary_path)
+
+if __name__ == '__main__':
+    main()
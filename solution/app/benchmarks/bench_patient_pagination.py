@@ -0,0 +1,170 @@
+"""Бенчмарк списка пациентов: полная выборка и OFFSET против страниц по ключу
+
+Заполняет таблицу patients синтетическими пациентами (по умолчанию 1 000 000)
+и замеряет запросы списка:
+    all + age       - прежний /patients и dashboard: все строки в ORM и возраст;
+    keyset first    - первая страница PatientService.get_patients_page;
+    keyset deep     - страница по курсору строки на глубине --depth;
+    offset deep     - та же страница через ORDER BY ... OFFSET;
+    count exact     - COUNT(*) по таблице (промах кэша итога);
+    count estimate  - reltuples из pg_class (только PostgreSQL).
+Порядки name (last_name, first_name, id) и registered (registered_at, id)
+читаются по индексам миграции 004.
+
+Нужна отдельная база со схемой после миграций; для SQLite схема создается сама.
+Пациенты бенчмарка помечаются в notes и удаляются после замеров:
+    python benchmarks/bench_patient_pagination.py --database-url postgresql://... [--rows 1000000]
+    python benchmarks/bench_patient_pagination.py --database-url sqlite:////tmp/patients.db --rows 100000
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import create_engine, func, select, text
+from sqlalchemy.orm import sessionmaker
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+from models.database_models import Base, Patient
+from repositories.patient_queries import PATIENT_ORDERINGS
+from services.patient_service import PatientService
+from utils.database import _calculate_age
+from utils.pagination import encode_cursor
+
+TAG = 'bench-pagination'
+BATCH_SIZE = 10000
+PAGE_SIZE = 50
+
+LAST_NAMES = ['Иванов', 'Смирнов', 'Кузнецов', 'Попов', 'Васильев', 'Петров', 'Соколов', 'Михайлов',
+              'Новиков', 'Федоров', 'Морозов', 'Волков', 'Алексеев', 'Лебедев', 'Семенов', 'Егоров',
+              'Павлов', 'Козлов', 'Степанов', 'Николаев', 'Орлов', 'Андреев', 'Макаров', 'Никитин',
+              'Захаров', 'Зайцев', 'Соловьев', 'Борисов', 'Яковлев', 'Григорьев', 'Романов', 'Воробьев']
+FIRST_NAMES = ['Александр', 'Дмитрий', 'Максим', 'Сергей', 'Андрей', 'Алексей', 'Иван', 'Михаил',
+               'Анна', 'Мария', 'Елена', 'Ольга', 'Наталья', 'Татьяна', 'Ирина', 'Светлана']
+REGISTERED_FROM = datetime(2015, 1, 1)
+
+def fill_postgresql(db_session, rows: int, first: int = 1):
+    """Пациенты с номерами first..rows одним INSERT ... SELECT из generate_series"""
+    db_session.execute(text("""
+        INSERT INTO patients (last_name, first_name, birthday, sex, phone, notes, registered_at, version)
+        SELECT (CAST(:last_names AS varchar[]))[1 + (i * 7919) % :last_count],
+               (CAST(:first_names AS varchar[]))[1 + (i * 104729) % :first_count],
+               DATE '1940-01-01' + (i * 37) % 29000,
+               CASE WHEN i % 2 = 0 THEN 'M' ELSE 'F' END,
+               '+7 9' || lpad(i::text, 9, '0'),
+               :tag,
+               :registered_from + i * INTERVAL '5 minutes',
+               1
+        FROM generate_series(:first, :rows) AS i
+    """), {'last_names': LAST_NAMES, 'first_names': FIRST_NAMES, 'last_count': len(LAST_NAMES),
+           'first_count': len(FIRST_NAMES), 'tag': TAG, 'registered_from': REGISTERED_FROM,
+           'first': first, 'rows': rows})
+    db_session.commit()
+    db_session.execute(text('ANALYZE patients'))
+    db_session.commit()
+
+def fill_batches(db_session, rows: int, first: int = 1):
+    """Пациенты с номерами first..rows порциями executemany (SQLite и другие БД без generate_series)"""
+    for start in range(first, rows + 1, BATCH_SIZE):
+        db_session.execute(Patient.__table__.insert(), [{
+            'last_name': LAST_NAMES[i * 7919 % len(LAST_NAMES)],
+            'first_name': FIRST_NAMES[i * 104729 % len(FIRST_NAMES)],
+            'birthday': date(1940, 1, 1) + timedelta(days=i * 37 % 29000),
+            'sex': 'M' if i % 2 == 0 else 'F',
+            'phone': f'+7 9{i:09d}',
+            'notes': TAG,
+            'registered_at': REGISTERED_FROM + timedelta(minutes=5 * i),
+            'version': 1
+        } for i in range(start, min(start + BATCH_SIZE, rows + 1))])
+        db_session.commit()
+
+def measure(func_, repeat: int):
+    """Задержки вызова в миллисекундах"""
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func_()
+        samples.append((time.perf_counter() - started) * 1000)
+    return samples
+
+def deep_cursor(db_session, sort: str, depth: int) -> str:
+    """Курсор страницы, начинающейся на глубине depth"""
+    columns, descending = PATIENT_ORDERINGS[sort]
+    row = db_session.execute(
+        select(*columns)
+        .order_by(*[column.desc() if descending else column.asc() for column in columns])
+        .offset(depth - 1).limit(1)
+    ).one()
+    return encode_cursor(sort, row)
+
+def offset_page(db_session, sort: str, depth: int):
+    columns, descending = PATIENT_ORDERINGS[sort]
+    return db_session.scalars(
+        select(Patient)
+        .order_by(*[column.desc() if descending else column.asc() for column in columns])
+        .offset(depth).limit(PAGE_SIZE)
+    ).all()
+
+def load_all(db_session):
+    """Прежний список: все пациенты и возраст каждого"""
+    patients = db_session.query(Patient).all()
+    for patient in patients:
+        patient.age = _calculate_age(patient.birthday) if patient.birthday else None
+    db_session.expunge_all()
+    return patients
+
+def report(name: str, samples: list):
+    samples = sorted(samples)
+    print(f"{name:<28}{statistics.median(samples):>10.2f}{samples[int(len(samples) * 0.95) - 1 if len(samples) > 1 else 0]:>10.2f}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--database-url', default=os.getenv('DATABASE_URL'))
+    parser.add_argument('--rows', type=int, default=1000000)
+    parser.add_argument('--depth', type=int, default=None, help='глубина страницы (по умолчанию 90%% строк)')
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--skip-all', action='store_true', help='не замерять полную выборку (память на --rows объектов)')
+    args = parser.parse_args()
+    if not args.database_url:
+        sys.exit('Нужен --database-url')
+
+    engine = create_engine(args.database_url)
+    if engine.dialect.name == 'sqlite':
+        Base.metadata.create_all(engine)
+    db_session = sessionmaker(autocommit=False, autoflush=False, bind=engine)()
+    postgresql = engine.dialect.name == 'postgresql'
+    depth = args.depth or args.rows * 9 // 10
+
+    started = time.perf_counter()
+    (fill_postgresql if postgresql else fill_batches)(db_session, args.rows)
+    print(f"Inserted {args.rows} patients in {time.perf_counter() - started:.1f}s ({engine.dialect.name})")
+
+    try:
+        patient_service = PatientService(db_session)
+        print(f"{'query':<28}{'p50 ms':>10}{'p95 ms':>10}")
+        if not args.skip_all:
+            report('all + age', measure(lambda: load_all(db_session), max(1, args.repeat // 10)))
+
+        for sort in PATIENT_ORDERINGS:
+            cursor = deep_cursor(db_session, sort, depth)
+            report(f'{sort} keyset first', measure(
+                lambda: patient_service.get_patients_page(sort=sort, limit=PAGE_SIZE, with_total=False), args.repeat))
+            report(f'{sort} keyset @{depth}', measure(
+                lambda: patient_service.get_patients_page(sort=sort, after=cursor, limit=PAGE_SIZE, with_total=False),
+                args.repeat))
+            report(f'{sort} offset @{depth}', measure(lambda: offset_page(db_session, sort, depth), args.repeat))
+            db_session.expunge_all()
+
+        report('count exact', measure(lambda: db_session.scalar(select(func.count()).select_from(Patient)), args.repeat))
+        if postgresql:
+            report('count estimate', measure(lambda: patient_service.patient_repository.estimate_patient_count(), args.repeat))
+            print(f"Page total: {patient_service.get_patients_page(limit=PAGE_SIZE).total}")
+    finally:
+        db_session.rollback()
+        db_session.execute(Patient.__table__.delete().where(Patient.notes == TAG))
+        db_session.commit()
+
+if __name__ == '__main__':
+    main()
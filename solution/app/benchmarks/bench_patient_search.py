@@ -0,0 +1,108 @@
+"""Бенчмарк поиска пациентов: ILIKE по пяти столбцам против индексированного поиска
+
+Заполняет таблицу patients синтетическими пациентами до каждого размера из
+--sizes (по умолчанию 100 000 и 1 000 000) и замеряет запросы:
+    ilike scan  - прежний search_patients: ILIKE '%term%' по ФИО, телефону
+                  и email без ограничения выдачи;
+    search      - PatientService.search_patients: pg_trgm (миграция 005) или
+                  n-граммный индекс процесса, ранжирование и limit;
+    typeahead   - PatientService.typeahead_patients по началу ФИО;
+    index ...   - тот же поиск напрямую по PatientSearchIndex (без БД) и
+                  время его построения.
+Запросы - подстрока, фамилия с опечаткой, цифры телефона и кириллические
+префиксы разной длины.
+
+Нужна отдельная база со схемой после миграций; для SQLite схема создается сама.
+Пациенты бенчмарка удаляются после замеров:
+    python benchmarks/bench_patient_search.py --database-url postgresql://... [--sizes 100000,1000000]
+    python benchmarks/bench_patient_search.py --database-url sqlite:////tmp/patients.db --sizes 100000
+"""
+import argparse
+import os
+import sys
+import time
+
+from sqlalchemy import create_engine, or_
+from sqlalchemy.orm import sessionmaker
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+from bench_patient_pagination import TAG, fill_batches, fill_postgresql, measure, report
+from models.database_models import Base, Patient
+from services.patient_search_index import PatientSearchIndex
+from services.patient_service import PatientService
+
+SEARCH_TERMS = ['Кузнецов', 'ванов', 'Смирнав', '9000123']
+TYPEAHEAD_TERMS = ['И', 'Сми', 'Кузнецов Ан']
+
+def ilike_scan(db_session, term: str):
+    """Прежний поиск: все совпадения подстроки по пяти столбцам"""
+    pattern = f"%{term}%"
+    return db_session.query(Patient).filter(or_(
+        Patient.last_name.ilike(pattern),
+        Patient.first_name.ilike(pattern),
+        Patient.middle_name.ilike(pattern),
+        Patient.phone.ilike(pattern),
+        Patient.email.ilike(pattern)
+    )).all()
+
+def run(db_session, size: int, repeat: int):
+    patient_service = PatientService(db_session)
+    trigram = patient_service.patient_repository.trigram_search_available()
+    print(f"\n{size} patients, search backend: {'pg_trgm' if trigram else 'in-process index'}")
+
+    # Без pg_trgm сервис ищет по индексу процесса: он перестраивается под новый размер
+    index = PatientSearchIndex() if trigram else patient_service.search_index
+    rows = patient_service.patient_repository.get_search_rows()
+    started = time.perf_counter()
+    index.rebuild(rows)
+    print(f"{'index rebuild ms':<28}{(time.perf_counter() - started) * 1000:>10.0f}")
+    del rows
+    print(f"{'query':<28}{'p50 ms':>10}{'p95 ms':>10}")
+
+    for term in SEARCH_TERMS:
+        matches = len(ilike_scan(db_session, term))
+        db_session.expunge_all()
+        report(f'ilike scan {term} ({matches})', measure(lambda: ilike_scan(db_session, term), max(1, repeat // 5)))
+        db_session.expunge_all()
+        report(f'search {term}', measure(lambda: patient_service.search_patients(term), repeat))
+        db_session.expunge_all()
+
+    for term in TYPEAHEAD_TERMS:
+        report(f'typeahead {term}', measure(lambda: patient_service.typeahead_patients(term), repeat))
+        db_session.expunge_all()
+
+    for term in SEARCH_TERMS:
+        report(f'index search {term}', measure(lambda: index.search(term), repeat))
+    for term in TYPEAHEAD_TERMS:
+        report(f'index typeahead {term}', measure(lambda: index.typeahead(term), repeat))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--database-url', default=os.getenv('DATABASE_URL'))
+    parser.add_argument('--sizes', default='100000,1000000')
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+    if not args.database_url:
+        sys.exit('Нужен --database-url')
+
+    engine = create_engine(args.database_url)
+    if engine.dialect.name == 'sqlite':
+        Base.metadata.create_all(engine)
+    db_session = sessionmaker(autocommit=False, autoflush=False, bind=engine)()
+    fill = fill_postgresql if engine.dialect.name == 'postgresql' else fill_batches
+
+    try:
+        filled = 0
+        for size in sorted(int(size) for size in args.sizes.split(',')):
+            started = time.perf_counter()
+            fill(db_session, size, filled + 1)
+            filled = size
+            print(f"Inserted up to {size} patients in {time.perf_counter() - started:.1f}s ({engine.dialect.name})")
+            run(db_session, size, args.repeat)
+    finally:
+        db_session.rollback()
+        db_session.execute(Patient.__table__.delete().where(Patient.notes == TAG))
+        db_session.commit()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,50 @@
+"""Микро-бенчмарк формирования ответа /api/consultation/save-answer
+
+Сравнивает построение словаря вопроса с повторной сериализацией
+и подстановку готового JSON из предвычисленной таблицы.
+
+Запуск из каталога solution/app:
+    python benchmarks/bench_question_response.py
+"""
+import json
+import os
+import sys
+import timeit
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+from models.compiled_graph import unpack_path
+from services.diagnosis_service import DiagnosisService
+
+DATA_PATH = os.path.join(os.path.dirname(__file__), '..', '..', 'statistics', 'data.json')
+ROUNDS = 200000
+
+def main():
+    service = DiagnosisService(DATA_PATH)
+    paths = [unpack_path(packed) for _, _, packed in service.graph.iter_nodes()]
+    progress = {'current_question': '', 'questions_answered': 3, 'is_completed': False}
+
+    def build_dict():
+        # Текущий вариант: словарь вопроса + сериализация всего ответа
+        for path in paths:
+            question = service.get_question_by_path(path)
+            question['path'] = path
+            response = {'success': True, 'message': 'Ответ сохранен',
+                        'progress': progress, 'next_question': question}
+            json.dumps(response).encode('utf-8')
+
+    def splice_fragment():
+        # Новый вариант: готовый фрагмент из таблицы + сериализация остального
+        for path in paths:
+            entry = service.get_question_entry(path)
+            body = json.dumps({'success': True, 'message': 'Ответ сохранен',
+                               'progress': progress}).encode('utf-8')
+            b''.join((body[:-1], b',"next_question":', entry.json_bytes, b'}'))
+
+    number = max(1, ROUNDS // len(paths))
+    for name, func in (('dict + json.dumps', build_dict), ('precomputed fragment', splice_fragment)):
+        seconds = min(timeit.repeat(func, number=number, repeat=5))
+        per_call = seconds / (number * len(paths)) * 1e6
+        print(f"{name:<22} {per_call:8.2f} us/response")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,133 @@
+"""Задержка /api/consultation/save-answer: движок на запрос против пула процесса
+
+Маршруты консультаций регистрируются в отдельном Flask-приложении и
+вызываются через тестовый клиент (без сетевого стека HTTP), поэтому
+разница между режимами - стоимость получения сессии БД:
+    engine per request - прежняя get_db_session: create_engine и новый пул
+                         (новое TCP-соединение и аутентификация) на каждый
+                         запрос, сессия закрывается в конце запроса;
+    pooled             - движок процесса с пулом и scoped_session,
+                         закрываемой в teardown_appcontext.
+Кроме задержек печатается число физических соединений, открытых за прогон.
+
+Нужен PostgreSQL со схемой после миграций (у SQLite нет соединений по сети):
+    python benchmarks/bench_session_latency.py --database-url postgresql://... [--requests 300]
+"""
+import argparse
+import os
+import sys
+import time
+from datetime import date
+
+from flask import Flask
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import Pool
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+import controllers.consultation_controller as consultation_module
+from controllers.consultation_controller import consultation_controller
+from models.database_models import Doctor, Patient
+from services.consultation_service import ConsultationService
+from utils.database import get_database_url, get_db_session, init_db
+
+class EnginePerRequest:
+    """Прежняя get_db_session: новый движок на каждый вызов"""
+
+    def __init__(self):
+        self.sessions = []
+
+    def __call__(self):
+        engine = create_engine(get_database_url())
+        db_session = sessionmaker(autocommit=False, autoflush=False, bind=engine)()
+        self.sessions.append(db_session)
+        return db_session
+
+    def close_all(self):
+        # Прежние маршруты закрывали сессию в finally; движки не освобождались
+        for db_session in self.sessions:
+            db_session.close()
+        self.sessions.clear()
+
+def create_app():
+    app = Flask(__name__)
+    app.secret_key = 'bench'
+    init_db(app)
+    consultation_controller(app)
+    return app
+
+def next_consultation(doctor_id: int, patient_id: int, finished_id: int = None) -> int:
+    """Новая консультация (дошедшая до диагноза завершается, иначе вернется она же)"""
+    db_session = get_db_session()
+    try:
+        service = ConsultationService(db_session)
+        if finished_id is not None:
+            service.complete_consultation(finished_id)
+        return service.start_consultation(patient_id, doctor_id).id
+    finally:
+        db_session.close()
+
+def run(client, doctor_id: int, patient_id: int, requests: int, after_request=None):
+    """Задержки запросов сохранения ответа в секундах"""
+    latencies = []
+    consultation_id = next_consultation(doctor_id, patient_id)
+    while len(latencies) < requests:
+        started = time.perf_counter()
+        response = client.post('/api/consultation/save-answer',
+                               json={'consultation_id': consultation_id, 'answer': 'yes'})
+        latencies.append(time.perf_counter() - started)
+        if after_request:
+            after_request()
+        result = response.get_json()
+        if response.status_code != 200:
+            sys.exit(f"save-answer failed: {response.status_code} {result.get('message')}")
+        next_question = result.get('next_question')
+        if not next_question or next_question['is_final'] or not next_question['has_yes']:
+            consultation_id = next_consultation(doctor_id, patient_id, consultation_id)
+    next_consultation(doctor_id, patient_id, consultation_id)
+    return latencies
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--database-url', default=os.getenv('DATABASE_URL'))
+    parser.add_argument('--requests', type=int, default=300)
+    args = parser.parse_args()
+    if not args.database_url or not args.database_url.startswith('postgresql'):
+        sys.exit('Нужен --database-url PostgreSQL')
+    os.environ['DATABASE_URL'] = args.database_url
+
+    app = create_app()
+    client = app.test_client()
+    with client.session_transaction() as flask_session:
+        flask_session['logged_in'] = True
+
+    connections = []
+    event.listen(Pool, 'connect', lambda dbapi_connection, record: connections.append(1))
+
+    db_session = get_db_session()
+    doctor = Doctor(last_name='Бенчмарк', first_name='Пул', email=f'pool-{os.getpid()}-{time.time_ns()}@example.com', password='-')
+    patient = Patient(last_name='Бенчмарк', first_name='Пул', birthday=date(1980, 1, 1), sex='M')
+    db_session.add_all([doctor, patient])
+    db_session.commit()
+    doctor_id, patient_id = doctor.id, patient.id
+    db_session.close()
+
+    # Прогрев: загрузка базы знаний и первое соединение пула
+    run(client, doctor_id, patient_id, 5)
+
+    print(f"{'mode':<20}{'requests':>10}{'connections':>13}{'mean ms':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}")
+    engine_per_request = EnginePerRequest()
+    for name, get_session, after_request in (
+            ('engine per request', engine_per_request, engine_per_request.close_all),
+            ('pooled', get_db_session, None)):
+        consultation_module.get_db_session = get_session
+        connections.clear()
+        latencies = sorted(run(client, doctor_id, patient_id, args.requests, after_request))
+        print(f"{name:<20}{len(latencies):>10}{len(connections):>13}"
+              f"{sum(latencies) / len(latencies) * 1000:>9.2f}"
+              f"{latencies[len(latencies) // 2] * 1000:>9.2f}"
+              f"{latencies[int(len(latencies) * 0.95) - 1] * 1000:>9.2f}"
+              f"{latencies[int(len(latencies) * 0.99) - 1] * 1000:>9.2f}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,72 @@
+"""Бенчмарк свертки одинаковых поддеревьев при загрузке базы знаний
+
+Генерирует data.json с сильным повторением веток (как у сгенерированных
+или многопрофильных деревьев) и сравнивает число узлов и память процесса
+после загрузки без свертки и со сверткой в DAG.
+
+Запуск из каталога solution/app:
+    python benchmarks/bench_subtree_sharing.py [--depth 16] [--variants 4]
+"""
+import argparse
+import gc
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+from models.compiled_graph import CompiledGraph
+from models.response_table import ResponseTable
+
+def build_repetitive_tree(depth: int, variants: int):
+    """Полное дерево, в котором текст узла зависит только от глубины и
+    номера варианта, поэтому на каждом уровне всего variants разных поддеревьев"""
+    def subtree(level, variant):
+        if level == depth:
+            return {"text": f"Диагноз {variant}", "yes": None, "no": None}
+        return {"text": f"Вопрос уровня {level}, вариант {variant}?",
+                "yes": subtree(level + 1, (variant * 2) % variants),
+                "no": subtree(level + 1, (variant * 2 + 1) % variants)}
+    return subtree(0, 0)
+
+def measure(data: str, deduplicate: bool):
+    gc.collect()
+    tracemalloc.start()
+    started = time.perf_counter()
+    knowledge_graph = json.loads(data)
+    graph = CompiledGraph.from_dict(knowledge_graph, deduplicate=deduplicate, share_dicts=deduplicate)
+    elapsed = time.perf_counter() - started
+    gc.collect()
+    # Как в DiagnosisService: словарь остается в памяти вместе с графом
+    graph_bytes, _ = tracemalloc.get_traced_memory()
+    # Таблица ответов хранит записи по узлам: общие поддеревья в ней тоже не повторяются
+    responses = ResponseTable(graph)
+    total_bytes, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del knowledge_graph, responses
+    return graph, elapsed, graph_bytes, total_bytes
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--depth', type=int, default=16)
+    parser.add_argument('--variants', type=int, default=4)
+    args = parser.parse_args()
+
+    sys.setrecursionlimit(max(1000, args.depth * 4))
+    data = json.dumps(build_repetitive_tree(args.depth, args.variants), ensure_ascii=False)
+    print(f"data.json: {len(data) / 1024 / 1024:.1f} MiB, depth {args.depth}, {args.variants} variants per level")
+
+    print(f"{'mode':<12}{'nodes':>10}{'load s':>10}{'graph+dict MiB':>16}{'with responses MiB':>20}")
+    results = {}
+    for name, deduplicate in (('tree', False), ('dag', True)):
+        graph, elapsed, graph_bytes, total_bytes = measure(data, deduplicate)
+        results[name] = graph
+        print(f"{name:<12}{len(graph):>10}{elapsed:>10.2f}{graph_bytes / 1024 / 1024:>16.1f}{total_bytes / 1024 / 1024:>20.1f}")
+
+    stats = results['dag'].dedup_stats
+    print(f"saved {stats.saved_nodes} of {stats.source_nodes} nodes, estimated {stats.saved_bytes / 1024 / 1024:.1f} MiB")
+    assert sorted(results['tree'].iter_diagnoses()) == sorted(results['dag'].iter_diagnoses())
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,75 @@
+"""Проверка переходов ветвей консультации по ответу
+
+На небольшом графе, где две ветки приходят к одному вопросу, а у второй
+нет перехода 'no', проверяет advance_frontier:
+    - ответ, для которого у заданной (первой) ветки нет перехода, дает
+      ValueError, а не молча теряет ветку;
+    - ветка без перехода по ответу, который есть у первой, остается на
+      своем узле с прежним весом;
+    - 'unknown' делит вес ветки между существующими переходами.
+Завершается с ошибкой, если хоть одна проверка не прошла.
+
+Запуск из каталога solution/app:
+    python benchmarks/check_advance_frontier.py
+"""
+import argparse
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+from models.candidate_sets import FrontierEntry, advance_frontier
+from models.compiled_graph import CompiledGraph, NO_NODE
+
+def leaf(text: str) -> dict:
+    return {'text': text, 'yes': None, 'no': None}
+
+# Корень спрашивает "Боль?"; обе ветки затем спрашивают "Отек?",
+# но у ветки "нет" по "Отек?" есть только переход 'yes'
+GRAPH = {
+    'text': 'Боль?',
+    'yes': {'text': 'Отек?', 'yes': leaf('Кератит'), 'no': leaf('Конъюнктивит')},
+    'no': {'text': 'Отек?', 'yes': leaf('Халязион'), 'no': None},
+}
+
+def check(name: str, condition: bool) -> bool:
+    print(f"{name:<48}[{'ok' if condition else 'FAIL'}]")
+    return condition
+
+def texts(graph: CompiledGraph, frontier) -> dict:
+    return {graph.text(entry.node_id): entry.weight for entry in frontier}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.parse_args()
+
+    graph = CompiledGraph.from_dict(GRAPH, deduplicate=False)
+    root = graph.root
+    branches = advance_frontier(graph, [FrontierEntry(root, 1, 1.0)], 'unknown')
+    asked = next(entry for entry in branches if graph.child(entry.node_id, 'no') != NO_NODE)
+    partial = next(entry for entry in branches if entry is not asked)
+
+    results = []
+    try:
+        advance_frontier(graph, [partial, asked], 'no')
+        results.append(check('asked branch without transition raises', False))
+    except ValueError:
+        results.append(check('asked branch without transition raises', True))
+
+    moved = texts(graph, advance_frontier(graph, [asked, partial], 'no'))
+    results.append(check('other branch without transition is kept',
+                         moved == {'Конъюнктивит': asked.weight, 'Отек?': partial.weight}))
+
+    moved = texts(graph, advance_frontier(graph, [partial, asked], 'yes'))
+    results.append(check('matching branches advance together',
+                         moved == {'Халязион': partial.weight, 'Кератит': asked.weight}))
+
+    moved = texts(graph, advance_frontier(graph, [partial, asked], 'unknown'))
+    results.append(check('unknown splits over existing transitions',
+                         moved == {'Халязион': partial.weight, 'Кератит': asked.weight / 2,
+                                   'Конъюнктивит': asked.weight / 2}))
+
+    if not all(results):
+        sys.exit(f"{results.count(False)} checks failed")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,65 @@
+"""Проверка свертки одинаковых поддеревьев при компиляции графа
+
+Компилирует CompiledGraph.from_dict (deduplicate и share_dicts) на
+небольших графах и проверяет:
+    - узлы с дополнительными полями (кроме text/yes/no) компилируются;
+    - поддеревья, различающиеся только дополнительным полем, не
+      объединяются ни в графе, ни в словаре;
+    - полностью одинаковые поддеревья объединяются.
+Завершается с ошибкой, если хоть одна проверка не прошла.
+
+Запуск из каталога solution/app:
+    python benchmarks/check_graph_dedup.py
+"""
+import argparse
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+from models.compiled_graph import CompiledGraph
+
+def leaf(text: str, **fields) -> dict:
+    return {'text': text, 'yes': None, 'no': None, **fields}
+
+def question(**fields) -> dict:
+    return {'text': 'Отек?', 'yes': leaf('Кератит'), 'no': leaf('Конъюнктивит'), **fields}
+
+def check(name: str, condition: bool) -> bool:
+    print(f"{name:<48}[{'ok' if condition else 'FAIL'}]")
+    return condition
+
+def compile_graph(knowledge_graph: dict):
+    try:
+        return CompiledGraph.from_dict(knowledge_graph, share_dicts=True)
+    except Exception as e:
+        print(f"    {type(e).__name__}: {e}")
+        return None
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.parse_args()
+
+    results = []
+    graph = compile_graph(leaf('Глаукома', icd='H40'))
+    results.append(check('node with extra field compiles', graph is not None and len(graph) == 1))
+
+    # Корень + два вопроса "Отек?" (различаются полем icd) + два общих листа
+    knowledge_graph = {'text': 'Боль?', 'yes': question(icd='H16'), 'no': question()}
+    graph = compile_graph(knowledge_graph)
+    results.append(check('subtrees differing in extra field compile', graph is not None))
+    if graph is not None:
+        results.append(check('subtrees differing in extra field kept apart',
+                             len(graph) == 5 and knowledge_graph['no'] is not knowledge_graph['yes']))
+        results.append(check('extra field survives in the dictionary',
+                             knowledge_graph['yes'].get('icd') == 'H16' and 'icd' not in knowledge_graph['no']))
+
+    knowledge_graph = {'text': 'Боль?', 'yes': question(icd='H16'), 'no': question(icd='H16')}
+    graph = compile_graph(knowledge_graph)
+    results.append(check('identical subtrees are shared',
+                         graph is not None and len(graph) == 4 and knowledge_graph['no'] is knowledge_graph['yes']))
+
+    if not all(results):
+        sys.exit(f"{results.count(False)} checks failed")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,110 @@
+"""Проверка маршрутизации чтений в реплику
+
+Две локальные БД SQLite играют роли основной (DATABASE_URL) и реплики
+(DATABASE_REPLICA_URL). В них лежит пациент с одним id, но разной фамилией,
+поэтому по ответу видно, какая БД его отдала. Маршруты пациентов
+регистрируются в отдельном Flask-приложении и вызываются тестовым клиентом.
+Проверяется:
+    - маршрут read_only (/api/patients/search) читает реплику, обычный
+      (/api/patients/<id>) - основную БД;
+    - после записи врача (PUT /api/patients/<id>) чтения в течение окна
+      read-your-writes идут в основную БД, после окна - снова в реплику;
+    - методы репозитория read_only вне запроса читают реплику, а после
+      flush в той же сессии - основную БД.
+Завершается с ошибкой, если хоть одна проверка не прошла.
+
+Запуск из каталога solution/app:
+    python benchmarks/check_replica_routing.py [--window 0.5]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from datetime import date
+
+from flask import Flask
+from sqlalchemy import create_engine
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+from controllers.patient_controller import patient_controller
+from models.database_models import Base, Patient
+from repositories.patient_repository import PatientRepository
+from utils.database import get_db_session, init_db
+
+class Checks:
+    def __init__(self):
+        self.failures = 0
+
+    def expect(self, name: str, actual, expected):
+        status = 'ok' if actual == expected else 'FAIL'
+        print(f"{status:<5}{name}: {actual}")
+        if actual != expected:
+            self.failures += 1
+
+def create_database(path: str, last_name: str):
+    """БД со схемой и пациентом id=1, фамилия которого выдает источник чтения"""
+    engine = create_engine(f'sqlite:///{path}')
+    Base.metadata.create_all(engine)
+    with engine.begin() as connection:
+        connection.execute(Patient.__table__.insert(), {
+            'id': 1, 'last_name': last_name, 'first_name': 'Тест', 'birthday': date(1980, 1, 1),
+            'sex': 'M', 'version': 1
+        })
+    engine.dispose()
+
+def search_source(client) -> str:
+    patients = client.get('/api/patients/search?term=Тест').get_json()['patients']
+    return next(patient['last_name'] for patient in patients if patient['id'] == 1)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--window', type=float, default=0.5, help='окно read-your-writes, секунды')
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp()
+    primary_path = os.path.join(directory, 'primary.sqlite')
+    replica_path = os.path.join(directory, 'replica.sqlite')
+    create_database(primary_path, 'Primary')
+    create_database(replica_path, 'Replica')
+    os.environ['DATABASE_URL'] = f'sqlite:///{primary_path}'
+    os.environ['DATABASE_REPLICA_URL'] = f'sqlite:///{replica_path}'
+    os.environ['DATABASE_REPLICA_READ_YOUR_WRITES'] = str(args.window)
+
+    app = Flask(__name__)
+    app.secret_key = 'check'
+    init_db(app)
+    patient_controller(app)
+    client = app.test_client()
+    with client.session_transaction() as flask_session:
+        flask_session['logged_in'] = True
+
+    checks = Checks()
+    checks.expect('read_only route before any write', search_source(client), 'Replica')
+    checks.expect('regular route', client.get('/api/patients/1').get_json()['patient']['last_name'], 'Primary')
+
+    response = client.put('/api/patients/1', json={'notes': 'после записи'})
+    checks.expect('write status', response.status_code, 200)
+    checks.expect('read_only route inside read-your-writes window', search_source(client), 'Primary')
+    time.sleep(args.window + 0.1)
+    checks.expect('read_only route after the window', search_source(client), 'Replica')
+
+    db_session = get_db_session()
+    try:
+        repository = PatientRepository(db_session)
+        checks.expect('read_only repository method', repository.get_all_patients()[0].last_name, 'Replica')
+        db_session.rollback()
+        checks.expect('regular repository method', repository.get_patient_by_id(1).last_name, 'Primary')
+        db_session.add(Patient(last_name='Flushed', first_name='Тест', birthday=date(1990, 1, 1), sex='F'))
+        db_session.flush()
+        checks.expect('read_only repository method after flush',
+                      sorted(patient.last_name for patient in repository.get_all_patients()), ['Flushed', 'Primary'])
+        db_session.rollback()
+    finally:
+        db_session.close()
+
+    if checks.failures:
+        sys.exit(f"{checks.failures} replica routing checks failed")
+
+if __name__ == '__main__':
+    main()
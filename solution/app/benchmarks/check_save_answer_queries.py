@@ -0,0 +1,99 @@
+"""Проверка числа SQL-запросов на сохранение ответа консультации
+
+Проходит консультацию от первого вопроса до диагноза через
+ConsultationService.save_consultation_answer и считает выполненные
+запросы на каждый ответ. Четные ответы идут с пустым кэшем состояния:
+ожидается ровно три запроса - чтение состояния консультации (без блокировки),
+вставка ответа в журнал и UPDATE состояния. Нечетные - с состоянием в
+кэше: только вставка и UPDATE (BEGIN/COMMIT не считаются).
+Завершается с ошибкой, если хоть один ответ потребовал других запросов.
+
+Запуск из каталога solution/app (по умолчанию SQLite в памяти):
+    python benchmarks/check_save_answer_queries.py [--database-url postgresql://...]
+"""
+import argparse
+import os
+import sys
+import time
+from datetime import date
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+from models.database_models import Base, Consultation, ConsultationAnswer, Doctor, Patient
+from services.consultation_service import ConsultationService, get_consultation_state_cache
+
+# Число запросов на ответ с пустым кэшем состояния и с заполненным
+EXPECTED_COLD = 3
+EXPECTED_CACHED = 2
+
+class QueryCounter:
+    """Счетчик запросов, отправленных драйверу БД"""
+
+    def __init__(self, engine):
+        self.statements = []
+        event.listen(engine, 'before_cursor_execute', self._on_execute)
+
+    def _on_execute(self, conn, cursor, statement, parameters, context, executemany):
+        self.statements.append(statement)
+
+    def reset(self):
+        self.statements = []
+
+def create_session(database_url: str):
+    if database_url.startswith('sqlite'):
+        engine = create_engine(database_url, connect_args={'check_same_thread': False}, poolclass=StaticPool)
+    else:
+        engine = create_engine(database_url)
+    Base.metadata.create_all(engine)
+    return engine, sessionmaker(autocommit=False, autoflush=False, bind=engine)()
+
+def create_consultation(db_session) -> int:
+    """Врач, пациент и активная консультация для проверки"""
+    doctor = Doctor(last_name='Проверка', first_name='Запросов', email=f'queries-{os.getpid()}-{time.time_ns()}@example.com', password='-')
+    patient = Patient(last_name='Проверка', first_name='Запросов', birthday=date(1980, 1, 1), sex='M')
+    db_session.add_all([doctor, patient])
+    db_session.commit()
+    consultation = ConsultationService(db_session).start_consultation(patient.id, doctor.id)
+    return consultation.id
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--database-url', default='sqlite://')
+    args = parser.parse_args()
+
+    engine, db_session = create_session(args.database_url)
+    consultation_id = create_consultation(db_session)
+    counter = QueryCounter(engine)
+
+    failures = 0
+    for step in range(1, 1000):
+        db_session.expunge_all()
+        cached = step % 2 == 1
+        if not cached:
+            get_consultation_state_cache().clear()
+        expected = EXPECTED_CACHED if cached else EXPECTED_COLD
+        counter.reset()
+        result = ConsultationService(db_session).save_consultation_answer(consultation_id, 'no')
+        count = len(counter.statements)
+        status = 'ok' if count == expected else 'FAIL'
+        print(f"answer {step:>3} ({'cached' if cached else 'cold'}): {count} queries [{status}]")
+        if count != expected:
+            failures += 1
+            for statement in counter.statements:
+                print(f"    {' '.join(statement.split())[:120]}")
+        if result.next_question is None or result.next_question.is_final:
+            break
+
+    stored = db_session.query(Consultation).get(consultation_id).sub_graph_find_diagnosis
+    assert stored == result.diagnosis_data, "Сохраненные данные не совпадают с ответом"
+    logged = db_session.query(ConsultationAnswer).filter_by(consultation_id=consultation_id).count()
+    assert logged == step == stored['answer_count'], "Журнал ответов не совпадает с числом ответов"
+    print(f"diagnosis: {result.diagnosis_data.get('final_diagnosis_candidate')}")
+    if failures:
+        sys.exit(f"{failures} answers issued an unexpected number of queries")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,288 @@
+"""Стресс-тест оптимистической блокировки консультаций и пациентов
+
+Несколько потоков (как вкладки браузера на разных воркерах, у каждого своя
+сессия БД) одновременно пишут в одну строку:
+    consultation - потоки отвечают на вопросы одной консультации по самому
+                   длинному пути базы знаний: читают состояние, отправляют
+                   следующий ответ с base_count и при 409 перечитывают;
+    patient      - потоки увеличивают счетчик в notes пациента через
+                   PatientService.update_patient с версией, которую прочитали;
+    unversioned  - то же для пациента прежним чтением-изменением-записью
+                   без проверки версии (для сравнения: обновления теряются).
+Потерянное обновление - успешная запись, которой нет в итоговом состоянии.
+Для консультаций проверяется, что журнал содержит ровно путь без пропусков и
+повторов, а answer_count и версия строки с ним согласованы.
+
+Ожидания блокировок: считаются запросы SELECT ... FOR UPDATE (их не должно
+быть), а отдельный поток опрашивает pg_locks и считает неполученные
+блокировки. Строка блокируется только самим UPDATE до коммита короткой
+транзакции, поэтому --think-ms (время между чтением и записью) на ожидания
+не влияет.
+
+Нужен PostgreSQL со схемой после миграций (SQLite сериализует запись
+блокировкой всего файла, ожидания строк там не измерить):
+    python benchmarks/stress_optimistic_concurrency.py --database-url postgresql://... [--threads 8] [--writes 200] [--think-ms 2]
+"""
+import argparse
+import os
+import sys
+import threading
+import time
+from datetime import date
+
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.orm import sessionmaker
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+from models.compiled_graph import unpack_path
+from models.database_models import Consultation, ConsultationAnswer, Doctor, Patient
+from services.consultation_service import ConsultationConflictError, ConsultationService
+from services.patient_service import PatientConflictError, PatientService
+
+class Stats:
+    """Счетчики потоков одного сценария"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.writes = 0
+        self.conflicts = 0
+        self.latencies = []
+
+    def record(self, started: float, conflict: bool = False):
+        with self.lock:
+            self.latencies.append(time.perf_counter() - started)
+            if conflict:
+                self.conflicts += 1
+            else:
+                self.writes += 1
+
+class LockWaitMonitor:
+    """Опрос неполученных блокировок PostgreSQL в отдельном потоке"""
+
+    def __init__(self, engine, interval: float = 0.005):
+        self.engine = engine
+        self.interval = interval
+        self.samples = 0
+        self.waiting_samples = 0
+        self.max_waiting = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        with self.engine.connect() as connection:
+            while not self._stop.is_set():
+                waiting = connection.execute(text(
+                    "SELECT count(*) FROM pg_locks WHERE NOT granted AND locktype IN ('relation', 'tuple', 'transactionid')"
+                )).scalar()
+                connection.rollback()
+                self.samples += 1
+                if waiting:
+                    self.waiting_samples += 1
+                    self.max_waiting = max(self.max_waiting, waiting)
+                self._stop.wait(self.interval)
+
+def run_threads(threads: int, worker):
+    barrier = threading.Barrier(threads)
+    errors = []
+
+    def target():
+        barrier.wait()
+        try:
+            worker()
+        except Exception as e:
+            errors.append(e)
+
+    pool = [threading.Thread(target=target) for _ in range(threads)]
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+    if errors:
+        raise errors[0]
+
+def consultation_scenario(Session, path, threads: int, think: float, stats: Stats):
+    """Потоки отвечают на вопросы одной консультации; возвращает (id, нарушения)"""
+    db_session = Session()
+    try:
+        doctor = Doctor(last_name='Стресс', first_name='Тест', email=f'stress-{os.getpid()}-{time.time_ns()}@example.com', password='-')
+        patient = Patient(last_name='Стресс', first_name='Тест', birthday=date(1980, 1, 1), sex='M')
+        db_session.add_all([doctor, patient])
+        db_session.commit()
+        consultation_id = ConsultationService(db_session).start_consultation(patient.id, doctor.id).id
+    finally:
+        db_session.close()
+
+    def worker():
+        db_session = Session()
+        try:
+            while True:
+                service = ConsultationService(db_session)
+                # Состояние читается из БД, как у вкладки после перезагрузки
+                service.state_cache.invalidate(consultation_id)
+                current = service.get_current_state(consultation_id)
+                answer_count = current.progress['questions_answered']
+                if answer_count >= len(path):
+                    return
+                time.sleep(think)
+                started = time.perf_counter()
+                try:
+                    service.apply_answers(consultation_id, [path[answer_count]], base_count=answer_count)
+                    stats.record(started)
+                except ConsultationConflictError:
+                    stats.record(started, conflict=True)
+                db_session.expire_all()
+        finally:
+            db_session.close()
+
+    run_threads(threads, worker)
+
+    db_session = Session()
+    try:
+        answers = db_session.query(ConsultationAnswer)\
+            .filter(ConsultationAnswer.consultation_id == consultation_id)\
+            .order_by(ConsultationAnswer.seq)\
+            .all()
+        row = db_session.query(Consultation.sub_graph_find_diagnosis, Consultation.version)\
+            .filter(Consultation.id == consultation_id)\
+            .one()
+        problems = []
+        if [answer.seq for answer in answers] != list(range(1, len(path) + 1)):
+            problems.append(f"log seqs {[answer.seq for answer in answers]}")
+        if [answer.answer for answer in answers] != list(path):
+            problems.append("log answers differ from path")
+        if row.sub_graph_find_diagnosis.get('answer_count') != len(path):
+            problems.append(f"answer_count {row.sub_graph_find_diagnosis.get('answer_count')}")
+        if row.version != len(path) + 1:
+            problems.append(f"version {row.version}")
+        return consultation_id, problems
+    finally:
+        db_session.close()
+
+def patient_scenario(Session, threads: int, writes: int, think: float, stats: Stats, versioned: bool):
+    """Потоки увеличивают счетчик в notes одного пациента; возвращает итоговое значение"""
+    db_session = Session()
+    try:
+        patient = Patient(last_name='Стресс', first_name='Тест', birthday=date(1980, 1, 1), sex='M', notes='0')
+        db_session.add(patient)
+        db_session.commit()
+        patient_id = patient.id
+    finally:
+        db_session.close()
+
+    per_thread = writes // threads
+
+    def worker():
+        db_session = Session()
+        service = PatientService(db_session)
+        try:
+            done = 0
+            while done < per_thread:
+                db_session.expire_all()
+                patient = service.get_patient(patient_id)
+                counter, version = int(patient.notes), patient.version
+                db_session.rollback()
+                time.sleep(think)
+                started = time.perf_counter()
+                if not versioned:
+                    # Прежняя запись: последнее чтение перезаписывает чужие изменения
+                    db_session.execute(text("UPDATE patients SET notes = :notes WHERE id = :id"),
+                                       {'notes': str(counter + 1), 'id': patient_id})
+                    db_session.commit()
+                    stats.record(started)
+                    done += 1
+                    continue
+                try:
+                    service.update_patient(patient_id, {'notes': str(counter + 1), 'version': version})
+                    stats.record(started)
+                    done += 1
+                except PatientConflictError:
+                    stats.record(started, conflict=True)
+        finally:
+            db_session.close()
+
+    run_threads(threads, worker)
+
+    db_session = Session()
+    try:
+        return int(db_session.query(Patient.notes).filter(Patient.id == patient_id).scalar())
+    finally:
+        db_session.close()
+
+def report(name: str, stats: Stats, lost: int, monitor: LockWaitMonitor, for_update: int):
+    latencies = sorted(stats.latencies) or [0.0]
+    waits = f"{monitor.waiting_samples}/{monitor.samples} max {monitor.max_waiting}"
+    print(f"{name:<14}{stats.writes:>8}{stats.conflicts:>11}{lost:>7}{for_update:>12}{waits:>20}"
+          f"{latencies[len(latencies) // 2] * 1000:>9.2f}{latencies[int(len(latencies) * 0.99) - 1] * 1000:>9.2f}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--writes', type=int, default=200, help='обновлений пациента на сценарий')
+    parser.add_argument('--think-ms', type=float, default=2.0, help='пауза между чтением и записью')
+    parser.add_argument('--database-url', default=os.getenv('DATABASE_URL'))
+    args = parser.parse_args()
+    if not args.database_url or not args.database_url.startswith('postgresql'):
+        sys.exit('Нужен --database-url PostgreSQL')
+
+    # Соединение на поток и одно для опроса pg_locks
+    engine = create_engine(args.database_url, pool_size=args.threads + 1, max_overflow=1)
+    Session = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+    for_update = []
+    event.listen(engine, 'before_cursor_execute',
+                 lambda conn, cursor, statement, *rest: 'FOR UPDATE' in statement.upper() and for_update.append(statement))
+
+    db_session = Session()
+    snapshot = ConsultationService(db_session).diagnosis_service
+    _, packed = max(snapshot.graph.iter_diagnoses(), key=lambda item: item[1].bit_length())
+    path = unpack_path(packed)
+    db_session.close()
+
+    think = args.think_ms / 1000
+    print(f"{args.threads} threads, think {args.think_ms} ms, consultation path {len(path)} answers, "
+          f"{args.writes} patient updates")
+    print(f"{'scenario':<14}{'writes':>8}{'conflicts':>11}{'lost':>7}{'FOR UPDATE':>12}"
+          f"{'lock wait samples':>20}{'p50 ms':>9}{'p99 ms':>9}")
+
+    failed = False
+    try:
+        rounds = max(1, args.writes // max(1, len(path)))
+        stats = Stats()
+        for_update.clear()
+        problems = []
+        with LockWaitMonitor(engine) as monitor:
+            for _ in range(rounds):
+                consultation_id, round_problems = consultation_scenario(Session, path, args.threads, think, stats)
+                problems.extend(f"consultation {consultation_id}: {problem}" for problem in round_problems)
+        lost = stats.writes - rounds * len(path)
+        report('consultation', stats, abs(lost), monitor, len(for_update))
+        failed |= bool(problems or lost or for_update)
+
+        for name, versioned in (('patient', True), ('unversioned', False)):
+            stats = Stats()
+            for_update.clear()
+            with LockWaitMonitor(engine) as monitor:
+                final = patient_scenario(Session, args.threads, args.writes, think, stats, versioned)
+            lost = stats.writes - final
+            report(name, stats, lost, monitor, len(for_update))
+            if versioned:
+                failed |= bool(lost or for_update)
+
+        for problem in problems:
+            print(problem)
+    finally:
+        engine.dispose()
+
+    if failed:
+        sys.exit('Optimistic locking lost updates or took row locks')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,211 @@
+import traceback
+from services.async_consultation_service import AsyncConsultationService
+from services.consultation_service import ConsultationConflictError
+from utils.async_database import get_async_db_session
+from utils.asgi_helpers import get_json, json_response, json_response_with_fragments, login_required, remember_write
+from utils.controller_helpers import prepare_answer_response, prepare_consultation_response
+
+def _consultation_id(data):
+    """ID консультации из тела запроса (asyncpg не приводит строки к числам сам)"""
+    try:
+        return int(data['consultation_id'])
+    except (TypeError, ValueError):
+        raise ValueError("Некорректный ID консультации")
+
+def _answer_response(result, message, success=True, status_code=200):
+    """Ответ API с состоянием консультации после применения ответов"""
+    response_data, fragments = prepare_answer_response(result)
+    return json_response_with_fragments(success, message, response_data, fragments, status_code=status_code)
+
+async def _conflict_response(consultation_service, consultation_id, error):
+    """409 с актуальным состоянием консультации для пересинхронизации клиента"""
+    current = await consultation_service.get_current_state(consultation_id)
+    if current is None:
+        return json_response(False, str(error), status_code=409)
+    return _answer_response(current, str(error), success=False, status_code=409)
+
+def _status_response(message, consultation):
+    return json_response(True, message, {
+        'consultation': {
+            'id': consultation.id,
+            'status': consultation.status
+        }
+    })
+
+def async_consultation_controller(app):
+    """Регистрация асинхронных маршрутов API консультаций (те же URL и ответы, что во Flask)"""
+
+    @login_required
+    async def api_save_answer(request):
+        data = await get_json(request)
+        if not data or 'consultation_id' not in data or 'answer' not in data:
+            return json_response(False, 'Отсутствуют обязательные данные', status_code=400)
+
+        async with get_async_db_session() as db_session:
+            consultation_service = AsyncConsultationService(db_session)
+            try:
+                consultation_id = _consultation_id(data)
+                result = await consultation_service.save_consultation_answer(consultation_id, data['answer'])
+                return remember_write(request, _answer_response(result, 'Ответ сохранен'))
+
+            except ConsultationConflictError as e:
+                return await _conflict_response(consultation_service, consultation_id, e)
+            except ValueError as e:
+                return json_response(False, str(e), status_code=400)
+            except Exception as e:
+                print(f"Exception: {str(e)}")
+                traceback.print_exc()
+                return json_response(False, f'Ошибка при сохранении ответа: {str(e)}', status_code=500)
+
+    @login_required
+    async def api_sync_answers(request):
+        """Пакетная синхронизация ответов, пройденных клиентом по предзагруженному поддереву"""
+        data = await get_json(request)
+        if not data or 'consultation_id' not in data or not isinstance(data.get('answers'), list):
+            return json_response(False, 'Отсутствуют обязательные данные', status_code=400)
+
+        async with get_async_db_session() as db_session:
+            consultation_service = AsyncConsultationService(db_session)
+            try:
+                consultation_id = _consultation_id(data)
+                result = await consultation_service.apply_answers(
+                    consultation_id,
+                    data['answers'],
+                    base_count=data.get('base_count')
+                )
+                return remember_write(request, _answer_response(result, f"Сохранено ответов: {len(data['answers'])}"))
+
+            except ConsultationConflictError as e:
+                return await _conflict_response(consultation_service, consultation_id, e)
+            except ValueError as e:
+                return json_response(False, str(e), status_code=400)
+            except Exception as e:
+                print(f"Exception: {str(e)}")
+                traceback.print_exc()
+                return json_response(False, f'Ошибка при синхронизации ответов: {str(e)}', status_code=500)
+
+    @login_required
+    async def api_replay_answers(request):
+        """Повтор полной последовательности ответов одним запросом и одной транзакцией"""
+        consultation_id = request.path_params['consultation_id']
+        data = await get_json(request)
+        answers = data.get('answers') if isinstance(data, dict) else None
+        if not isinstance(answers, list) or not all(isinstance(answer, str) for answer in answers):
+            return json_response(False, 'Ожидается список ответов answers', status_code=400)
+
+        async with get_async_db_session() as db_session:
+            consultation_service = AsyncConsultationService(db_session)
+            try:
+                result = await consultation_service.replay_answers(consultation_id, answers)
+                return remember_write(request, _answer_response(
+                    result, f"Последовательность ответов применена ({len(answers)})"))
+
+            except ConsultationConflictError as e:
+                return await _conflict_response(consultation_service, consultation_id, e)
+            except ValueError as e:
+                return json_response(False, str(e), status_code=400)
+            except Exception as e:
+                print(f"Exception: {str(e)}")
+                traceback.print_exc()
+                return json_response(False, f'Ошибка при применении ответов: {str(e)}', status_code=500)
+
+    @login_required
+    async def api_complete_consultation(request):
+        """Завершение консультации"""
+        data = await get_json(request)
+        if not data or 'consultation_id' not in data:
+            return json_response(False, 'ID консультации обязателен', status_code=400)
+
+        async with get_async_db_session() as db_session:
+            consultation_service = AsyncConsultationService(db_session)
+            try:
+                consultation_id = _consultation_id(data)
+                consultation = await consultation_service.complete_consultation(
+                    consultation_id,
+                    data.get('final_diagnosis'),
+                    data.get('notes')
+                )
+                return remember_write(request, json_response(True, 'Консультация завершена', {
+                    'consultation': {
+                        'id': consultation.id,
+                        'final_diagnosis': consultation.final_diagnosis,
+                        'status': consultation.status
+                    }
+                }))
+
+            except ConsultationConflictError as e:
+                return await _conflict_response(consultation_service, consultation_id, e)
+            except ValueError as e:
+                return json_response(False, str(e), status_code=400)
+            except Exception as e:
+                return json_response(False, f'Ошибка при завершении консультации: {str(e)}', status_code=500)
+
+    @login_required
+    async def api_get_consultation(request):
+        """Получение данных консультации"""
+        consultation_id = request.path_params['consultation_id']
+        async with get_async_db_session() as db_session:
+            consultation_service = AsyncConsultationService(db_session)
+            try:
+                consultation = await consultation_service.consultation_repository.get_consultation_by_id(consultation_id)
+                if not consultation:
+                    return json_response(False, 'Консультация не найдена', status_code=404)
+
+                current = await consultation_service.get_current_state(consultation_id)
+                response_data, fragments = prepare_consultation_response(
+                    consultation, await consultation_service.get_answer_history(consultation_id), current)
+
+                return json_response_with_fragments(True, 'Данные консультации получены', response_data, fragments)
+
+            except Exception as e:
+                return json_response(False, f'Ошибка при получении данных консультации: {str(e)}', status_code=500)
+
+    @login_required
+    async def api_cancel_consultation(request):
+        """Отмена консультации"""
+        data = await get_json(request)
+        if not data or 'consultation_id' not in data:
+            return json_response(False, 'ID консультации обязателен', status_code=400)
+
+        async with get_async_db_session() as db_session:
+            consultation_service = AsyncConsultationService(db_session)
+            try:
+                consultation_id = _consultation_id(data)
+                consultation = await consultation_service.cancel_consultation(consultation_id)
+                return remember_write(request, _status_response('Консультация отменена', consultation))
+
+            except ConsultationConflictError as e:
+                return await _conflict_response(consultation_service, consultation_id, e)
+            except ValueError as e:
+                return json_response(False, str(e), status_code=400)
+            except Exception as e:
+                return json_response(False, f'Ошибка при отмене консультации: {str(e)}', status_code=500)
+
+    @login_required
+    async def api_save_draft(request):
+        """Сохранение консультации как черновика"""
+        data = await get_json(request)
+        if not data or 'consultation_id' not in data:
+            return json_response(False, 'ID консультации обязателен', status_code=400)
+
+        async with get_async_db_session() as db_session:
+            consultation_service = AsyncConsultationService(db_session)
+            try:
+                consultation_id = _consultation_id(data)
+                consultation = await consultation_service.save_as_draft(consultation_id)
+                return remember_write(request, _status_response('Консультация сохранена как черновик', consultation))
+
+            except ConsultationConflictError as e:
+                return await _conflict_response(consultation_service, consultation_id, e)
+            except ValueError as e:
+                return json_response(False, str(e), status_code=400)
+            except Exception as e:
+                return json_response(False, f'Ошибка при сохранении черновика: {str(e)}', status_code=500)
+
+    app.add_route('/api/consultation/save-answer', api_save_answer, methods=['POST'])
+    app.add_route('/api/consultation/sync-answers', api_sync_answers, methods=['POST'])
+    app.add_route('/api/consultation/{consultation_id:int}/answers:batch', api_replay_answers, methods=['POST'])
+    app.add_route('/api/consultation/complete', api_complete_consultation, methods=['POST'])
+    app.add_route('/api/consultation/{consultation_id:int}', api_get_consultation, methods=['GET'])
+    app.add_route('/api/consultation/cancel', api_cancel_consultation, methods=['POST'])
+    app.add_route('/api/consultation/save-draft', api_save_draft, methods=['POST'])
@@ -0,0 +1,137 @@
+from repositories.patient_queries import SEARCH_LIMIT, TYPEAHEAD_LIMIT
+from services.async_patient_service import AsyncPatientService
+from services.patient_service import PatientConflictError
+from utils.async_database import get_async_db_session
+from utils.asgi_helpers import get_json, json_response, login_required, remember_write
+from utils.controller_helpers import parse_limit, parse_page_args, prepare_patient_data, prepare_patients_page_data, prepare_typeahead_data
+
+def async_patient_controller(app):
+    """Регистрация асинхронных маршрутов API пациентов (те же URL и ответы, что во Flask)"""
+
+    @login_required
+    async def api_search_patients(request):
+        """Поиск пациентов через API (лучшие совпадения первыми)"""
+        async with get_async_db_session() as db_session:
+            try:
+                limit = parse_limit(request.query_params, SEARCH_LIMIT, 100)
+                patients = await AsyncPatientService(db_session).search_patients(
+                    request.query_params.get('term', ''), limit=limit)
+                patients_data = [prepare_patient_data(patient, for_json=True) for patient in patients]
+
+                return json_response(True, 'Пациенты найдены', {
+                    'patients': patients_data,
+                    'total': len(patients_data)
+                })
+
+            except ValueError as e:
+                return json_response(False, str(e), status_code=400)
+            except Exception as e:
+                return json_response(False, f'Ошибка при поиске пациентов: {str(e)}', status_code=500)
+
+    @login_required
+    async def api_typeahead_patients(request):
+        """Подсказки при вводе начала ФИО"""
+        async with get_async_db_session() as db_session:
+            try:
+                limit = parse_limit(request.query_params, TYPEAHEAD_LIMIT, 20)
+                patients = await AsyncPatientService(db_session).typeahead_patients(request.query_params.get('q', ''), limit)
+
+                return json_response(True, 'Подсказки получены', {
+                    'suggestions': [prepare_typeahead_data(patient) for patient in patients]
+                })
+
+            except ValueError as e:
+                return json_response(False, str(e), status_code=400)
+            except Exception as e:
+                return json_response(False, f'Ошибка при поиске пациентов: {str(e)}', status_code=500)
+
+    @login_required
+    async def api_create_patient(request):
+        """Создание нового пациента"""
+        data = await get_json(request)
+        if not data:
+            return json_response(False, 'Отсутствуют данные пациента', status_code=400)
+
+        async with get_async_db_session() as db_session:
+            try:
+                patient = await AsyncPatientService(db_session).create_patient(data)
+
+                return remember_write(request, json_response(True, 'Пациент успешно создан', {
+                    'patient': prepare_patient_data(patient, for_json=True)
+                }, 201))
+
+            except ValueError as e:
+                return json_response(False, str(e), status_code=400)
+            except Exception as e:
+                return json_response(False, f'Ошибка при создании пациента: {str(e)}', status_code=500)
+
+    @login_required
+    async def api_get_patients(request):
+        """Получение страницы списка пациентов врача (курсоры after/before)"""
+        async with get_async_db_session() as db_session:
+            try:
+                page_args = parse_page_args(request.query_params, default_limit=50, max_limit=200)
+                page = await AsyncPatientService(db_session).get_patients_page(
+                    doctor_id=request.state.session.get('doctor_id'), **page_args)
+
+                return json_response(True, 'Пациенты получены', prepare_patients_page_data(page))
+
+            except ValueError as e:
+                return json_response(False, str(e), status_code=400)
+            except Exception as e:
+                return json_response(False, f'Ошибка при получении списка пациентов: {str(e)}', status_code=500)
+
+    @login_required
+    async def api_get_patient(request):
+        """Получение информации о пациенте"""
+        async with get_async_db_session() as db_session:
+            try:
+                patient = await AsyncPatientService(db_session).get_patient(request.path_params['patient_id'])
+
+                if not patient:
+                    return json_response(False, 'Пациент не найден', status_code=404)
+
+                return json_response(True, 'Данные пациента получены', {
+                    'patient': prepare_patient_data(patient, for_json=True)
+                })
+
+            except Exception as e:
+                return json_response(False, f'Ошибка при получении данных пациента: {str(e)}', status_code=500)
+
+    @login_required
+    async def api_update_patient(request):
+        """Обновление данных пациента"""
+        patient_id = request.path_params['patient_id']
+        data = await get_json(request)
+        if not data:
+            return json_response(False, 'Отсутствуют данные для обновления', status_code=400)
+
+        async with get_async_db_session() as db_session:
+            patient_service = AsyncPatientService(db_session)
+            try:
+                patient = await patient_service.update_patient(patient_id, data)
+
+                if not patient:
+                    return json_response(False, 'Пациент не найден', status_code=404)
+
+                return remember_write(request, json_response(True, 'Данные пациента успешно обновлены', {
+                    'patient': prepare_patient_data(patient, for_json=True)
+                }))
+
+            except PatientConflictError as e:
+                # Отдаем актуальные данные, чтобы клиент показал их вместо своих
+                patient = await patient_service.get_patient(patient_id)
+                return json_response(False, str(e), {
+                    'patient': prepare_patient_data(patient, for_json=True) if patient else None
+                }, status_code=409)
+            except ValueError as e:
+                return json_response(False, str(e), status_code=400)
+            except Exception as e:
+                return json_response(False, f'Ошибка при обновлении данных пациента: {str(e)}', status_code=500)
+
+    app.add_route('/api/patients/search', api_search_patients, methods=['GET'])
+    app.add_route('/api/patients/typeahead', api_typeahead_patients, methods=['GET'])
+    app.add_route('/api/patients', api_create_patient, methods=['POST'])
+    app.add_route('/api/patients', api_get_patients, methods=['GET'])
+    app.add_route('/api/patients/{patient_id:int}', api_get_patient, methods=['GET'])
+    app.add_route('/api/patients/{patient_id:int}', api_update_patient, methods=['PUT'])
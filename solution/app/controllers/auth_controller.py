@@ -45,7 +45,6 @@ def register():
             return _json_response(False, 'Пароли не совпадают', status_code=400)
         
         doctor = auth_service.register_doctor(data)
-        db_session.close()
         
         return _json_response(True, 'Регистрация успешна', 
                             {'doctor': doctor.to_dict()}, 201)
@@ -63,7 +62,6 @@ def login():
         
         doctor = auth_service.login_doctor(data.get('email'), data.get('password'))
         _update_session(doctor)
-        db_session.close()
         
         return _json_response(True, 'Вход выполнен успешно', 
                             {'doctor': doctor.to_dict()})
@@ -89,7 +87,6 @@ def get_profile():
             session.clear()
             return _json_response(False, 'Пользователь не найден', status_code=404)
         
-        db_session.close()
         return _json_response(True, 'Профиль получен', {'doctor': doctor.to_dict()})
         
     except Exception as e:
@@ -1,8 +1,9 @@
+import json
 from flask import request, session, render_template
-from services.consultation_service import ConsultationService
-from utils.database import get_db_session, login_required
+from services.consultation_service import ConsultationConflictError, ConsultationService
+from utils.database import get_db_session, login_required, read_only
 from utils.consultation_helpers import prepare_consultation_data
-from utils.controller_helpers import json_response, prepare_consultation_patient_data, prepare_consultation_result_data
+from utils.controller_helpers import json_response, json_response_with_fragments, prepare_answer_response, prepare_consultation_patient_data, prepare_consultation_response, prepare_consultation_result_data
 from models.database_models import Consultation
 from sqlalchemy.orm import joinedload
 
@@ -11,6 +12,18 @@ def _get_consultation_service():
     db_session = get_db_session()
     return ConsultationService(db_session), db_session
 
+def _answer_response(result, message, success=True, status_code=200):
+    """Ответ API с состоянием консультации после применения ответов"""
+    response_data, fragments = prepare_answer_response(result)
+    return json_response_with_fragments(success, message, response_data, fragments, status_code=status_code)
+
+def _conflict_response(consultation_service, consultation_id, error):
+    """409 с актуальным состоянием консультации для пересинхронизации клиента"""
+    current = consultation_service.get_current_state(consultation_id)
+    if current is None:
+        return json_response(False, str(error), status_code=409)
+    return _answer_response(current, str(error), success=False, status_code=409)
+
 def consultation_controller(app):
     """Регистрация маршрутов для работы с консультациями"""
 
@@ -19,8 +32,6 @@ def consultation_controller(app):
     def consultation():
         """Страница начала консультации"""
         patient_id = request.args.get('patient_id')
-        db_session = None
-        
         try:
             db_session = get_db_session()
             
@@ -46,24 +57,26 @@ def consultation_controller(app):
             
             consultation_data = {
                 'id': consultation.id,
-                'sub_graph_find_diagnosis': consultation.sub_graph_find_diagnosis
+                'sub_graph_find_diagnosis': consultation.sub_graph_find_diagnosis,
+                'answers': consultation_service.get_answer_history(consultation.id)
             }
+            current = consultation_service.get_current_state(consultation.id)
             
             return render_template('consultation/consultation.html', 
                                  patient=prepare_consultation_patient_data(patient),
-                                 consultation=consultation_data)
+                                 consultation=consultation_data,
+                                 progress=current.progress if current else None,
+                                 prefetch=json.loads(current.prefetch) if current and current.prefetch else None)
             
         except Exception as e:
             print(f"Ошибка при начале консультации: {str(e)}")
             import traceback
             traceback.print_exc()
             return render_template('consultation/consultation.html', patients=[])
-        finally:
-            if db_session:
-                db_session.close()
 
     @app.route('/consultation/result')
     @login_required
+    @read_only
     def consultation_result():
         """Страница результатов консультации"""
         consultation_id = request.args.get('consultation_id')
@@ -71,7 +84,6 @@ def consultation_controller(app):
         if not consultation_id:
             return "Консультация не указана", 400
         
-        db_session = None
         try:
             consultation_service, db_session = _get_consultation_service()
             
@@ -80,7 +92,7 @@ def consultation_controller(app):
                 return "Консультация не найдена", 404
             
             consultation_data = result['consultation']
-            diagnosis_result = prepare_consultation_data(consultation_data)
+            diagnosis_result = prepare_consultation_data(consultation_data, result['diagnosis_result']['qa_history'])
             
             template_data = prepare_consultation_result_data(consultation_data, diagnosis_result)
             
@@ -93,9 +105,6 @@ def consultation_controller(app):
             import traceback
             traceback.print_exc()
             return "Ошибка при загрузке страницы", 500
-        finally:
-            if db_session:
-                db_session.close()
 
     @app.route('/api/consultation/save-answer', methods=['POST'])
     @login_required
@@ -108,38 +117,82 @@ def consultation_controller(app):
             if not data or 'consultation_id' not in data or 'answer' not in data:
                 return json_response(False, 'Отсутствуют обязательные данные', status_code=400)
             
-            consultation = consultation_service.save_consultation_answer(
+            # Прогресс и следующий вопрос приходят вместе с сохранением
+            result = consultation_service.save_consultation_answer(
                 data['consultation_id'],
                 data['answer']
             )
+            next_question = result.next_question
             
-            progress = consultation_service.get_consultation_progress(data['consultation_id'])
-            next_question = consultation_service.get_current_question(data['consultation_id'])
+            print(f"Next question after save: {next_question.to_dict() if next_question else None}")
             
-            print(f"Next question after save: {next_question}")
+            return _answer_response(result, 'Ответ сохранен')
             
-            response_data = {
-                'progress': progress,
-                'next_question': next_question
-            }
+        except ConsultationConflictError as e:
+            # Ответ из другой вкладки записан раньше: этот ответ относится к старому вопросу
+            return _conflict_response(consultation_service, data['consultation_id'], e)
+        except ValueError as e:
+            print(f"ValueError: {str(e)}")
+            return json_response(False, str(e), status_code=400)
+        except Exception as e:
+            print(f"Exception: {str(e)}")
+            import traceback
+            traceback.print_exc()
+            return json_response(False, f'Ошибка при сохранении ответа: {str(e)}', status_code=500)
+
+    @app.route('/api/consultation/sync-answers', methods=['POST'])
+    @login_required
+    def api_sync_answers():
+        """Пакетная синхронизация ответов, пройденных клиентом по предзагруженному поддереву"""
+        consultation_service, db_session = _get_consultation_service()
+        try:
+            data = request.get_json()
+            
+            if not data or 'consultation_id' not in data or not isinstance(data.get('answers'), list):
+                return json_response(False, 'Отсутствуют обязательные данные', status_code=400)
+            
+            result = consultation_service.apply_answers(
+                data['consultation_id'],
+                data['answers'],
+                base_count=data.get('base_count')
+            )
+            return _answer_response(result, f"Сохранено ответов: {len(data['answers'])}")
+            
+        except ConsultationConflictError as e:
+            # Клиент шел от устаревшего состояния: отдаем актуальное для пересинхронизации
+            return _conflict_response(consultation_service, data['consultation_id'], e)
+        except ValueError as e:
+            return json_response(False, str(e), status_code=400)
+        except Exception as e:
+            print(f"Exception: {str(e)}")
+            import traceback
+            traceback.print_exc()
+            return json_response(False, f'Ошибка при синхронизации ответов: {str(e)}', status_code=500)
+
+    @app.route('/api/consultation/<int:consultation_id>/answers:batch', methods=['POST'])
+    @login_required
+    def api_replay_answers(consultation_id):
+        """Повтор полной последовательности ответов одним запросом и одной транзакцией"""
+        consultation_service, db_session = _get_consultation_service()
+        try:
+            data = request.get_json()
+            answers = data.get('answers') if data else None
             
-            if next_question and next_question.get('is_final'):
-                diagnosis_data = consultation.sub_graph_find_diagnosis or {}
-                response_data['diagnosis_candidate'] = diagnosis_data.get('final_diagnosis_candidate')
-                print(f"Diagnosis candidate: {response_data['diagnosis_candidate']}")
+            if not isinstance(answers, list) or not all(isinstance(answer, str) for answer in answers):
+                return json_response(False, 'Ожидается список ответов answers', status_code=400)
             
-            return json_response(True, 'Ответ сохранен', response_data)
+            result = consultation_service.replay_answers(consultation_id, answers)
+            return _answer_response(result, f"Последовательность ответов применена ({len(answers)})")
             
+        except ConsultationConflictError as e:
+            return _conflict_response(consultation_service, consultation_id, e)
         except ValueError as e:
-            print(f"ValueError: {str(e)}")
             return json_response(False, str(e), status_code=400)
         except Exception as e:
             print(f"Exception: {str(e)}")
             import traceback
             traceback.print_exc()
-            return json_response(False, f'Ошибка при сохранении ответа: {str(e)}', status_code=500)
-        finally:
-            db_session.close()
+            return json_response(False, f'Ошибка при применении ответов: {str(e)}', status_code=500)
 
     # Остальные методы остаются аналогичными с заменой _json_response на json_response
     @app.route('/api/consultation/complete', methods=['POST'])
@@ -167,12 +220,12 @@ def consultation_controller(app):
                 }
             })
             
+        except ConsultationConflictError as e:
+            return _conflict_response(consultation_service, data['consultation_id'], e)
         except ValueError as e:
             return json_response(False, str(e), status_code=400)
         except Exception as e:
             return json_response(False, f'Ошибка при завершении консультации: {str(e)}', status_code=500)
-        finally:
-            db_session.close()
 
     @app.route('/api/consultation/<int:consultation_id>')
     @login_required
@@ -185,32 +238,14 @@ def consultation_controller(app):
             if not consultation:
                 return json_response(False, 'Консультация не найдена', status_code=404)
             
-            progress = consultation_service.get_consultation_progress(consultation_id)
-            current_question = consultation_service.get_current_question(consultation_id)
+            current = consultation_service.get_current_state(consultation_id)
+            response_data, fragments = prepare_consultation_response(
+                consultation, consultation_service.get_answer_history(consultation_id), current)
             
-            return json_response(True, 'Данные консультации получены', {
-                'consultation': {
-                    'id': consultation.id,
-                    'patient_id': consultation.patient_id,
-                    'doctor_id': consultation.doctor_id,
-                    'status': consultation.status,
-                    'final_diagnosis': consultation.final_diagnosis,
-                    'sub_graph_find_diagnosis': consultation.sub_graph_find_diagnosis,
-                    'consultation_date': consultation.consultation_date.isoformat() if consultation.consultation_date else None,
-                    'patient': {
-                        'last_name': consultation.patient.last_name,
-                        'first_name': consultation.patient.first_name,
-                        'middle_name': consultation.patient.middle_name
-                    } if consultation.patient else None
-                },
-                'progress': progress,
-                'current_question': current_question
-            })
+            return json_response_with_fragments(True, 'Данные консультации получены', response_data, fragments)
             
         except Exception as e:
             return json_response(False, f'Ошибка при получении данных консультации: {str(e)}', status_code=500)
-        finally:
-            db_session.close()
 
     @app.route('/api/consultation/cancel', methods=['POST'])
     @login_required
@@ -232,12 +267,12 @@ def consultation_controller(app):
                 }
             })
             
+        except ConsultationConflictError as e:
+            return _conflict_response(consultation_service, data['consultation_id'], e)
         except ValueError as e:
             return json_response(False, str(e), status_code=400)
         except Exception as e:
             return json_response(False, f'Ошибка при отмене консультации: {str(e)}', status_code=500)
-        finally:
-            db_session.close()
 
     @app.route('/api/consultation/save-draft', methods=['POST'])
     @login_required
@@ -259,9 +294,9 @@ def consultation_controller(app):
                 }
             })
             
+        except ConsultationConflictError as e:
+            return _conflict_response(consultation_service, data['consultation_id'], e)
         except ValueError as e:
             return json_response(False, str(e), status_code=400)
         except Exception as e:
-            return json_response(False, f'Ошибка при сохранении черновика: {str(e)}', status_code=500)
-        finally:
-            db_session.close()
\ No newline at end of file
+            return json_response(False, f'Ошибка при сохранении черновика: {str(e)}', status_code=500)
\ No newline at end of file
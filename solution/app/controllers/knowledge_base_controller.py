@@ -0,0 +1,57 @@
+from flask import request
+from services.consultation_service import get_diagnosis_service
+from utils.database import login_required
+from utils.controller_helpers import json_response
+
+def knowledge_base_controller(app):
+    """Регистрация маршрутов для справочных запросов к базе знаний"""
+
+    @app.route('/api/knowledge-base/diagnoses')
+    @login_required
+    def api_list_diagnoses():
+        """Список всех диагнозов базы знаний"""
+        diagnosis_service = get_diagnosis_service()
+        diagnoses = diagnosis_service.list_diagnoses()
+        return json_response(True, 'Диагнозы получены', {
+            'diagnoses': diagnoses,
+            'total': len(diagnoses),
+            'kb_hash': diagnosis_service.content_hash
+        })
+
+    @app.route('/api/knowledge-base/diagnoses/paths')
+    @login_required
+    def api_diagnosis_paths():
+        """Пути ответов, ведущие к диагнозу"""
+        name = request.args.get('name', '').strip()
+        if not name:
+            return json_response(False, 'Не указан диагноз', status_code=400)
+        
+        diagnosis_service = get_diagnosis_service()
+        paths = diagnosis_service.find_diagnosis_paths(name)
+        if not paths:
+            return json_response(False, 'Диагноз не найден в базе знаний', status_code=404)
+        
+        return json_response(True, 'Пути к диагнозу получены', {
+            'diagnosis': name,
+            'paths': paths,
+            'kb_hash': diagnosis_service.content_hash
+        })
+
+    @app.route('/api/knowledge-base/questions')
+    @login_required
+    def api_question_nodes():
+        """Узлы дерева, в которых задается вопрос"""
+        text = request.args.get('text', '').strip()
+        if not text:
+            return json_response(False, 'Не указан текст вопроса', status_code=400)
+        
+        diagnosis_service = get_diagnosis_service()
+        node_ids = diagnosis_service.find_question_nodes(text)
+        if not node_ids:
+            return json_response(False, 'Вопрос не найден в базе знаний', status_code=404)
+        
+        return json_response(True, 'Узлы вопроса получены', {
+            'question': text,
+            'node_ids': node_ids,
+            'kb_hash': diagnosis_service.content_hash
+        })
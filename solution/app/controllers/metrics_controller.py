@@ -0,0 +1,9 @@
+from utils.metrics import metrics
+
+def metrics_controller(app):
+    """Регистрация маршрута с метриками процесса"""
+
+    @app.route('/metrics')
+    def metrics_endpoint():
+        """Метрики в текстовом формате Prometheus"""
+        return metrics.render_prometheus(), 200, {'Content-Type': 'text/plain; version=0.0.4; charset=utf-8'}
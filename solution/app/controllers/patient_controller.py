@@ -1,9 +1,10 @@
 from flask import request, session, render_template
-from utils.database import get_db_session, login_required, _calculate_age
+from utils.database import get_db_session, login_required, read_only, _calculate_age
 from sqlalchemy.orm import joinedload
 from models.database_models import Consultation, Patient
-from services.patient_service import PatientService
-from utils.controller_helpers import json_response, prepare_patient_data
+from repositories.patient_queries import SEARCH_LIMIT, TYPEAHEAD_LIMIT
+from services.patient_service import PatientConflictError, PatientService
+from utils.controller_helpers import json_response, parse_limit, parse_page_args, prepare_patient_data, prepare_patients_page_data, prepare_typeahead_data
 
 def _get_patient_service():
     """Вспомогательная функция для получения сервиса пациентов"""
@@ -15,11 +16,17 @@ def patient_controller(app):
 
     @app.route('/patients')
     @login_required
+    @read_only
     def patient_list():
-        """Страница списка пациентов"""
+        """Страница списка пациентов (постранично, сортировка и фильтры на сервере)"""
         patient_service, db_session = _get_patient_service()
+        filters = {'sort': request.args.get('sort') or 'name',
+                   'search': request.args.get('search') or None,
+                   'sex': request.args.get('sex') or None}
         try:
-            patients = patient_service.get_all_patients()
+            page_args = parse_page_args(request.args, default_limit=12)
+            page = patient_service.get_patients_page(**page_args)
+            patients = page.items
             
             # Добавляем возраст для отображения
             for patient in patients:
@@ -28,19 +35,19 @@ def patient_controller(app):
                 else:
                     patient.age = None
             
-            return render_template('patient/patients.html', patients=patients)
+            return render_template('patient/patients.html', patients=patients, total=page.total,
+                                   next_cursor=page.next_cursor, prev_cursor=page.prev_cursor, filters=filters)
             
         except Exception as e:
             print(f"Ошибка при загрузке списка пациентов: {str(e)}")
-            return render_template('patient/patients.html', patients=[])
-        finally:
-            db_session.close()
+            return render_template('patient/patients.html', patients=[], total=None,
+                                   next_cursor=None, prev_cursor=None, filters=filters)
 
     @app.route('/patient/<int:patient_id>/history')
     @login_required
+    @read_only
     def patient_history(patient_id):
         """Страница истории пациента"""
-        db_session = None
         try:
             db_session = get_db_session()
             
@@ -70,18 +77,17 @@ def patient_controller(app):
         except Exception as e:
             print(f"Ошибка при загрузке истории пациента: {str(e)}")
             return "Ошибка при загрузке страницы", 500
-        finally:
-            if db_session:
-                db_session.close()
 
     @app.route('/api/patients/search')
     @login_required
+    @read_only
     def api_search_patients():
-        """Поиск пациентов через API"""
+        """Поиск пациентов через API (лучшие совпадения первыми)"""
         patient_service, db_session = _get_patient_service()
         try:
             search_term = request.args.get('term', '')
-            patients = patient_service.search_patients(search_term)
+            limit = parse_limit(request.args, SEARCH_LIMIT, 100)
+            patients = patient_service.search_patients(search_term, limit=limit)
             
             patients_data = [prepare_patient_data(patient, for_json=True) for patient in patients]
             
@@ -90,10 +96,29 @@ def patient_controller(app):
                 'total': len(patients_data)
             })
             
+        except ValueError as e:
+            return json_response(False, str(e), status_code=400)
+        except Exception as e:
+            return json_response(False, f'Ошибка при поиске пациентов: {str(e)}', status_code=500)
+
+    @app.route('/api/patients/typeahead')
+    @login_required
+    @read_only
+    def api_typeahead_patients():
+        """Подсказки при вводе начала ФИО"""
+        patient_service, db_session = _get_patient_service()
+        try:
+            limit = parse_limit(request.args, TYPEAHEAD_LIMIT, 20)
+            patients = patient_service.typeahead_patients(request.args.get('q', ''), limit)
+            
+            return json_response(True, 'Подсказки получены', {
+                'suggestions': [prepare_typeahead_data(patient) for patient in patients]
+            })
+            
+        except ValueError as e:
+            return json_response(False, str(e), status_code=400)
         except Exception as e:
             return json_response(False, f'Ошибка при поиске пациентов: {str(e)}', status_code=500)
-        finally:
-            db_session.close()
 
     @app.route('/api/patients', methods=['POST'])
     @login_required
@@ -116,30 +141,24 @@ def patient_controller(app):
             return json_response(False, str(e), status_code=400)
         except Exception as e:
             return json_response(False, f'Ошибка при создании пациента: {str(e)}', status_code=500)
-        finally:
-            db_session.close()
 
     @app.route('/api/patients', methods=['GET'])
     @login_required
     def api_get_patients():
-        """Получение списка пациентов врача"""
+        """Получение страницы списка пациентов врача (курсоры after/before)"""
         patient_service, db_session = _get_patient_service()
         try:
             doctor_id = session.get('doctor_id')
-            search_term = request.args.get('search', '')
+            page_args = parse_page_args(request.args, default_limit=50, max_limit=200)
             
-            patients = patient_service.get_doctor_patients(doctor_id)
-            patients_data = [prepare_patient_data(patient, for_json=True) for patient in patients]
+            page = patient_service.get_patients_page(doctor_id=doctor_id, **page_args)
             
-            return json_response(True, 'Пациенты получены', {
-                'patients': patients_data,
-                'total': len(patients_data)
-            })
+            return json_response(True, 'Пациенты получены', prepare_patients_page_data(page))
             
+        except ValueError as e:
+            return json_response(False, str(e), status_code=400)
         except Exception as e:
             return json_response(False, f'Ошибка при получении списка пациентов: {str(e)}', status_code=500)
-        finally:
-            db_session.close()
 
     @app.route('/api/patients/<int:patient_id>', methods=['GET'])
     @login_required
@@ -158,8 +177,6 @@ def patient_controller(app):
             
         except Exception as e:
             return json_response(False, f'Ошибка при получении данных пациента: {str(e)}', status_code=500)
-        finally:
-            db_session.close()
 
     @app.route('/api/patients/<int:patient_id>', methods=['PUT'])
     @login_required
@@ -181,18 +198,21 @@ def patient_controller(app):
                 'patient': prepare_patient_data(patient, for_json=True)
             })
             
+        except PatientConflictError as e:
+            # Отдаем актуальные данные, чтобы клиент показал их вместо своих
+            patient = patient_service.get_patient(patient_id)
+            return json_response(False, str(e), {
+                'patient': prepare_patient_data(patient, for_json=True) if patient else None
+            }, status_code=409)
         except ValueError as e:
             return json_response(False, str(e), status_code=400)
         except Exception as e:
             return json_response(False, f'Ошибка при обновлении данных пациента: {str(e)}', status_code=500)
-        finally:
-            db_session.close()
 
     @app.route('/patient/<int:patient_id>/edit')
     @login_required
     def edit_patient(patient_id):
         """Страница редактирования пациента"""
-        db_session = None
         try:
             db_session = get_db_session()
             
@@ -205,7 +225,4 @@ def patient_controller(app):
             
         except Exception as e:
             print(f"Ошибка при загрузке страницы редактирования пациента: {str(e)}")
-            return "Ошибка при загрузке страницы", 500
-        finally:
-            if db_session:
-                db_session.close()
\ No newline at end of file
+            return "Ошибка при загрузке страницы", 500
\ No newline at end of file
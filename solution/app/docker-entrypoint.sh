@@ -12,6 +12,18 @@ echo "Database is ready!"
 echo "Running database migrations..."
 python -m alembic upgrade head
 
-# Запуск приложения
-echo "Starting application..."
-exec python app.py
\ No newline at end of file
+# Запуск приложения: gunicorn (pre-fork, по умолчанию), asgi (gunicorn с
+# воркерами uvicorn и асинхронным API) или dev (сервер разработки Flask)
+SERVE_MODE="${SERVE_MODE:-gunicorn}"
+echo "Starting application ($SERVE_MODE)..."
+case "$SERVE_MODE" in
+  dev)
+    exec python app.py
+    ;;
+  asgi)
+    exec gunicorn -c gunicorn.conf.py -k uvicorn.workers.UvicornWorker asgi:app
+    ;;
+  *)
+    exec gunicorn -c gunicorn.conf.py app:app
+    ;;
+esac
\ No newline at end of file
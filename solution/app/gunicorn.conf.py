@@ -0,0 +1,36 @@
+"""Настройки gunicorn: pre-fork воркеры с общей базой знаний
+
+Приложение загружается в мастере (preload_app): база знаний и шаблоны
+создаются до fork, и воркеры делят их страницы copy-on-write. После fork
+каждый воркер открывает свои пулы соединений, запускает наблюдение за
+базой знаний и прогревается до приема запросов.
+
+Запуск из каталога solution/app (см. docker-entrypoint.sh):
+    gunicorn app:app                                   # WSGI, потоки gthread
+    gunicorn -k uvicorn.workers.UvicornWorker asgi:app # с асинхронным API
+"""
+import multiprocessing
+import os
+
+# Ставится до загрузки приложения: app.py делает preload вместо запуска наблюдения
+os.environ['APP_PREFORK'] = '1'
+
+bind = f"{os.getenv('HOST', '0.0.0.0')}:{os.getenv('PORT', '8080')}"
+workers = int(os.getenv('WEB_WORKERS', str(min(multiprocessing.cpu_count() * 2 + 1, 8))))
+worker_class = 'gthread'
+threads = int(os.getenv('WEB_THREADS', '4'))
+preload_app = True
+timeout = int(os.getenv('WEB_TIMEOUT', '60'))
+graceful_timeout = int(os.getenv('WEB_GRACEFUL_TIMEOUT', '30'))
+keepalive = int(os.getenv('WEB_KEEPALIVE', '5'))
+accesslog = '-'
+
+def post_fork(server, worker):
+    from utils.serving import after_fork
+    after_fork()
+
+def post_worker_init(worker):
+    # Прогрев после инициализации воркера, до первого accept
+    from app import app
+    from utils.serving import warm_up
+    warm_up(app, connections=min(threads, int(os.getenv('DB_POOL_SIZE', '5'))))
@@ -0,0 +1,190 @@
+"""Утилиты обслуживания базы знаний
+
+Запуск из каталога solution/app:
+    python kb_cli.py compile --input ../statistics/data.json --output ../statistics/data.okg
+    python kb_cli.py diagnoses --input ../statistics/data.okg > diagnoses.jsonl
+    python kb_cli.py validate --input ../statistics/data.okg --workers 4
+    python kb_cli.py batch --input ../statistics/data.okg --paths answers.jsonl > results.jsonl
+    python kb_cli.py optimize --output ../statistics/data.candidate.json --report report.json
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+from models.binary_graph import is_binary_graph_file, load_binary_graph, write_binary_graph
+from models.compiled_graph import CompiledGraph, unpack_path, validate_graph_dict
+from services.graph_validator import validate_graph
+from services.snapshot_store import graph_content_hash
+
+DEFAULT_INPUT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'statistics', 'data.json')
+
+def compile_command(args):
+    """Компиляция data.json в бинарный формат .okg"""
+    started = time.perf_counter()
+    with open(args.input, 'r', encoding='utf-8') as f:
+        knowledge_graph = json.load(f)
+    validate_graph_dict(knowledge_graph)
+
+    graph = CompiledGraph.from_dict(knowledge_graph)
+    output = args.output or os.path.splitext(args.input)[0] + '.okg'
+    # Файл пишется рядом и заменяет прежний только после проверки:
+    # наблюдатель базы знаний не должен увидеть непроверенный граф
+    staged = f"{output}.new"
+    write_binary_graph(graph, staged, graph_content_hash(knowledge_graph))
+
+    # Проверяем, что файл читается и совпадает с исходным графом
+    try:
+        mapped = load_binary_graph(staged)
+        try:
+            matches = len(mapped) == len(graph) and mapped.text(mapped.root) == graph.text(graph.root)
+        finally:
+            mapped.close()
+        if not matches:
+            print("Ошибка: скомпилированный файл не совпадает с исходным графом")
+            return 1
+        os.replace(staged, output)
+    finally:
+        if os.path.exists(staged):
+            os.remove(staged)
+
+    stats = graph.dedup_stats
+    print(f"{output}: {len(graph)} nodes ({stats.saved_nodes} of {stats.source_nodes} shared), {len(graph.texts)} strings, "
+          f"{os.path.getsize(output)} bytes, {time.perf_counter() - started:.3f}s")
+    return 0
+
+def load_graph(path: str) -> CompiledGraph:
+    """Загрузка графа из .okg (через mmap) или из data.json"""
+    if is_binary_graph_file(path):
+        return load_binary_graph(path)
+    with open(path, 'r', encoding='utf-8') as f:
+        return CompiledGraph.from_dict(json.load(f))
+
+def diagnoses_command(args):
+    """Потоковый вывод всех диагнозов с путями (JSON Lines)"""
+    graph = load_graph(args.input)
+    out = sys.stdout
+    for diagnosis, packed in graph.iter_diagnoses():
+        path = packed if args.packed else ','.join(unpack_path(packed))
+        out.write(json.dumps({'diagnosis': diagnosis, 'path': path}, ensure_ascii=False))
+        out.write('\n')
+    return 0
+
+def validate_command(args):
+    """Проверка дерева и вывод отчета"""
+    graph = load_graph(args.input)
+    started = time.perf_counter()
+    report = validate_graph(graph, workers=args.workers)
+    report['missing_text_examples'] = [','.join(unpack_path(packed)) for packed in report['missing_text_examples']]
+    report['elapsed_seconds'] = round(time.perf_counter() - started, 3)
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+    return 0 if report['is_valid'] else 1
+
+def batch_command(args):
+    """Пакетный прогон путей из JSON Lines (поле path, как в выводе diagnoses)"""
+    from services.batch_diagnosis import BatchDiagnoser, paths_to_matrix
+
+    with open(args.paths, 'r', encoding='utf-8') as f:
+        paths = [json.loads(line)['path'] for line in f if line.strip()]
+    diagnoser = BatchDiagnoser(load_graph(args.input))
+    if all(isinstance(path, int) for path in paths):
+        result = diagnoser.run_packed(paths)
+    else:
+        result = diagnoser.run_matrix(paths_to_matrix(
+            path.split(',') if path else [] for path in paths))
+
+    out = sys.stdout
+    for row, path in enumerate(paths):
+        out.write(json.dumps({
+            'path': path,
+            'node_id': int(result.node_ids[row]),
+            'is_final': bool(result.is_final[row]),
+            'answered': int(result.answered[row]),
+            'diagnosis': result.diagnoses[row]
+        }, ensure_ascii=False))
+        out.write('\n')
+    return 0
+
+def _read_consultations(path: str):
+    """Консультации из выгрузки JSON Lines или из базы данных"""
+    if path:
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                if line.strip():
+                    record = json.loads(line)
+                    yield record.get('sub_graph_find_diagnosis') or {}, record.get('final_diagnosis')
+        return
+
+    from repositories.consultation_repository import ConsultationRepository
+    from utils.database import get_db_session
+    db_session = get_db_session()
+    try:
+        yield from ConsultationRepository(db_session).iter_completed_diagnosis_data()
+    finally:
+        db_session.close()
+
+def optimize_command(args):
+    """Перестройка порядка вопросов по статистике завершенных консультаций"""
+    from services.tree_optimizer import optimize_tree
+
+    with open(args.input, 'r', encoding='utf-8') as f:
+        knowledge_graph = json.load(f)
+    validate_graph_dict(knowledge_graph)
+
+    started = time.perf_counter()
+    candidate, report = optimize_tree(CompiledGraph.from_dict(knowledge_graph), knowledge_graph,
+                                      _read_consultations(args.consultations), smoothing=args.smoothing)
+    report['elapsed_seconds'] = round(time.perf_counter() - started, 3)
+
+    output = args.output or os.path.splitext(args.input)[0] + '.candidate.json'
+    tmp_path = f"{output}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(candidate, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, output)
+    report['output'] = output
+
+    report_text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.report:
+        with open(args.report, 'w', encoding='utf-8') as f:
+            f.write(report_text)
+    print(report_text)
+    return 0
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Обслуживание базы знаний")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    compile_parser = commands.add_parser('compile', help="Компиляция data.json в .okg")
+    compile_parser.add_argument('--input', default=DEFAULT_INPUT, help="Путь к data.json")
+    compile_parser.add_argument('--output', help="Путь к .okg (по умолчанию рядом с data.json)")
+    compile_parser.set_defaults(handler=compile_command)
+
+    diagnoses_parser = commands.add_parser('diagnoses', help="Перечисление всех диагнозов с путями")
+    diagnoses_parser.add_argument('--input', default=DEFAULT_INPUT, help="Путь к data.json или .okg")
+    diagnoses_parser.add_argument('--packed', action='store_true', help="Выводить пути упакованными числами")
+    diagnoses_parser.set_defaults(handler=diagnoses_command)
+
+    validate_parser = commands.add_parser('validate', help="Параллельная проверка дерева")
+    validate_parser.add_argument('--input', default=DEFAULT_INPUT, help="Путь к data.json или .okg")
+    validate_parser.add_argument('--workers', type=int, default=None, help="Число процессов (по умолчанию - число CPU)")
+    validate_parser.set_defaults(handler=validate_command)
+
+    batch_parser = commands.add_parser('batch', help="Пакетный прогон путей ответов")
+    batch_parser.add_argument('--input', default=DEFAULT_INPUT, help="Путь к data.json или .okg")
+    batch_parser.add_argument('--paths', required=True, help="JSON Lines с полем path (упакованный или 'yes,no,...')")
+    batch_parser.set_defaults(handler=batch_command)
+
+    optimize_parser = commands.add_parser('optimize', help="Предложение порядка вопросов по статистике консультаций")
+    optimize_parser.add_argument('--input', default=DEFAULT_INPUT, help="Путь к data.json")
+    optimize_parser.add_argument('--consultations', help="Выгрузка консультаций JSON Lines (по умолчанию - из БД)")
+    optimize_parser.add_argument('--output', help="Путь к дереву-кандидату (по умолчанию data.candidate.json)")
+    optimize_parser.add_argument('--report', help="Файл для отчета до/после")
+    optimize_parser.add_argument('--smoothing', type=float, default=0.5, help="Сглаживание частот диагнозов")
+    optimize_parser.set_defaults(handler=optimize_command)
+
+    args = parser.parse_args(argv)
+    return args.handler(args)
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,125 @@
+"""Consultation answers log
+
+Revision ID: 002
+Revises: 001
+Create Date: 2026-10-17 12:00:00.000000
+
+"""
+from datetime import datetime
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '002'
+down_revision = '001'
+branch_labels = None
+depends_on = None
+
+# Сколько консультаций переносить за один проход
+BATCH_SIZE = 500
+
+consultations = sa.table('consultations',
+    sa.column('id', sa.Integer()),
+    sa.column('sub_graph_find_diagnosis', sa.JSON())
+)
+
+consultation_answers = sa.table('consultation_answers',
+    sa.column('consultation_id', sa.Integer()),
+    sa.column('seq', sa.Integer()),
+    sa.column('node', sa.Integer()),
+    sa.column('question', sa.String()),
+    sa.column('answer', sa.String()),
+    sa.column('ts', sa.DateTime())
+)
+
+def _parse_timestamp(value):
+    try:
+        return datetime.fromisoformat(value) if value else None
+    except (TypeError, ValueError):
+        return None
+
+def _question_number(key):
+    return int(key[1:]) if key[1:].isdigit() else 0
+
+def _iter_consultations(connection):
+    """Консультации с данными диагноза порциями по id"""
+    last_id = 0
+    while True:
+        rows = connection.execute(
+            sa.select(consultations.c.id, consultations.c.sub_graph_find_diagnosis)
+            .where(consultations.c.id > last_id)
+            .order_by(consultations.c.id)
+            .limit(BATCH_SIZE)
+        ).fetchall()
+        if not rows:
+            return
+        for row in rows:
+            if row.sub_graph_find_diagnosis:
+                yield row.id, row.sub_graph_find_diagnosis
+        last_id = rows[-1].id
+
+def upgrade() -> None:
+    op.create_table('consultation_answers',
+        sa.Column('consultation_id', sa.Integer(), nullable=False),
+        sa.Column('seq', sa.Integer(), autoincrement=False, nullable=False),
+        sa.Column('node', sa.Integer(), nullable=True),
+        sa.Column('question', sa.String(length=1000), nullable=True),
+        sa.Column('answer', sa.String(length=10), nullable=False),
+        sa.Column('ts', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['consultation_id'], ['consultations.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('consultation_id', 'seq')
+    )
+
+    # Переносим ответы из JSON в журнал, в JSON остается только их число
+    connection = op.get_bind()
+    for consultation_id, diagnosis_data in _iter_consultations(connection):
+        if 'answer_count' in diagnosis_data:
+            continue
+        answers = diagnosis_data.pop('answers', None) or {}
+
+        rows = []
+        for seq, key in enumerate(sorted(answers, key=_question_number), start=1):
+            qa = answers[key] or {}
+            rows.append({
+                'consultation_id': consultation_id,
+                'seq': seq,
+                'node': None,
+                'question': qa.get('question'),
+                'answer': qa.get('answer') or 'unknown',
+                'ts': _parse_timestamp(qa.get('timestamp'))
+            })
+        if rows:
+            connection.execute(consultation_answers.insert(), rows)
+
+        diagnosis_data['answer_count'] = len(rows)
+        connection.execute(
+            consultations.update()
+            .where(consultations.c.id == consultation_id)
+            .values(sub_graph_find_diagnosis=diagnosis_data)
+        )
+
+def downgrade() -> None:
+    # Возвращаем ответы в JSON консультаций
+    connection = op.get_bind()
+    for consultation_id, diagnosis_data in list(_iter_consultations(connection)):
+        rows = connection.execute(
+            sa.select(consultation_answers)
+            .where(consultation_answers.c.consultation_id == consultation_id)
+            .order_by(consultation_answers.c.seq)
+        ).fetchall()
+        diagnosis_data.pop('answer_count', None)
+        diagnosis_data['answers'] = {
+            f"q{row.seq}": {
+                'question': row.question,
+                'answer': row.answer,
+                'timestamp': row.ts.isoformat() if row.ts else None
+            }
+            for row in rows
+        }
+        connection.execute(
+            consultations.update()
+            .where(consultations.c.id == consultation_id)
+            .values(sub_graph_find_diagnosis=diagnosis_data)
+        )
+
+    op.drop_table('consultation_answers')
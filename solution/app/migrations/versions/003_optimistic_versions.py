@@ -0,0 +1,24 @@
+"""Optimistic locking versions
+
+Revision ID: 003
+Revises: 002
+Create Date: 2026-10-17 15:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '003'
+down_revision = '002'
+branch_labels = None
+depends_on = None
+
+def upgrade() -> None:
+    # Счетчики версий для version_id_col: существующие строки получают версию 1
+    op.add_column('consultations', sa.Column('version', sa.Integer(), nullable=False, server_default='1'))
+    op.add_column('patients', sa.Column('version', sa.Integer(), nullable=False, server_default='1'))
+
+def downgrade() -> None:
+    op.drop_column('patients', 'version')
+    op.drop_column('consultations', 'version')
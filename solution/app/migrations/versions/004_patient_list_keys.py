@@ -0,0 +1,33 @@
+"""Patient list keyset indexes
+
+Revision ID: 004
+Revises: 003
+Create Date: 2026-10-17 18:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '004'
+down_revision = '003'
+branch_labels = None
+depends_on = None
+
+def upgrade() -> None:
+    # registered_at входит в ключ сортировки: пустые значения заполняются временем миграции
+    op.execute("UPDATE patients SET registered_at = CURRENT_TIMESTAMP WHERE registered_at IS NULL")
+    with op.batch_alter_table('patients') as batch_op:
+        batch_op.alter_column('registered_at', existing_type=sa.DateTime(), nullable=False)
+
+    op.create_index('ix_patients_name_key', 'patients', ['last_name', 'first_name', 'id'])
+    op.create_index('ix_patients_registered_key', 'patients', ['registered_at', 'id'])
+    op.create_index('ix_consultations_doctor_patient', 'consultations', ['doctor_id', 'patient_id'])
+
+def downgrade() -> None:
+    op.drop_index('ix_consultations_doctor_patient', table_name='consultations')
+    op.drop_index('ix_patients_registered_key', table_name='patients')
+    op.drop_index('ix_patients_name_key', table_name='patients')
+
+    with op.batch_alter_table('patients') as batch_op:
+        batch_op.alter_column('registered_at', existing_type=sa.DateTime(), nullable=True)
@@ -0,0 +1,53 @@
+"""Patient search trigram indexes
+
+Revision ID: 005
+Revises: 004
+Create Date: 2026-10-17 20:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '005'
+down_revision = '004'
+branch_labels = None
+depends_on = None
+
+# Выражение ФИО должно совпадать с patient_name_expr() из repositories/patient_queries.py
+NAME_EXPR = "(last_name || ' ' || first_name || ' ' || coalesce(middle_name, ''))"
+
+def _create_trigram_extension(connection) -> bool:
+    """pg_trgm, если он есть на сервере и хватает прав; иначе поиск идет по индексу процесса"""
+    if not connection.execute(sa.text("SELECT 1 FROM pg_available_extensions WHERE name = 'pg_trgm'")).scalar():
+        print("pg_trgm is not available, patient search will use the in-process index")
+        return False
+    try:
+        with connection.begin_nested():
+            connection.execute(sa.text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+    except sa.exc.DBAPIError as e:
+        print(f"Cannot create pg_trgm ({e.orig}), patient search will use the in-process index")
+        return False
+    return True
+
+def upgrade() -> None:
+    connection = op.get_bind()
+    # SQLite и другие БД ищут по n-граммному индексу процесса (services/patient_search_index.py)
+    if connection.dialect.name != 'postgresql' or not _create_trigram_extension(connection):
+        return
+
+    op.execute(f"CREATE INDEX ix_patients_name_trgm ON patients USING gin ({NAME_EXPR} gin_trgm_ops)")
+    op.execute("CREATE INDEX ix_patients_phone_trgm ON patients USING gin (phone gin_trgm_ops)")
+    op.execute("CREATE INDEX ix_patients_email_trgm ON patients USING gin (email gin_trgm_ops)")
+    # Подсказки: LIKE 'префикс%' по фамилии
+    op.execute("CREATE INDEX ix_patients_last_name_prefix ON patients (lower(last_name) text_pattern_ops)")
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+
+    # Расширение остается: его могут использовать другие объекты базы
+    op.execute("DROP INDEX IF EXISTS ix_patients_last_name_prefix")
+    op.execute("DROP INDEX IF EXISTS ix_patients_email_trgm")
+    op.execute("DROP INDEX IF EXISTS ix_patients_phone_trgm")
+    op.execute("DROP INDEX IF EXISTS ix_patients_name_trgm")
@@ -0,0 +1,129 @@
+import mmap
+import os
+import struct
+import sys
+from array import array
+from typing import Optional
+from models.compiled_graph import CompiledGraph, NO_NODE
+
+# Формат файла .okg (все числа little-endian, секции выровнены по 4 байта):
+#   заголовок   magic, версия формата, число узлов, корень, число строк,
+#               размер пула строк, sha256 канонического JSON исходного графа
+#   yes         int32[число узлов]      id потомка по ответу "да" или -1
+#   no          int32[число узлов]      id потомка по ответу "нет" или -1
+#   text_index  int32[число узлов]      индекс строки в пуле или -1
+#   offsets     uint32[число строк + 1] смещения строк в пуле
+#   pool        UTF-8 байты всех уникальных строк подряд
+MAGIC = b'OKG1'
+FORMAT_VERSION = 1
+HEADER = struct.Struct('<4sIIiII32s')
+
+class StringPool:
+    """Пул строк поверх отображенного в память файла (декодирование по запросу)"""
+
+    def __init__(self, offsets, data):
+        self.offsets = offsets
+        self.data = data
+        self._cache = {}
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, index: int) -> str:
+        text = self._cache.get(index)
+        if text is None:
+            text = bytes(self.data[self.offsets[index]:self.offsets[index + 1]]).decode('utf-8')
+            self._cache[index] = text
+        return text
+
+class MappedGraph(CompiledGraph):
+    """Скомпилированный граф, массивы которого читаются прямо из mmap
+
+    Страницы файла разделяются ОС между всеми процессами, открывшими его.
+    """
+
+    def __init__(self, path: str):
+        with open(path, 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            self._init_from_buffer(memoryview(self._mmap))
+        except Exception:
+            self._mmap.close()
+            raise
+        self.path = path
+
+    def _init_from_buffer(self, buffer):
+        if len(buffer) < HEADER.size:
+            raise ValueError("Файл графа поврежден: нет заголовка")
+        magic, version, node_count, root, string_count, pool_size, digest = HEADER.unpack_from(buffer, 0)
+        if magic != MAGIC or version != FORMAT_VERSION:
+            raise ValueError("Неизвестный формат файла графа")
+
+        offset = HEADER.size
+        sections = []
+        for count, typecode in ((node_count, 'i'), (node_count, 'i'), (node_count, 'i'), (string_count + 1, 'I')):
+            size = count * 4
+            if offset + size > len(buffer):
+                raise ValueError("Файл графа поврежден: секция выходит за границы файла")
+            sections.append(_int_view(buffer[offset:offset + size], typecode))
+            offset += size
+        if offset + pool_size > len(buffer):
+            raise ValueError("Файл графа поврежден: пул строк выходит за границы файла")
+
+        yes, no, text_index, offsets = sections
+        pool = StringPool(offsets, buffer[offset:offset + pool_size])
+        super().__init__(yes, no, text_index, pool, preallocate_views=False)
+        self.root = root if node_count else NO_NODE
+        self.content_hash = digest.hex()
+
+    def close(self):
+        """Освобождение отображения файла"""
+        self.yes = self.no = self.text_index = self.texts = None
+        self._children = {}
+        self._mmap.close()
+
+def _int_view(buffer, typecode: str):
+    """Массив int32 над участком буфера без копирования (если позволяет порядок байт)"""
+    if sys.byteorder == 'little':
+        return buffer.cast(typecode)
+    values = array(typecode, bytes(buffer))
+    values.byteswap()
+    return values
+
+def _int_bytes(values, typecode: str) -> bytes:
+    values = array(typecode, values)
+    if sys.byteorder != 'little':
+        values.byteswap()
+    return values.tobytes()
+
+def write_binary_graph(graph: CompiledGraph, path: str, content_hash: Optional[str] = None):
+    """Запись скомпилированного графа в файл .okg (атомарно через rename)"""
+    encoded = [graph.texts[index].encode('utf-8') for index in range(len(graph.texts))]
+    offsets = array('I', [0])
+    for text in encoded:
+        offsets.append(offsets[-1] + len(text))
+    pool = b''.join(encoded)
+    digest = bytes.fromhex(content_hash) if content_hash else bytes(32)
+
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, FORMAT_VERSION, len(graph), graph.root,
+                            len(encoded), len(pool), digest))
+        f.write(_int_bytes(graph.yes, 'i'))
+        f.write(_int_bytes(graph.no, 'i'))
+        f.write(_int_bytes(graph.text_index, 'i'))
+        f.write(_int_bytes(offsets, 'I'))
+        f.write(pool)
+    os.replace(tmp_path, path)
+
+def load_binary_graph(path: str) -> MappedGraph:
+    """Загрузка графа из файла .okg через mmap"""
+    return MappedGraph(path)
+
+def is_binary_graph_file(path: str) -> bool:
+    """Проверка, что файл имеет формат .okg"""
+    try:
+        with open(path, 'rb') as f:
+            return f.read(len(MAGIC)) == MAGIC
+    except OSError:
+        return False
@@ -0,0 +1,113 @@
+from typing import Dict, Iterable, List, NamedTuple
+from models.compiled_graph import CompiledGraph, NO_NODE
+from models.graph_indexes import normalize_text
+
+ANSWERS = ('yes', 'no', 'unknown')
+
+class FrontierEntry(NamedTuple):
+    """Живая ветка консультации: узел, упакованный путь к нему и вес ветки"""
+    node_id: int
+    packed: int
+    weight: float
+
+class CandidateSets:
+    """Множества достижимых диагнозов для каждого узла (битовые маски)
+
+    Бит i маски узла установлен, если из узла достижим диагноз diagnoses[i].
+    Маски считаются один раз снизу вверх; общие узлы DAG разделяют маску,
+    поэтому интервалы листьев в порядке обхода здесь не подходят.
+    """
+
+    def __init__(self, graph: CompiledGraph):
+        self.graph = graph
+        self.diagnoses: List[str] = []
+        self.bits: List[int] = [0] * len(graph)
+        diagnosis_index: Dict[str, int] = {}
+
+        for node_id in graph.iter_postorder():
+            yes_id, no_id = graph.yes[node_id], graph.no[node_id]
+            if yes_id == NO_NODE and no_id == NO_NODE:
+                text = graph.text(node_id)
+                if text is not None:
+                    if text not in diagnosis_index:
+                        diagnosis_index[text] = len(self.diagnoses)
+                        self.diagnoses.append(text)
+                    self.bits[node_id] = 1 << diagnosis_index[text]
+            else:
+                self.bits[node_id] = ((self.bits[yes_id] if yes_id != NO_NODE else 0) |
+                                      (self.bits[no_id] if no_id != NO_NODE else 0))
+
+    def candidate_mask(self, frontier: Iterable[FrontierEntry]) -> int:
+        """Маска всех диагнозов, достижимых из живых веток"""
+        mask = 0
+        for entry in frontier:
+            mask |= self.bits[entry.node_id]
+        return mask
+
+    def rank(self, frontier: Iterable[FrontierEntry], limit: int = None) -> List[Dict]:
+        """Оставшиеся диагнозы по убыванию оценки вероятности
+
+        Вес ветки делится поровну между достижимыми из нее диагнозами.
+        """
+        scores: Dict[int, float] = {}
+        total = 0.0
+        for entry in frontier:
+            bits = self.bits[entry.node_id]
+            count = bits.bit_count()
+            if not count:
+                continue
+            total += entry.weight
+            share = entry.weight / count
+            while bits:
+                lowest = bits & -bits
+                index = lowest.bit_length() - 1
+                scores[index] = scores.get(index, 0.0) + share
+                bits ^= lowest
+
+        ranked = sorted(scores.items(), key=lambda item: -item[1])
+        if limit is not None:
+            ranked = ranked[:limit]
+        return [{'diagnosis': self.diagnoses[index], 'probability': round(score / total, 4)}
+                for index, score in ranked]
+
+def sort_frontier(graph: CompiledGraph, entries: Iterable[FrontierEntry]) -> List[FrontierEntry]:
+    """Порядок веток: сначала незавершенные по убыванию веса, затем диагнозы"""
+    return sorted(entries, key=lambda entry: (graph.is_final(entry.node_id), -entry.weight))
+
+def advance_frontier(graph: CompiledGraph, frontier: List[FrontierEntry], answer: str) -> List[FrontierEntry]:
+    """Применение ответа к живым веткам консультации
+
+    Вопрос задается по первой ветке; ответ относится ко всем незавершенным
+    веткам с тем же вопросом. Ответ 'unknown' оставляет живыми оба перехода
+    с половиной веса. Ветки, пришедшие в один узел DAG, объединяются.
+    Отсутствие перехода по ответу у первой ветки - ошибка; остальные ветки
+    без такого перехода остаются на месте.
+    """
+    if answer not in ANSWERS:
+        raise ValueError(f"Недопустимый ответ: {answer}")
+    if not frontier or graph.is_final(frontier[0].node_id):
+        raise ValueError("Диагноз уже определен")
+
+    question = normalize_text(graph.text(frontier[0].node_id) or '')
+    merged: Dict[int, FrontierEntry] = {}
+    for entry in frontier:
+        node_id = entry.node_id
+        if graph.is_final(node_id) or normalize_text(graph.text(node_id) or '') != question:
+            moves = [entry]
+        else:
+            steps = ('yes', 'no') if answer == 'unknown' else (answer,)
+            children = [(step, graph.child(node_id, step)) for step in steps]
+            children = [(step, child_id) for step, child_id in children if child_id != NO_NODE]
+            if not children and entry is frontier[0]:
+                raise ValueError("Не удалось получить следующий вопрос")
+            # Ветка без перехода по ответу остается на своем узле
+            moves = [FrontierEntry(child_id, (entry.packed << 1) | (step == 'yes'), entry.weight / len(children))
+                     for step, child_id in children] or [entry]
+
+        for move in moves:
+            existing = merged.get(move.node_id)
+            if existing is not None:
+                move = existing._replace(weight=existing.weight + move.weight)
+            merged[move.node_id] = move
+
+    return sort_frontier(graph, merged.values())
@@ -0,0 +1,298 @@
+import json
+import sys
+from array import array
+from typing import Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+# Идентификатор отсутствующего узла
+NO_NODE = -1
+
+def pack_path(path) -> int:
+    """Упаковка пути ответов в целое число
+
+    Старший единичный бит - маркер начала, далее по биту на шаг (1 - yes, 0 - no).
+    Пустой путь упаковывается в 1.
+    """
+    packed = 1
+    for step in path:
+        packed = (packed << 1) | (1 if step == 'yes' else 0)
+    return packed
+
+def unpack_path(packed: int) -> List[str]:
+    """Распаковка пути ответов из целого числа"""
+    return ['yes' if bit == '1' else 'no' for bit in bin(packed)[3:]]
+
+class GraphNode:
+    """Представление узла скомпилированного графа (без копирования данных)"""
+    __slots__ = ('graph', 'id')
+
+    def __init__(self, graph, node_id: int):
+        self.graph = graph
+        self.id = node_id
+
+    @property
+    def text(self) -> Optional[str]:
+        return self.graph.text(self.id)
+
+    @property
+    def yes(self) -> int:
+        return self.graph.yes[self.id]
+
+    @property
+    def no(self) -> int:
+        return self.graph.no[self.id]
+
+    @property
+    def has_yes(self) -> bool:
+        return self.graph.yes[self.id] != NO_NODE
+
+    @property
+    def has_no(self) -> bool:
+        return self.graph.no[self.id] != NO_NODE
+
+    @property
+    def is_final(self) -> bool:
+        return self.graph.yes[self.id] == NO_NODE and self.graph.no[self.id] == NO_NODE
+
+    def __repr__(self):
+        return f"GraphNode(id={self.id}, text={self.text!r})"
+
+class DedupStats(NamedTuple):
+    """Результат свертки одинаковых поддеревьев при компиляции"""
+    source_nodes: int
+    nodes: int
+    saved_bytes: int
+
+    @property
+    def saved_nodes(self) -> int:
+        return self.source_nodes - self.nodes
+
+def _extra_fields(node: Dict):
+    """Поля узла кроме text/yes/no (узлы с разными полями не объединяются)"""
+    if len(node) <= 3 and all(key in ('text', 'yes', 'no') for key in node):
+        return tuple(sorted(node))
+    return tuple(sorted((key, json.dumps(value, sort_keys=True, ensure_ascii=False))
+                        if key not in ('yes', 'no') else (key, '') for key, value in node.items()))
+
+class CompiledGraph:
+    """Дерево решений, скомпилированное в параллельные массивы
+
+    Узлы пронумерованы в порядке обхода в глубину (корень - 0).
+    Для каждого узла хранятся индексы потомков по ответам yes/no
+    и индекс текста в пуле строк. Одинаковые поддеревья могут быть
+    общими (граф - DAG), поэтому у узла бывает несколько родителей.
+    """
+
+    def __init__(self, yes, no, text_index, texts, preallocate_views: bool = True):
+        self.yes = yes
+        self.no = no
+        self.text_index = text_index
+        self.texts = texts
+        self.root = 0 if len(yes) else NO_NODE
+        self._children = {'yes': self.yes, 'no': self.no}
+        # Для очень больших графов представления узлов создаются по запросу
+        self._views = [GraphNode(self, node_id) for node_id in range(len(yes))] if preallocate_views else None
+        self.dedup_stats = DedupStats(len(yes), len(yes), 0)
+
+    @classmethod
+    def from_dict(cls, graph: Optional[Dict], deduplicate: bool = True, share_dicts: bool = False) -> 'CompiledGraph':
+        """Компиляция вложенного словаря data.json в массивы
+
+        При deduplicate структурно одинаковые поддеревья (текст и потомки
+        совпадают) сворачиваются в один общий узел, и дерево становится
+        DAG. Пути ответов от корня при этом не меняются. При share_dicts
+        повторяющиеся поддеревья заменяются и в самом словаре ссылками на
+        первый экземпляр (каноническое представление JSON не меняется).
+        """
+        if not graph:
+            return cls(array('i'), array('i'), array('i'), [])
+
+        # Сборка снизу вверх: id потомков известны к моменту обработки узла
+        build_yes, build_no, build_text = array('i'), array('i'), array('i')
+        texts = []
+        interned = {}
+        unique = {}
+        unique_dicts = []
+        source_nodes = 0
+        saved_bytes = 0
+        results = []
+        stack = [(graph, None, None, False)]
+        while stack:
+            node, parent, answer, expanded = stack.pop()
+            if not expanded:
+                stack.append((node, parent, answer, True))
+                for child_answer in ('no', 'yes'):
+                    child = node.get(child_answer)
+                    if child is not None:
+                        stack.append((child, node, child_answer, False))
+                continue
+
+            source_nodes += 1
+            no_id = results.pop() if node.get('no') is not None else NO_NODE
+            yes_id = results.pop() if node.get('yes') is not None else NO_NODE
+            text = node.get('text')
+            if text is None:
+                text_id = NO_NODE
+            else:
+                if text not in interned:
+                    interned[text] = len(texts)
+                    texts.append(text)
+                text_id = interned[text]
+
+            key = (text_id, yes_id, no_id, _extra_fields(node)) if deduplicate else None
+            node_id = unique.get(key) if key is not None else None
+            if node_id is None:
+                node_id = len(build_yes)
+                build_yes.append(yes_id)
+                build_no.append(no_id)
+                build_text.append(text_id)
+                if key is not None:
+                    unique[key] = node_id
+                if share_dicts:
+                    unique_dicts.append(node)
+            else:
+                saved_bytes += 3 * build_yes.itemsize
+                if share_dicts:
+                    parent[answer] = unique_dicts[node_id]
+                    saved_bytes += sys.getsizeof(node)
+            results.append(node_id)
+
+        # Перенумерация в порядке обхода в глубину от корня (корень - 0, ветка
+        # 'yes' раньше 'no'); общий узел получает id первого вхождения
+        root = results.pop()
+        new_ids = array('i', [NO_NODE]) * len(build_yes)
+        order = array('i')
+        stack = [root]
+        while stack:
+            old_id = stack.pop()
+            if new_ids[old_id] != NO_NODE:
+                continue
+            new_ids[old_id] = len(order)
+            order.append(old_id)
+            for child_id in (build_no[old_id], build_yes[old_id]):
+                if child_id != NO_NODE:
+                    stack.append(child_id)
+
+        yes = array('i', (new_ids[build_yes[old_id]] if build_yes[old_id] != NO_NODE else NO_NODE for old_id in order))
+        no = array('i', (new_ids[build_no[old_id]] if build_no[old_id] != NO_NODE else NO_NODE for old_id in order))
+        text_index = array('i', (build_text[old_id] for old_id in order))
+        compiled = cls(yes, no, text_index, texts)
+        if compiled._views is not None:
+            saved_bytes += (source_nodes - len(compiled)) * sys.getsizeof(compiled._views[0])
+        compiled.dedup_stats = DedupStats(source_nodes, len(compiled), saved_bytes)
+        return compiled
+
+    def __len__(self) -> int:
+        return len(self.yes)
+
+    def node(self, node_id: int) -> Optional[GraphNode]:
+        """Получение представления узла по id"""
+        if not 0 <= node_id < len(self.yes):
+            return None
+        if self._views is None:
+            return GraphNode(self, node_id)
+        return self._views[node_id]
+
+    def text(self, node_id: int) -> Optional[str]:
+        """Текст вопроса или диагноза узла"""
+        index = self.text_index[node_id]
+        return self.texts[index] if index != NO_NODE else None
+
+    def child(self, node_id: int, answer: str) -> int:
+        """Переход от узла по ответу (NO_NODE если перехода нет)"""
+        children = self._children.get(answer)
+        if children is None or not 0 <= node_id < len(children):
+            return NO_NODE
+        return children[node_id]
+
+    def is_final(self, node_id: int) -> bool:
+        """Является ли узел конечным (диагнозом)"""
+        return self.yes[node_id] == NO_NODE and self.no[node_id] == NO_NODE
+
+    def iter_nodes(self, start: int = None, start_depth: int = 0, start_packed: int = 1) -> Iterator[Tuple[int, int, int]]:
+        """Ленивый обход в глубину: (id узла, глубина, упакованный путь)
+
+        Используется явный стек, поэтому глубина дерева не ограничена
+        пределом рекурсии, а дополнительная память - O(глубины).
+        Общий узел DAG выдается по разу на каждый ведущий к нему путь.
+        """
+        if start is None:
+            start = self.root
+        if start == NO_NODE:
+            return
+
+        node_count = len(self.yes)
+        stack = [(start, start_depth, start_packed)]
+        while stack:
+            node_id, depth, packed = stack.pop()
+            if depth - start_depth > node_count:
+                raise ValueError("Граф содержит цикл")
+            yield node_id, depth, packed
+
+            no_id = self.no[node_id]
+            if no_id != NO_NODE:
+                stack.append((no_id, depth + 1, packed << 1))
+            yes_id = self.yes[node_id]
+            if yes_id != NO_NODE:
+                stack.append((yes_id, depth + 1, (packed << 1) | 1))
+
+    def iter_postorder(self) -> Iterator[int]:
+        """Обход снизу вверх: каждый достижимый узел ровно один раз, после потомков
+
+        Подходит для вычисления свойств узлов по свойствам потомков
+        (общие узлы DAG обрабатываются один раз).
+        """
+        # 0 - не посещен, 1 - потомки в обработке, 2 - обработан
+        state = bytearray(len(self.yes))
+        stack = [self.root] if self.root != NO_NODE else []
+        while stack:
+            node_id = stack[-1]
+            if state[node_id] == 0:
+                state[node_id] = 1
+                for child_id in (self.no[node_id], self.yes[node_id]):
+                    if child_id == NO_NODE:
+                        continue
+                    if state[child_id] == 1:
+                        raise ValueError("Граф содержит цикл")
+                    if state[child_id] == 0:
+                        stack.append(child_id)
+                continue
+
+            stack.pop()
+            if state[node_id] == 1:
+                state[node_id] = 2
+                yield node_id
+
+    def iter_diagnoses(self, start: int = None, start_depth: int = 0, start_packed: int = 1) -> Iterator[Tuple[Optional[str], int]]:
+        """Ленивое перечисление диагнозов: (текст листа, упакованный путь)"""
+        for node_id, _, packed in self.iter_nodes(start, start_depth, start_packed):
+            if self.yes[node_id] == NO_NODE and self.no[node_id] == NO_NODE:
+                yield self.text(node_id), packed
+
+    def resolve_path(self, path: List[str]) -> int:
+        """Поиск id узла по списку ответов от корня"""
+        node_id = self.root
+        for step in path:
+            if node_id == NO_NODE:
+                break
+            node_id = self.child(node_id, step)
+        return node_id
+
+def validate_graph_dict(graph) -> None:
+    """Проверка структуры графа data.json (ValueError при ошибке)"""
+    if not isinstance(graph, dict):
+        raise ValueError("Корень графа должен быть объектом")
+
+    stack = [(graph, 'root')]
+    while stack:
+        node, location = stack.pop()
+        text = node.get('text')
+        if not isinstance(text, str) or not text.strip():
+            raise ValueError(f"Узел {location}: отсутствует текст")
+
+        for answer in ('yes', 'no'):
+            child = node.get(answer)
+            if child is None:
+                continue
+            if not isinstance(child, dict):
+                raise ValueError(f"Узел {location}.{answer}: ожидается объект или null")
+            stack.append((child, f"{location}.{answer}"))
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, Date, Enum, ForeignKey, JSON
+from sqlalchemy import Column, Integer, String, DateTime, Date, Enum, ForeignKey, Index, JSON
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
 import enum
@@ -58,10 +58,18 @@ class Patient(Base):
     current_medications = Column(String(1000))
     family_anamnes = Column(String(1000))
     notes = Column(String(2000))
-    registered_at = Column(DateTime, default=datetime.utcnow)
+    registered_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    version = Column(Integer, nullable=False)  # Оптимистическая блокировка, ведет SQLAlchemy
     
     consultations = relationship("Consultation", back_populates="patient")
     
+    # Ключи постраничного списка (см. repositories/patient_queries.py)
+    __table_args__ = (
+        Index('ix_patients_name_key', 'last_name', 'first_name', 'id'),
+        Index('ix_patients_registered_key', 'registered_at', 'id'),
+    )
+    __mapper_args__ = {'version_id_col': version}
+    
     def get_sex_enum(self):
         """Конвертируем строку в Enum при необходимости"""
         return SexEnum(self.sex) if self.sex else None
@@ -77,10 +85,35 @@ class Consultation(Base):
     final_diagnosis = Column(String(500))
     status = Column(String(20), default='draft')  # Простая строка вместо ENUM
     notes = Column(String(2000))
+    version = Column(Integer, nullable=False)  # Оптимистическая блокировка, ведет SQLAlchemy
     
     doctor = relationship("Doctor", back_populates="consultations")
     patient = relationship("Patient", back_populates="consultations")
     
+    # Фильтр "пациенты врача" в списке пациентов
+    __table_args__ = (
+        Index('ix_consultations_doctor_patient', 'doctor_id', 'patient_id'),
+    )
+    __mapper_args__ = {'version_id_col': version}
+    
     def get_status_enum(self):
         """Конвертируем строку в Enum при необходимости"""
-        return ConsultationStatusEnum(self.status) if self.status else None
\ No newline at end of file
+        return ConsultationStatusEnum(self.status) if self.status else None
+
+class ConsultationAnswer(Base):
+    """Журнал ответов консультации: одна строка на ответ, только вставки"""
+    __tablename__ = 'consultation_answers'
+    
+    consultation_id = Column(Integer, ForeignKey('consultations.id', ondelete='CASCADE'), primary_key=True)
+    seq = Column(Integer, primary_key=True, autoincrement=False)
+    node = Column(Integer)  # id узла графа; у перенесенных из JSON ответов неизвестен
+    question = Column(String(1000))
+    answer = Column(String(10), nullable=False)  # 'yes', 'no', 'unknown'
+    ts = Column(DateTime, default=datetime.utcnow)
+    
+    def to_dict(self):
+        return {
+            'question': self.question,
+            'answer': self.answer,
+            'timestamp': self.ts.isoformat() if self.ts else None
+        }
\ No newline at end of file
@@ -1,6 +1,7 @@
 import json
 import os
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Iterator, Optional, Tuple
+from models.compiled_graph import unpack_path
 
 class DecisionGraph:
     def __init__(self, data_file: str = None):
@@ -65,30 +66,34 @@ class DecisionGraph:
             return current['text']
         return None
     
-    def get_all_possible_diagnoses(self) -> list:
-        """Получение всех возможных диагнозов из графа"""
-        diagnoses = []
+    def iter_all_possible_diagnoses(self) -> Iterator[Tuple[str, int]]:
+        """Ленивое перечисление диагнозов: (диагноз, упакованный путь)
+
+        Обход выполняется с явным стеком без копирования путей, поэтому
+        подходит для очень глубоких и больших деревьев.
+        """
+        if not self.graph:
+            return
         
-        def traverse(node, path):
+        stack = [(self.graph, 1)]
+        while stack:
+            node, packed = stack.pop()
             if node is None:
-                return
-            
-            if 'text' in node:
-                # Если это конечный узел (нет yes/no ответов)
-                if node.get('yes') is None and node.get('no') is None:
-                    diagnoses.append({
-                        'diagnosis': node['text'],
-                        'path': path.copy()
-                    })
+                continue
             
-            if 'yes' in node and node['yes'] is not None:
-                traverse(node['yes'], path + ['yes'])
+            # Если это конечный узел (нет yes/no ответов)
+            if 'text' in node and node.get('yes') is None and node.get('no') is None:
+                yield node['text'], packed
             
-            if 'no' in node and node['no'] is not None:
-                traverse(node['no'], path + ['no'])
-        
-        traverse(self.graph, [])
-        return diagnoses
+            stack.append((node.get('no'), packed << 1))
+            stack.append((node.get('yes'), (packed << 1) | 1))
+    
+    def get_all_possible_diagnoses(self) -> list:
+        """Получение всех возможных диагнозов из графа"""
+        return [
+            {'diagnosis': diagnosis, 'path': unpack_path(packed)}
+            for diagnosis, packed in self.iter_all_possible_diagnoses()
+        ]
 
 # Глобальный экземпляр графа решений
 knowledge_graph = DecisionGraph()
\ No newline at end of file
@@ -0,0 +1,43 @@
+import re
+from typing import Dict, List
+from models.compiled_graph import CompiledGraph
+
+_WHITESPACE = re.compile(r'\s+')
+
+def normalize_text(text: str) -> str:
+    """Нормализация текста для поиска: регистр, ё/е, пробелы, завершающий '?'"""
+    text = _WHITESPACE.sub(' ', text.casefold().replace('ё', 'е')).strip()
+    return text.rstrip('?').rstrip()
+
+class GraphIndexes:
+    """Обратные индексы графа, строятся одним обходом при загрузке
+
+    diagnosis_paths - нормализованный диагноз -> упакованные пути к листьям
+    question_nodes  - нормализованный текст вопроса -> id узлов
+    """
+
+    def __init__(self, graph: CompiledGraph):
+        self.diagnosis_paths: Dict[str, List[int]] = {}
+        self.question_nodes: Dict[str, List[int]] = {}
+        self.diagnosis_names: Dict[str, str] = {}
+
+        for node_id, _, packed in graph.iter_nodes():
+            text = graph.text(node_id)
+            if not text:
+                continue
+            key = normalize_text(text)
+            if graph.is_final(node_id):
+                self.diagnosis_paths.setdefault(key, []).append(packed)
+                self.diagnosis_names.setdefault(key, text)
+            else:
+                nodes = self.question_nodes.setdefault(key, [])
+                if node_id not in nodes:
+                    nodes.append(node_id)
+
+    def find_diagnosis_paths(self, diagnosis: str) -> List[int]:
+        """Упакованные пути ко всем листьям с данным диагнозом"""
+        return self.diagnosis_paths.get(normalize_text(diagnosis), [])
+
+    def find_question_nodes(self, question: str) -> List[int]:
+        """Id всех узлов с данным вопросом"""
+        return self.question_nodes.get(normalize_text(question), [])
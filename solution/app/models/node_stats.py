@@ -0,0 +1,58 @@
+from array import array
+from typing import Dict
+from models.compiled_graph import CompiledGraph, NO_NODE
+
+class NodeStats:
+    """Свойства узлов, вычисленные один раз при загрузке графа
+
+    depth          - глубина первого вхождения узла (в дереве - единственная)
+    min_remaining  - минимум вопросов до диагноза
+    max_remaining  - максимум вопросов до диагноза
+    leaf_count     - число листьев (путей к диагнозам) в поддереве
+    expected_remaining - ожидаемое число вопросов до диагноза при
+                     равновероятных ответах
+    """
+
+    def __init__(self, graph: CompiledGraph):
+        node_count = len(graph)
+        self.depth = array('i', [NO_NODE]) * node_count
+        self.min_remaining = array('i', [0]) * node_count
+        self.max_remaining = array('i', [0]) * node_count
+        self.leaf_count = array('q', [0]) * node_count
+        self.expected_remaining = array('d', [0.0]) * node_count
+
+        for node_id in graph.iter_postorder():
+            children = [child_id for child_id in (graph.yes[node_id], graph.no[node_id]) if child_id != NO_NODE]
+            if not children:
+                self.leaf_count[node_id] = 1
+                continue
+            self.min_remaining[node_id] = 1 + min(self.min_remaining[child_id] for child_id in children)
+            self.max_remaining[node_id] = 1 + max(self.max_remaining[child_id] for child_id in children)
+            # Число путей в DAG может расти экспоненциально - ограничиваем разрядностью
+            self.leaf_count[node_id] = min(sum(self.leaf_count[child_id] for child_id in children), 2 ** 63 - 1)
+            self.expected_remaining[node_id] = 1 + sum(self.expected_remaining[child_id] for child_id in children) / len(children)
+
+        stack = [(graph.root, 0)] if graph.root != NO_NODE else []
+        while stack:
+            node_id, depth = stack.pop()
+            if self.depth[node_id] != NO_NODE:
+                continue
+            self.depth[node_id] = depth
+            for child_id in (graph.no[node_id], graph.yes[node_id]):
+                if child_id != NO_NODE:
+                    stack.append((child_id, depth + 1))
+
+    def progress(self, node_id: int, answered: int) -> Dict:
+        """Прогресс консультации в узле за O(1)"""
+        expected = self.expected_remaining[node_id]
+        total = answered + expected
+        return {
+            'remaining_questions': {
+                'min': self.min_remaining[node_id],
+                'max': self.max_remaining[node_id],
+                'expected': round(expected, 2)
+            },
+            'leaf_count': self.leaf_count[node_id],
+            'expected_remaining': round(expected, 2),
+            'percent_complete': round(100 * answered / total, 1) if total else 100.0
+        }
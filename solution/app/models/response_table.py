@@ -0,0 +1,94 @@
+import json
+from typing import Dict, NamedTuple, Optional, Tuple
+from models.compiled_graph import CompiledGraph, NO_NODE
+
+class QuestionEntry(NamedTuple):
+    """Неизменяемое описание вопроса и его готовое JSON представление"""
+    node_id: int
+    text: str
+    is_final: bool
+    has_yes: bool
+    has_no: bool
+    path: Tuple[str, ...]
+    json_bytes: bytes
+
+    def to_dict(self) -> Dict:
+        """Описание вопроса в виде словаря (формат API)"""
+        return {
+            'text': self.text,
+            'is_final': self.is_final,
+            'has_yes': self.has_yes,
+            'has_no': self.has_no,
+            'path': list(self.path)
+        }
+
+class NodeResponse(NamedTuple):
+    """Описание узла без пути: одно на все пути, ведущие в узел DAG"""
+    text: str
+    is_final: bool
+    has_yes: bool
+    has_no: bool
+    json_prefix: bytes
+
+    @classmethod
+    def build(cls, text: str, is_final: bool, has_yes: bool, has_no: bool):
+        """Создание записи с однократной сериализацией в UTF-8 JSON (без поля path и закрывающей скобки)"""
+        json_prefix = json.dumps({
+            'text': text,
+            'is_final': is_final,
+            'has_yes': has_yes,
+            'has_no': has_no
+        }, ensure_ascii=False, separators=(',', ':')).encode('utf-8')[:-1]
+        return cls(text, is_final, has_yes, has_no, json_prefix)
+
+    def entry(self, node_id: int, path: Tuple[str, ...]) -> QuestionEntry:
+        """Описание вопроса по пути: к готовому JSON узла дописывается путь (только yes/no)"""
+        path_json = ('["' + '","'.join(path) + '"]').encode('ascii') if path else b'[]'
+        return QuestionEntry(node_id, self.text, self.is_final, self.has_yes, self.has_no, path,
+                             b''.join((self.json_prefix, b',"path":', path_json, b'}')))
+
+class ResponseTable:
+    """Таблица id узла -> описание вопроса, построенная один раз при загрузке графа
+
+    Записи хранятся по узлам, а не по путям, поэтому общие поддеревья DAG
+    не размножаются; путь добавляется к готовому JSON узла при выдаче.
+    В ленивом режиме (для очень больших графов) записи строятся при первом
+    обращении и запоминаются, но не более max_lazy_entries штук.
+    """
+
+    def __init__(self, graph: CompiledGraph, default_text: str = 'Вопрос', eager: bool = True,
+                 max_lazy_entries: int = 100000):
+        self.graph = graph
+        self.default_text = default_text
+        self.eager = eager
+        self.max_lazy_entries = max_lazy_entries
+        self.entries: Dict[int, NodeResponse] = {}
+        if eager:
+            for node_id in range(len(graph)):
+                self.entries[node_id] = self._build_node(node_id)
+
+    def _build_node(self, node_id: int) -> NodeResponse:
+        text = self.graph.text(node_id)
+        return NodeResponse.build(
+            text if text is not None else self.default_text,
+            self.graph.is_final(node_id),
+            self.graph.yes[node_id] != NO_NODE,
+            self.graph.no[node_id] != NO_NODE
+        )
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def get(self, path) -> Optional[QuestionEntry]:
+        """Получение описания вопроса по пути ответов"""
+        path = tuple(path)
+        node_id = self.graph.resolve_path(path)
+        if node_id == NO_NODE:
+            return None
+
+        node = self.entries.get(node_id)
+        if node is None:
+            node = self._build_node(node_id)
+            if len(self.entries) < self.max_lazy_entries:
+                self.entries[node_id] = node
+        return node.entry(node_id, path)
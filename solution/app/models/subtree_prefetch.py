@@ -0,0 +1,92 @@
+import json
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional
+from models.compiled_graph import CompiledGraph, NO_NODE
+from models.node_stats import NodeStats
+
+# Ссылка на потомка, который не вошел в отправленное поддерево
+NOT_LOADED = -2
+
+def build_subtree(graph: CompiledGraph, node_stats: NodeStats, root: int, depth: int,
+                  default_text: str = 'Вопрос') -> Optional[Dict]:
+    """Поддерево на depth уровней ниже root в компактной форме
+
+    nodes[i] = [индекс текста, yes, no, мин. вопросов, макс. вопросов,
+    ожидаемое число вопросов]; yes/no - индексы в nodes, NO_NODE для
+    отсутствующего перехода и NOT_LOADED для узлов глубже depth. Корень
+    поддерева - nodes[0]; общие узлы DAG передаются один раз.
+    """
+    if root == NO_NODE or graph.node(root) is None:
+        return None
+
+    local = {root: 0}
+    order = [root]
+    texts, text_index = [], {}
+    nodes = []
+    level, frontier = 0, [root]
+    while frontier:
+        next_frontier = []
+        for node_id in frontier:
+            text = graph.text(node_id)
+            text = text if text is not None else default_text
+            if text not in text_index:
+                text_index[text] = len(texts)
+                texts.append(text)
+
+            links = []
+            for child_id in (graph.yes[node_id], graph.no[node_id]):
+                if child_id == NO_NODE:
+                    links.append(NO_NODE)
+                elif level >= depth:
+                    links.append(NOT_LOADED)
+                else:
+                    if child_id not in local:
+                        local[child_id] = len(order)
+                        order.append(child_id)
+                        next_frontier.append(child_id)
+                    links.append(local[child_id])
+
+            nodes.append([text_index[text], links[0], links[1],
+                          node_stats.min_remaining[node_id], node_stats.max_remaining[node_id],
+                          round(node_stats.expected_remaining[node_id], 2)])
+        frontier = next_frontier
+        level += 1
+
+    return {'depth': depth, 'texts': texts, 'nodes': nodes}
+
+class SubtreeCache:
+    """Сериализованные поддеревья по id корня (для одного снимка графа)
+
+    Хранится не более max_fragments поддеревьев, давно не запрошенные
+    вытесняются по LRU.
+    """
+
+    def __init__(self, graph: CompiledGraph, node_stats: NodeStats, depth: int, max_fragments: int = 10000):
+        self.graph = graph
+        self.node_stats = node_stats
+        self.depth = depth
+        self.max_fragments = max(1, max_fragments)
+        self._fragments: Dict[int, bytes] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._fragments)
+
+    def get(self, node_id: int) -> Optional[bytes]:
+        """Готовый UTF-8 JSON поддерева (строится при первом обращении)"""
+        with self._lock:
+            fragment = self._fragments.get(node_id)
+            if fragment is not None:
+                self._fragments.move_to_end(node_id)
+                return fragment
+
+        subtree = build_subtree(self.graph, self.node_stats, node_id, self.depth)
+        if subtree is None:
+            return None
+        fragment = json.dumps(subtree, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+        with self._lock:
+            self._fragments[node_id] = fragment
+            while len(self._fragments) > self.max_fragments:
+                self._fragments.popitem(last=False)
+        return fragment
@@ -0,0 +1,126 @@
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload
+from models.database_models import Consultation, ConsultationAnswer
+
+class AsyncConsultationRepository:
+    """Асинхронный вариант ConsultationRepository для API на ASGI"""
+
+    def __init__(self, db_session: AsyncSession):
+        self.db_session = db_session
+
+    async def create_consultation(self, consultation_data: dict):
+        """Создание новой консультации"""
+        try:
+            consultation = Consultation(**consultation_data)
+            self.db_session.add(consultation)
+            await self.db_session.commit()
+            await self.db_session.refresh(consultation)
+            return consultation
+        except Exception as e:
+            await self.db_session.rollback()
+            raise e
+
+    async def get_consultation_by_id(self, consultation_id: int):
+        """Получение консультации по ID (пациент и врач загружаются сразу)"""
+        result = await self.db_session.execute(
+            select(Consultation)
+            .options(
+                joinedload(Consultation.patient),
+                joinedload(Consultation.doctor)
+            )
+            .where(Consultation.id == consultation_id)
+        )
+        return result.scalars().first()
+
+    async def append_answers(self, consultation_id: int, answers: list, diagnosis_data: dict, expected_version: int) -> bool:
+        """Вставка строк ответов в журнал и запись состояния с проверкой версии
+
+        См. ConsultationRepository.append_answers.
+        """
+        try:
+            result = await self.db_session.execute(
+                update(Consultation)
+                .where(
+                    Consultation.id == consultation_id,
+                    Consultation.version == expected_version
+                )
+                .values({
+                    Consultation.sub_graph_find_diagnosis: diagnosis_data,
+                    Consultation.version: expected_version + 1
+                })
+                .execution_options(synchronize_session=False)
+            )
+            if not result.rowcount:
+                await self.db_session.rollback()
+                return False
+            self.db_session.add_all([ConsultationAnswer(consultation_id=consultation_id, **answer_data)
+                                     for answer_data in answers])
+            await self.db_session.commit()
+            return True
+        except Exception as e:
+            await self.db_session.rollback()
+            raise e
+
+    async def get_consultation_state(self, consultation_id: int):
+        """Данные диагноза, статус и версия консультации без загрузки связей"""
+        result = await self.db_session.execute(
+            select(Consultation.sub_graph_find_diagnosis, Consultation.status, Consultation.version)
+            .where(Consultation.id == consultation_id)
+        )
+        return result.first()
+
+    async def get_answers(self, consultation_id: int):
+        """Ответы консультации в порядке поступления"""
+        result = await self.db_session.execute(
+            select(ConsultationAnswer)
+            .where(ConsultationAnswer.consultation_id == consultation_id)
+            .order_by(ConsultationAnswer.seq)
+        )
+        return result.scalars().all()
+
+    async def update_consultation(self, consultation_id: int, consultation_data: dict):
+        """Обновление данных консультации (StaleDataError при изменении после чтения)"""
+        try:
+            consultation = await self.get_consultation_by_id(consultation_id)
+            if not consultation:
+                return None
+
+            for key, value in consultation_data.items():
+                if hasattr(consultation, key) and key != 'version':
+                    setattr(consultation, key, value)
+
+            await self.db_session.commit()
+            await self.db_session.refresh(consultation)
+
+            return consultation
+
+        except Exception as e:
+            await self.db_session.rollback()
+            raise e
+
+    async def update_consultation_status(self, consultation_id: int, status: str):
+        """Обновление статуса консультации (с проверкой версии строки)"""
+        try:
+            consultation = await self.get_consultation_by_id(consultation_id)
+            if consultation:
+                consultation.status = status
+                await self.db_session.commit()
+                return consultation
+            return None
+        except Exception as e:
+            await self.db_session.rollback()
+            raise e
+
+    async def get_active_consultation(self, patient_id: int, doctor_id: int):
+        """Получение активной консультации для пациента и врача"""
+        result = await self.db_session.execute(
+            select(Consultation)
+            .where(
+                Consultation.patient_id == patient_id,
+                Consultation.doctor_id == doctor_id,
+                Consultation.status.in_(['draft', 'active'])
+            )
+            .order_by(Consultation.consultation_date.desc())
+        )
+        return result.scalars().first()
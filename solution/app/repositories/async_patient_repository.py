@@ -0,0 +1,130 @@
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm.exc import StaleDataError
+from datetime import datetime
+
+from models.database_models import Patient, Consultation
+from repositories.patient_queries import (
+    SEARCH_LIMIT, TYPEAHEAD_LIMIT, patients_by_ids_query, patients_count_query, patients_estimate_query,
+    patients_page_query, ranked_search_query, search_rows_query, trigram_extension_query, trigram_support,
+    typeahead_query
+)
+
+class AsyncPatientRepository:
+    """Асинхронный вариант PatientRepository для API на ASGI"""
+
+    def __init__(self, db_session: AsyncSession):
+        self.db_session = db_session
+
+    async def search_patients_by_email(self, email: str):
+        """Поиск пациентов по email"""
+        result = await self.db_session.execute(select(Patient).where(Patient.email == email))
+        return result.scalars().all()
+
+    async def create_patient(self, patient_data: dict):
+        """Создание нового пациента"""
+        try:
+            # Преобразуем строку даты в объект datetime
+            if 'birthday' in patient_data and isinstance(patient_data['birthday'], str):
+                patient_data['birthday'] = datetime.strptime(patient_data['birthday'], '%Y-%m-%d').date()
+
+            patient = Patient(**patient_data)
+
+            self.db_session.add(patient)
+            await self.db_session.commit()
+            await self.db_session.refresh(patient)
+
+            return patient
+
+        except Exception as e:
+            await self.db_session.rollback()
+            raise e
+
+    async def get_patient_by_id(self, patient_id: int):
+        """Получение пациента по ID"""
+        result = await self.db_session.execute(select(Patient).where(Patient.id == patient_id))
+        return result.scalars().first()
+
+    async def get_patients_by_doctor(self, doctor_id: int):
+        """Получение всех пациентов врача (через консультации)"""
+        result = await self.db_session.execute(
+            select(Patient).distinct()
+            .join(Patient.consultations)
+            .where(Consultation.doctor_id == doctor_id)
+        )
+        return result.scalars().all()
+
+    async def trigram_search_available(self) -> bool:
+        """Поиск можно отдать GIN индексам pg_trgm (см. PatientRepository.trigram_search_available)"""
+        bind = self.db_session.get_bind()
+        key = str(bind.url)
+        if key not in trigram_support:
+            trigram_support[key] = bind.dialect.name == 'postgresql' and \
+                await self.db_session.scalar(trigram_extension_query()) is not None
+        return trigram_support[key]
+
+    async def search_patients(self, search_term: str, doctor_id: int = None, limit: int = SEARCH_LIMIT):
+        """Ранжированный поиск по ФИО, телефону и email (pg_trgm)"""
+        result = await self.db_session.scalars(ranked_search_query(search_term, doctor_id, limit))
+        return result.all()
+
+    async def typeahead_patients(self, search_term: str, limit: int = TYPEAHEAD_LIMIT):
+        """Подсказки по началу ФИО"""
+        result = await self.db_session.scalars(typeahead_query(search_term, limit))
+        return result.all()
+
+    async def get_search_rows(self):
+        """Строки для внутрипроцессного поискового индекса"""
+        result = await self.db_session.execute(search_rows_query())
+        return result.all()
+
+    async def get_patients_by_ids(self, patient_ids: list, doctor_id: int = None):
+        """Пациенты по списку id в порядке списка"""
+        if not patient_ids:
+            return []
+        result = await self.db_session.scalars(patients_by_ids_query(patient_ids, doctor_id))
+        patients = {patient.id: patient for patient in result}
+        return [patients[patient_id] for patient_id in patient_ids if patient_id in patients]
+
+    async def get_patients_page(self, sort: str = 'name', after: list = None, before: list = None, limit: int = 20,
+                                search: str = None, sex: str = None, doctor_id: int = None):
+        """Страница пациентов по ключу сортировки: до limit + 1 строк (см. patients_page_query)"""
+        result = await self.db_session.scalars(patients_page_query(sort, after, before, limit, search, sex, doctor_id))
+        return result.all()
+
+    async def count_patients(self, search: str = None, sex: str = None, doctor_id: int = None) -> int:
+        """Точное число пациентов по фильтрам"""
+        return await self.db_session.scalar(patients_count_query(search, sex, doctor_id))
+
+    async def estimate_patient_count(self):
+        """Оценка числа пациентов по статистике PostgreSQL (None для других БД и до ANALYZE)"""
+        if self.db_session.get_bind().dialect.name != 'postgresql':
+            return None
+        estimate = await self.db_session.scalar(patients_estimate_query())
+        return estimate if estimate is not None and estimate >= 0 else None
+
+    async def update_patient(self, patient_id: int, patient_data: dict, expected_version: int = None):
+        """Обновление данных пациента с проверкой версии (см. PatientRepository.update_patient)"""
+        try:
+            patient = await self.get_patient_by_id(patient_id)
+            if not patient:
+                return None
+
+            if expected_version is not None and patient.version != expected_version:
+                raise StaleDataError(f"Patient {patient_id} version is {patient.version}, expected {expected_version}")
+
+            if 'birthday' in patient_data and isinstance(patient_data['birthday'], str):
+                patient_data['birthday'] = datetime.strptime(patient_data['birthday'], '%Y-%m-%d').date()
+
+            for key, value in patient_data.items():
+                if hasattr(patient, key) and key != 'version':
+                    setattr(patient, key, value)
+
+            await self.db_session.commit()
+            await self.db_session.refresh(patient)
+
+            return patient
+
+        except Exception as e:
+            await self.db_session.rollback()
+            raise e
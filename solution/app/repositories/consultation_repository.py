@@ -1,5 +1,5 @@
 from sqlalchemy.orm import Session, joinedload
-from models.database_models import Consultation, Patient, Doctor
+from models.database_models import Consultation, ConsultationAnswer, Patient, Doctor
 
 class ConsultationRepository:
     def __init__(self, db_session: Session):
@@ -27,17 +27,62 @@ class ConsultationRepository:
             .filter(Consultation.id == consultation_id)\
             .first()
 
+    def append_answers(self, consultation_id: int, answers: list, diagnosis_data: dict, expected_version: int) -> bool:
+        """Вставка строк ответов в журнал и запись состояния консультации
+
+        Состояние (текущий узел, ветки) не содержит истории ответов, поэтому
+        объем записи на ответ не растет с длиной консультации. UPDATE
+        выполняется без блокировок, только если версия строки все еще
+        expected_version, и увеличивает ее (как version_id_col при flush);
+        иначе строка изменена другим запросом и возвращается False.
+        """
+        try:
+            updated = self.db_session.query(Consultation)\
+                .filter(
+                    Consultation.id == consultation_id,
+                    Consultation.version == expected_version
+                )\
+                .update({
+                    Consultation.sub_graph_find_diagnosis: diagnosis_data,
+                    Consultation.version: expected_version + 1
+                }, synchronize_session=False)
+            if not updated:
+                self.db_session.rollback()
+                return False
+            self.db_session.add_all([ConsultationAnswer(consultation_id=consultation_id, **answer_data)
+                                     for answer_data in answers])
+            self.db_session.commit()
+            return True
+        except Exception as e:
+            self.db_session.rollback()
+            raise e
+
+    def get_consultation_state(self, consultation_id: int):
+        """Данные диагноза, статус и версия консультации без загрузки связей"""
+        return self.db_session.query(Consultation.sub_graph_find_diagnosis, Consultation.status, Consultation.version)\
+            .filter(Consultation.id == consultation_id)\
+            .first()
+
+    def get_answers(self, consultation_id: int):
+        """Ответы консультации в порядке поступления"""
+        return self.db_session.query(ConsultationAnswer)\
+            .filter(ConsultationAnswer.consultation_id == consultation_id)\
+            .order_by(ConsultationAnswer.seq)\
+            .all()
+
     def update_consultation(self, consultation_id: int, consultation_data: dict):
-        """Обновление данных консультации"""
+        """Обновление данных консультации
+
+        UPDATE проверяет версию строки (version_id_col): если консультацию
+        изменили после чтения, выбрасывается StaleDataError.
+        """
         try:
             consultation = self.get_consultation_by_id(consultation_id)
             if not consultation:
                 return None
             
-            
             for key, value in consultation_data.items():
-                if hasattr(consultation, key):
-                    old_value = getattr(consultation, key)
+                if hasattr(consultation, key) and key != 'version':
                     setattr(consultation, key, value)
             
             self.db_session.commit()
@@ -48,13 +93,9 @@ class ConsultationRepository:
         except Exception as e:
             self.db_session.rollback()
             raise e
-                
-        except Exception as e:
-            self.db_session.rollback()
-            raise e
 
     def update_consultation_status(self, consultation_id: int, status: str):
-        """Обновление статуса консультации"""
+        """Обновление статуса консультации (с проверкой версии строки)"""
         try:
             consultation = self.get_consultation_by_id(consultation_id)
             if consultation:
@@ -75,4 +116,33 @@ class ConsultationRepository:
                 Consultation.status.in_(['draft', 'active'])
             )\
             .order_by(Consultation.consultation_date.desc())\
-            .first()
\ No newline at end of file
+            .first()
+
+    def iter_completed_diagnosis_data(self, batch_size: int = 1000):
+        """Потоковое чтение данных диагноза завершенных консультаций
+
+        История ответов собирается из журнала в прежний формат answers
+        слиянием двух потоков, упорядоченных по id консультации.
+        """
+        consultations = self.db_session.query(Consultation.id, Consultation.sub_graph_find_diagnosis, Consultation.final_diagnosis)\
+            .filter(Consultation.status == 'completed')\
+            .order_by(Consultation.id)\
+            .yield_per(batch_size)
+        answers = self.db_session.query(ConsultationAnswer)\
+            .join(Consultation, Consultation.id == ConsultationAnswer.consultation_id)\
+            .filter(Consultation.status == 'completed')\
+            .order_by(ConsultationAnswer.consultation_id, ConsultationAnswer.seq)\
+            .yield_per(batch_size)
+
+        answer_iter = iter(answers)
+        pending = next(answer_iter, None)
+        for consultation_id, diagnosis_data, final_diagnosis in consultations:
+            diagnosis_data = dict(diagnosis_data or {})
+            history = {}
+            while pending is not None and pending.consultation_id <= consultation_id:
+                if pending.consultation_id == consultation_id:
+                    history[f"q{pending.seq}"] = pending.to_dict()
+                pending = next(answer_iter, None)
+            if history:
+                diagnosis_data['answers'] = history
+            yield diagnosis_data, final_diagnosis
@@ -0,0 +1,139 @@
+"""Запросы списка пациентов, общие для PatientRepository и AsyncPatientRepository"""
+from datetime import datetime
+from sqlalchemy import exists, func, literal, literal_column, or_, select, text, tuple_
+from models.database_models import Consultation, Patient
+
+# Порядки списка: столбцы ключа (последний - уникальный id) и убывание.
+# Каждому соответствует индекс из миграции 004, страница читается
+# диапазоном по индексу без OFFSET.
+PATIENT_ORDERINGS = {
+    'name': ((Patient.last_name, Patient.first_name, Patient.id), False),
+    'registered': ((Patient.registered_at, Patient.id), True)
+}
+
+def patient_sort_key(sort: str):
+    """Значения ключа сортировки строки пациента (для курсора)"""
+    columns, _ = PATIENT_ORDERINGS[sort]
+    return lambda patient: tuple(getattr(patient, column.key) for column in columns)
+
+def _cursor_values(sort: str, values: list) -> list:
+    """Значения из курсора в типах столбцов ключа"""
+    columns, _ = PATIENT_ORDERINGS[sort]
+    if len(values) != len(columns):
+        raise ValueError("Некорректный курсор страницы")
+    if sort == 'registered':
+        try:
+            values = [datetime.fromisoformat(values[0]), values[1]]
+        except (TypeError, ValueError):
+            raise ValueError("Некорректный курсор страницы")
+    return values
+
+# Ограничения выдачи поиска и подсказок
+SEARCH_LIMIT = 20
+TYPEAHEAD_LIMIT = 10
+
+def patient_name_expr():
+    """ФИО одной строкой - то же выражение, что в GIN индексе миграции 005
+
+    Разделители встроены в SQL литералами: с параметрами вместо них
+    выражение не совпадет с индексом.
+    """
+    separator = literal_column("' '")
+    return Patient.last_name + separator + Patient.first_name + separator + \
+        func.coalesce(Patient.middle_name, literal_column("''"))
+
+def escape_like(term: str) -> str:
+    """Экранирование % и _ в пользовательском вводе для LIKE (escape='\\')"""
+    return term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+def filter_patients(query, search: str = None, sex: str = None, doctor_id: int = None):
+    """Фильтры списка: подстрока ФИО, пол, пациенты врача (по его консультациям)"""
+    if search:
+        query = query.where(patient_name_expr().ilike(f"%{escape_like(search)}%", escape='\\'))
+    if sex:
+        query = query.where(Patient.sex == sex)
+    if doctor_id:
+        # EXISTS вместо JOIN + DISTINCT: порядок ключа сохраняется, дубликатов нет
+        query = query.where(exists().where(
+            Consultation.patient_id == Patient.id,
+            Consultation.doctor_id == doctor_id
+        ))
+    return query
+
+def patients_page_query(sort: str = 'name', after: list = None, before: list = None, limit: int = 20,
+                        search: str = None, sex: str = None, doctor_id: int = None):
+    """SELECT страницы пациентов по ключу: limit + 1 строк после after или перед before"""
+    if sort not in PATIENT_ORDERINGS:
+        raise ValueError(f"Неизвестный порядок сортировки: {sort}")
+    columns, descending = PATIENT_ORDERINGS[sort]
+    key = tuple_(*columns)
+
+    query = filter_patients(select(Patient), search, sex, doctor_id)
+    for cursor, forward in ((after, True), (before, False)):
+        if cursor is None:
+            continue
+        bound = tuple_(*[literal(value, column.type) for value, column in zip(_cursor_values(sort, cursor), columns)])
+        # Вперед по убыванию и назад по возрастанию - строки с меньшим ключом
+        query = query.where(key < bound if forward == descending else key > bound)
+
+    # Назад читаем в обратном порядке от курсора, страница разворачивается после
+    reverse = descending != (before is not None)
+    return query.order_by(*[column.desc() if reverse else column.asc() for column in columns]).limit(limit + 1)
+
+def patients_count_query(search: str = None, sex: str = None, doctor_id: int = None):
+    """Точное число пациентов по фильтрам"""
+    return filter_patients(select(func.count()).select_from(Patient), search, sex, doctor_id)
+
+def patients_estimate_query():
+    """Оценка числа строк patients по статистике PostgreSQL (без чтения таблицы)"""
+    return text("SELECT reltuples::bigint FROM pg_class WHERE oid = 'patients'::regclass")
+
+# Наличие pg_trgm по URL базы: репозитории проверяют один раз на процесс
+trigram_support = {}
+
+def trigram_extension_query():
+    """Установлено ли расширение pg_trgm"""
+    return text("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")
+
+def ranked_search_query(search: str, doctor_id: int = None, limit: int = SEARCH_LIMIT):
+    """Поиск по ФИО, телефону и email с ранжированием по pg_trgm
+
+    Подстрока (ILIKE) и нечеткое совпадение слов (%>) читаются по GIN
+    индексам миграции 005; выше - строки с большим word_similarity.
+    Только PostgreSQL: там '\\' - экранирующий символ LIKE по умолчанию.
+    """
+    name = patient_name_expr()
+    pattern = f"%{escape_like(search)}%"
+    rank = func.greatest(
+        func.word_similarity(search, name),
+        func.word_similarity(search, func.coalesce(Patient.phone, literal_column("''"))),
+        func.word_similarity(search, func.coalesce(Patient.email, literal_column("''")))
+    )
+    query = filter_patients(select(Patient), doctor_id=doctor_id).where(or_(
+        name.ilike(pattern),
+        name.op('%>')(search),
+        Patient.phone.ilike(pattern),
+        Patient.email.ilike(pattern)
+    ))
+    return query.order_by(rank.desc(), Patient.last_name, Patient.first_name, Patient.id).limit(limit)
+
+def typeahead_query(search: str, limit: int = TYPEAHEAD_LIMIT):
+    """Подсказки по началу ФИО: первое слово - начало фамилии, следующие - имени и отчества
+
+    Префикс фамилии читается по индексу lower(last_name) text_pattern_ops
+    (миграция 005, только PostgreSQL).
+    """
+    words = search.split()
+    query = select(Patient).where(
+        func.lower(Patient.last_name).like(f"{escape_like(words[0].lower())}%"))
+    for column, word in zip((Patient.first_name, Patient.middle_name), words[1:]):
+        query = query.where(column.ilike(f"{escape_like(word)}%"))
+    return query.order_by(Patient.last_name, Patient.first_name, Patient.id).limit(limit)
+
+def search_rows_query():
+    """Поля пациентов для внутрипроцессного n-граммного индекса"""
+    return select(Patient.id, Patient.last_name, Patient.first_name, Patient.middle_name,
+                  Patient.phone, Patient.email)
+
+def patients_by_ids_query(patient_ids: list, doctor_id: int = None):
+    return filter_patients(select(Patient).where(Patient.id.in_(patient_ids)), doctor_id=doctor_id)
@@ -1,8 +1,15 @@
 from sqlalchemy.orm import Session
+from sqlalchemy.orm.exc import StaleDataError
 from datetime import datetime
 
 # Относительные импорты внутри пакета app
 from models.database_models import Patient, Consultation, Doctor
+from repositories.patient_queries import (
+    SEARCH_LIMIT, TYPEAHEAD_LIMIT, patients_by_ids_query, patients_count_query, patients_estimate_query,
+    patients_page_query, ranked_search_query, search_rows_query, trigram_extension_query, trigram_support,
+    typeahead_query
+)
+from utils.database import read_only
 
 class PatientRepository:
     def __init__(self, db_session: Session):
@@ -36,26 +43,12 @@ class PatientRepository:
         """Получение пациента по ID"""
         return self.db_session.query(Patient).filter(Patient.id == patient_id).first()
     
+    @read_only
     def get_all_patients(self):
         """Получение всех пациентов из базы данных"""
         return self.db_session.query(Patient).all()
     
-    def search_patients(self, search_term: str = None):
-        """Поиск пациентов по ФИО"""
-        query = self.db_session.query(Patient)
-        
-        if search_term:
-            search_pattern = f"%{search_term}%"
-            query = query.filter(
-                (Patient.last_name.ilike(search_pattern)) |
-                (Patient.first_name.ilike(search_pattern)) |
-                (Patient.middle_name.ilike(search_pattern)) |
-                (Patient.phone.ilike(search_pattern)) |
-                (Patient.email.ilike(search_pattern))
-            )
-        
-        return query.all()
-
+    @read_only
     def get_patients_by_doctor(self, doctor_id: int):
         """Получение всех пациентов врача (через консультации)"""
         return self.db_session.query(Patient).distinct().\
@@ -63,20 +56,80 @@ class PatientRepository:
             filter(Consultation.doctor_id == doctor_id).\
             all()
 
-    def update_patient(self, patient_id: int, patient_data: dict):
-        """Обновление данных пациента"""
+    @read_only
+    def get_patients_page(self, sort: str = 'name', after: list = None, before: list = None, limit: int = 20,
+                          search: str = None, sex: str = None, doctor_id: int = None):
+        """Страница пациентов по ключу сортировки: до limit + 1 строк (см. patients_page_query)"""
+        return self.db_session.scalars(patients_page_query(sort, after, before, limit, search, sex, doctor_id)).all()
+
+    @read_only
+    def count_patients(self, search: str = None, sex: str = None, doctor_id: int = None) -> int:
+        """Точное число пациентов по фильтрам"""
+        return self.db_session.scalar(patients_count_query(search, sex, doctor_id))
+
+    @read_only
+    def estimate_patient_count(self):
+        """Оценка числа пациентов по статистике PostgreSQL (None для других БД и до ANALYZE)"""
+        if self.db_session.get_bind().dialect.name != 'postgresql':
+            return None
+        estimate = self.db_session.scalar(patients_estimate_query())
+        return estimate if estimate is not None and estimate >= 0 else None
+
+    @read_only
+    def trigram_search_available(self) -> bool:
+        """Поиск можно отдать GIN индексам pg_trgm (PostgreSQL с расширением)"""
+        bind = self.db_session.get_bind()
+        key = str(bind.url)
+        if key not in trigram_support:
+            trigram_support[key] = bind.dialect.name == 'postgresql' and \
+                self.db_session.scalar(trigram_extension_query()) is not None
+        return trigram_support[key]
+
+    @read_only
+    def search_patients(self, search_term: str, doctor_id: int = None, limit: int = SEARCH_LIMIT):
+        """Ранжированный поиск по ФИО, телефону и email (pg_trgm)"""
+        return self.db_session.scalars(ranked_search_query(search_term, doctor_id, limit)).all()
+
+    @read_only
+    def typeahead_patients(self, search_term: str, limit: int = TYPEAHEAD_LIMIT):
+        """Подсказки по началу ФИО"""
+        return self.db_session.scalars(typeahead_query(search_term, limit)).all()
+
+    @read_only
+    def get_search_rows(self):
+        """Строки для внутрипроцессного поискового индекса"""
+        return self.db_session.execute(search_rows_query()).all()
+
+    @read_only
+    def get_patients_by_ids(self, patient_ids: list, doctor_id: int = None):
+        """Пациенты по списку id в порядке списка"""
+        if not patient_ids:
+            return []
+        patients = {patient.id: patient for patient in self.db_session.scalars(patients_by_ids_query(patient_ids, doctor_id))}
+        return [patients[patient_id] for patient_id in patient_ids if patient_id in patients]
+
+    def update_patient(self, patient_id: int, patient_data: dict, expected_version: int = None):
+        """Обновление данных пациента
+
+        expected_version - версия, которую видел клиент; UPDATE дополнительно
+        проверяет версию строки (version_id_col). При расхождении
+        выбрасывается StaleDataError.
+        """
         try:
             patient = self.get_patient_by_id(patient_id)
             if not patient:
                 return None
             
+            if expected_version is not None and patient.version != expected_version:
+                raise StaleDataError(f"Patient {patient_id} version is {patient.version}, expected {expected_version}")
+            
             # Преобразуем дату рождения если нужно
             if 'birthday' in patient_data and isinstance(patient_data['birthday'], str):
                 patient_data['birthday'] = datetime.strptime(patient_data['birthday'], '%Y-%m-%d').date()
             
             # Обновляем поля
             for key, value in patient_data.items():
-                if hasattr(patient, key):
+                if hasattr(patient, key) and key != 'version':
                     setattr(patient, key, value)
             
             self.db_session.commit()
@@ -101,20 +154,3 @@ class PatientRepository:
         except Exception as e:
             self.db_session.rollback()
             raise e
-
-    def search_patients(self, search_term: str, doctor_id: int = None):
-        """Поиск пациентов по ФИО"""
-        query = self.db_session.query(Patient)
-        
-        if search_term:
-            search_pattern = f"%{search_term}%"
-            query = query.filter(
-                (Patient.last_name.ilike(search_pattern)) |
-                (Patient.first_name.ilike(search_pattern)) |
-                (Patient.middle_name.ilike(search_pattern))
-            )
-        
-        if doctor_id:
-            query = query.join(Patient.consultations).filter(Consultation.doctor_id == doctor_id)
-        
-        return query.all()
\ No newline at end of file
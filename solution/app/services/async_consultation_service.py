@@ -0,0 +1,158 @@
+import asyncio
+from typing import List, Optional
+from sqlalchemy.orm.exc import StaleDataError
+from repositories.async_consultation_repository import AsyncConsultationRepository
+from services.consultation_service import AnswerResult, ConsultationConflictError, ConsultationLogic
+from services.consultation_state_cache import ConsultationState
+from services.diagnosis_service import DiagnosisService
+
+class AsyncConsultationService(ConsultationLogic):
+    """Операции API консультаций поверх асинхронного репозитория
+
+    Проверка ответов по графу, прогресс и кэш состояния - общие с
+    ConsultationService (ConsultationLogic); здесь только обращения к БД.
+    Загрузка версии базы знаний из архива и первое построение ее структур
+    выполняются в потоке, чтобы не останавливать цикл событий.
+    """
+
+    def __init__(self, db_session):
+        super().__init__()
+        self.consultation_repository = AsyncConsultationRepository(db_session)
+
+    async def _get_state(self, consultation_id: int) -> Optional[ConsultationState]:
+        """Состояние консультации из кэша, при промахе - из БД"""
+        state = self.state_cache.get(consultation_id)
+        if state is not None:
+            return state
+
+        row = await self.consultation_repository.get_consultation_state(consultation_id)
+        if row is None:
+            return None
+        state = self._state_from_row(row)
+        self._cache_state(consultation_id, state)
+        return state
+
+    async def _get_ready_snapshot(self, diagnosis_data: dict) -> DiagnosisService:
+        """Снимок базы знаний консультации с построенными структурами"""
+        snapshot = self._get_snapshot(diagnosis_data, load=False)
+        if snapshot is not None and snapshot.consultations_ready:
+            return snapshot
+        return await asyncio.to_thread(self._prepare_snapshot, diagnosis_data)
+
+    def _prepare_snapshot(self, diagnosis_data: dict) -> DiagnosisService:
+        snapshot = self._get_snapshot(diagnosis_data)
+        snapshot.prepare_consultations()
+        return snapshot
+
+    async def _get_consultation_or_raise(self, consultation_id: int):
+        """Получение консультации или выброс исключения если не найдена"""
+        consultation = await self.consultation_repository.get_consultation_by_id(consultation_id)
+        if not consultation:
+            raise ValueError("Консультация не найдена")
+        return consultation
+
+    async def save_consultation_answer(self, consultation_id: int, answer: str) -> AnswerResult:
+        """Сохранение ответа на вопрос и переход к следующему"""
+        return await self.apply_answers(consultation_id, [answer])
+
+    async def apply_answers(self, consultation_id: int, answers: List[str], base_count: int = None) -> AnswerResult:
+        """Применение последовательности ответов одной транзакцией (см. ConsultationService.apply_answers)"""
+        if not answers:
+            raise ValueError("Нет ответов для сохранения")
+
+        state = self.state_cache.get(consultation_id)
+        if state is not None:
+            result = await self._apply_answers(consultation_id, state, answers, base_count)
+            if result is not None:
+                return result
+            print(f"Consultation {consultation_id} cached state does not match, reloading")
+            self.state_cache.invalidate(consultation_id)
+
+        row = await self.consultation_repository.get_consultation_state(consultation_id)
+        if row is None:
+            raise ValueError("Консультация не найдена")
+        state = self._state_from_row(row)
+        result = await self._apply_answers(consultation_id, state, answers, base_count)
+        if result is None:
+            raise ConsultationConflictError("Консультация изменена другим запросом")
+        return result
+
+    async def replay_answers(self, consultation_id: int, answers: List[str]) -> AnswerResult:
+        """Повтор полной последовательности ответов (см. ConsultationService.replay_answers)"""
+        state = await self._get_state(consultation_id)
+        if state is None:
+            raise ValueError("Консультация не найдена")
+
+        answer_count = self._get_answer_count(state.diagnosis_data)
+        saved = []
+        if answer_count:
+            saved = [answer.answer for answer in await self.consultation_repository.get_answers(consultation_id)]
+
+        remaining = self._replay_remainder(answers, answer_count, saved)
+        if not remaining:
+            return await self.get_current_state(consultation_id)
+        return await self.apply_answers(consultation_id, remaining, base_count=answer_count)
+
+    async def _apply_answers(self, consultation_id: int, state: ConsultationState, answers: List[str],
+                             base_count: int = None) -> Optional[AnswerResult]:
+        """Применение ответов к состоянию и запись в БД (None - состояние в БД другое)"""
+        snapshot = await self._get_ready_snapshot(state.diagnosis_data)
+        plan = self._plan_answers(state, answers, base_count, snapshot)
+        if plan is None:
+            return None
+
+        result = self._build_result(consultation_id, plan.diagnosis_data, plan.snapshot, state.status, plan.candidates)
+
+        saved = await self.consultation_repository.append_answers(
+            consultation_id, plan.answer_rows, plan.diagnosis_data, expected_version=state.version
+        )
+        if not saved:
+            return None
+        self._cache_state(consultation_id, state._replace(diagnosis_data=plan.diagnosis_data, version=state.version + 1))
+        return result
+
+    async def get_current_state(self, consultation_id: int) -> Optional[AnswerResult]:
+        """Текущее состояние консультации в том же виде, что и после ответа"""
+        state = await self._get_state(consultation_id)
+        if state is None:
+            return None
+
+        diagnosis_data = state.diagnosis_data
+        snapshot = await self._get_ready_snapshot(diagnosis_data)
+        return self._build_result(consultation_id, diagnosis_data, snapshot, state.status)
+
+    async def complete_consultation(self, consultation_id: int, final_diagnosis: str = None, notes: str = None):
+        """Завершение консультации"""
+        consultation = await self._get_consultation_or_raise(consultation_id)
+        consultation_data = self._build_completion(self._get_diagnosis_data(consultation), final_diagnosis, notes)
+        return await self._write_versioned(
+            consultation_id, self.consultation_repository.update_consultation, consultation_data)
+
+    async def cancel_consultation(self, consultation_id: int):
+        """Отмена консультации"""
+        await self._get_consultation_or_raise(consultation_id)
+        return await self._write_versioned(
+            consultation_id, self.consultation_repository.update_consultation_status, 'canceled')
+
+    async def save_as_draft(self, consultation_id: int):
+        """Сохранение консультации как черновика"""
+        consultation = await self._get_consultation_or_raise(consultation_id)
+
+        if consultation.status == 'active':
+            consultation = await self._write_versioned(
+                consultation_id, self.consultation_repository.update_consultation_status, 'draft')
+
+        return consultation
+
+    async def _write_versioned(self, consultation_id: int, write, *args):
+        """Запись через ORM с проверкой версии строки и сбросом кэша состояния"""
+        try:
+            return await write(consultation_id, *args)
+        except StaleDataError:
+            raise ConsultationConflictError("Консультация изменена другим запросом")
+        finally:
+            self.state_cache.invalidate(consultation_id)
+
+    async def get_answer_history(self, consultation_id: int):
+        """История вопросов и ответов консультации из журнала"""
+        return [answer.to_dict() for answer in await self.consultation_repository.get_answers(consultation_id)]
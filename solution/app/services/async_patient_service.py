@@ -0,0 +1,102 @@
+import asyncio
+from sqlalchemy.orm.exc import StaleDataError
+from repositories.async_patient_repository import AsyncPatientRepository
+from repositories.patient_queries import SEARCH_LIMIT, TYPEAHEAD_LIMIT
+from services.patient_search_index import PatientSearchIndex
+from services.patient_service import (SEARCH_INDEX_WAIT_SECONDS, PatientConflictError, PatientLogic,
+                                      get_patient_count_cache, get_patient_search_index)
+from utils.pagination import Page, TotalCount
+
+class AsyncPatientService(PatientLogic):
+    """Операции API пациентов поверх асинхронного репозитория (проверки - как в PatientService)"""
+
+    def __init__(self, db_session):
+        self.patient_repository = AsyncPatientRepository(db_session)
+        self.count_cache = get_patient_count_cache()
+        self.search_index = get_patient_search_index()
+
+    async def create_patient(self, patient_data: dict):
+        """Создание нового пациента с валидацией"""
+        self._validate_new_patient(patient_data)
+
+        if patient_data.get('email') and await self.patient_repository.search_patients_by_email(patient_data['email']):
+            raise ValueError("Пациент с таким email уже существует в системе")
+
+        patient = await self.patient_repository.create_patient(patient_data)
+        self.count_cache.clear()
+        self._index_patient(patient)
+        return patient
+
+    async def get_patient(self, patient_id: int):
+        """Получение пациента по ID"""
+        return await self.patient_repository.get_patient_by_id(patient_id)
+
+    async def get_doctor_patients(self, doctor_id: int):
+        """Получение пациентов врача"""
+        return await self.patient_repository.get_patients_by_doctor(doctor_id)
+
+    async def get_patients_page(self, sort: str = 'name', after: str = None, before: str = None, limit: int = 20,
+                                search: str = None, sex: str = None, doctor_id: int = None, with_total: bool = True) -> Page:
+        """Страница списка пациентов (см. PatientService.get_patients_page)"""
+        after_values, before_values = self._decode_page_cursors(sort, after, before)
+        rows = await self.patient_repository.get_patients_page(sort, after_values, before_values, limit, search, sex, doctor_id)
+        total = await self._count_patients(search, sex, doctor_id) if with_total else None
+        return self._build_patients_page(rows, limit, sort, after_values, before_values, total)
+
+    async def _count_patients(self, search: str = None, sex: str = None, doctor_id: int = None) -> TotalCount:
+        key = self._count_key(search, sex, doctor_id)
+        if not any(key):
+            total = self._estimated_total(await self.patient_repository.estimate_patient_count())
+            if total is not None:
+                return total
+
+        count = self.count_cache.get(key)
+        if count is None:
+            count = await self.patient_repository.count_patients(search, sex, doctor_id)
+            self.count_cache.put(key, count)
+        return TotalCount(count)
+
+    async def search_patients(self, search_term: str, doctor_id: int = None, limit: int = SEARCH_LIMIT):
+        """Поиск пациентов по ФИО, телефону и email (см. PatientService.search_patients)"""
+        search_term = self._search_term(search_term)
+        if not search_term:
+            return []
+        if await self.patient_repository.trigram_search_available():
+            return await self.patient_repository.search_patients(search_term, doctor_id, limit)
+        patient_ids = (await self._get_search_index()).search(search_term, self._index_limit(limit, doctor_id))
+        return (await self.patient_repository.get_patients_by_ids(patient_ids, doctor_id))[:limit]
+
+    async def typeahead_patients(self, search_term: str, limit: int = TYPEAHEAD_LIMIT):
+        """Подсказки по началу фамилии (и имени, отчества через пробел)"""
+        search_term = self._search_term(search_term)
+        if not search_term:
+            return []
+        if await self.patient_repository.trigram_search_available():
+            return await self.patient_repository.typeahead_patients(search_term, limit)
+        return await self.patient_repository.get_patients_by_ids((await self._get_search_index()).typeahead(search_term, limit))
+
+    async def _get_search_index(self) -> PatientSearchIndex:
+        """Индекс процесса (как в PatientService); построение и ожидание - вне цикла событий"""
+        index = self.search_index
+        while index.is_stale():
+            if index.begin_rebuild():
+                try:
+                    rows = await self.patient_repository.get_search_rows()
+                    await asyncio.to_thread(index.rebuild, rows)
+                finally:
+                    index.end_rebuild()
+            elif await asyncio.to_thread(index.wait_ready, SEARCH_INDEX_WAIT_SECONDS):
+                break
+        return index
+
+    async def update_patient(self, patient_id: int, patient_data: dict):
+        """Обновление данных пациента (PatientConflictError при устаревшей версии)"""
+        patient_data, expected_version = self._validate_patient_update(patient_data)
+
+        try:
+            patient = await self.patient_repository.update_patient(patient_id, patient_data, expected_version)
+        except StaleDataError:
+            raise PatientConflictError("Данные пациента изменены другим пользователем")
+
+        self._index_patient(patient)
+        return patient
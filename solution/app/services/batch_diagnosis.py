@@ -0,0 +1,106 @@
+from typing import Iterable, List, NamedTuple
+import numpy as np
+from models.compiled_graph import CompiledGraph, NO_NODE
+
+# Кодировка ответов в матрице: строка обрывается на первом ANSWER_NONE
+ANSWER_YES = 1
+ANSWER_NO = 0
+ANSWER_NONE = -1
+
+class BatchResult(NamedTuple):
+    """Результат пакетного прогона (массивы длины N)"""
+    node_ids: np.ndarray     # id узла, на котором остановилась строка
+    is_final: np.ndarray     # дошла ли строка до диагноза
+    answered: np.ndarray     # сколько ответов строки использовано
+    diagnoses: np.ndarray    # текст диагноза или None
+
+class BatchDiagnoser:
+    """Пакетный прогон наборов ответов по дереву на массивах NumPy
+
+    Все строки спускаются по дереву одновременно: один шаг - одна
+    векторная выборка из массивов yes/no, поэтому число итераций
+    Python равно глубине дерева, а не числу строк.
+    """
+
+    def __init__(self, graph: CompiledGraph):
+        self.graph = graph
+        # frombuffer не копирует массивы (в том числе отображенные в память)
+        self.yes = np.frombuffer(graph.yes, dtype=np.intc)
+        self.no = np.frombuffer(graph.no, dtype=np.intc)
+        self.text_index = np.frombuffer(graph.text_index, dtype=np.intc)
+        self.is_leaf = (self.yes == NO_NODE) & (self.no == NO_NODE)
+        self.texts = np.empty(len(graph.texts) + 1, dtype=object)
+        self.texts[:-1] = [graph.texts[index] for index in range(len(graph.texts))]
+        # Последний элемент - для узлов без текста (text_index == -1)
+        self.texts[-1] = None
+
+    def run_matrix(self, answers) -> BatchResult:
+        """Прогон матрицы ответов N x Q (столбец j - j-й ответ строки)"""
+        answers = np.asarray(answers, dtype=np.int8)
+        if answers.ndim != 2:
+            raise ValueError("Матрица ответов должна быть двумерной")
+        if answers.size and (answers.min() < ANSWER_NONE or answers.max() > ANSWER_YES):
+            raise ValueError("Матрица ответов может содержать только 1, 0 и -1")
+        return self._descend(len(answers), answers.T)
+
+    def run_packed(self, packed) -> BatchResult:
+        """Прогон N упакованных путей (см. pack_path)"""
+        packed = np.asarray(packed, dtype=np.int64)
+        if packed.ndim != 1:
+            raise ValueError("Упакованные пути должны быть одномерным массивом")
+        if packed.size and packed.min() < 1:
+            raise ValueError("Упакованный путь должен быть положительным числом")
+
+        # Длина пути - номер старшего бита (маркера начала пути)
+        lengths = np.zeros(len(packed), dtype=np.int64)
+        rest = packed >> 1
+        while rest.any():
+            lengths += rest > 0
+            rest >>= 1
+        depth = int(lengths.max()) if packed.size else 0
+
+        def columns():
+            for step in range(depth):
+                shift = lengths - 1 - step
+                bits = (packed >> np.maximum(shift, 0)) & 1
+                yield np.where(shift >= 0, bits, ANSWER_NONE)
+
+        return self._descend(len(packed), columns())
+
+    def run_paths(self, paths: Iterable[List[str]]) -> BatchResult:
+        """Прогон списков ответов 'yes'/'no' (как в consultation.current_path)"""
+        return self.run_matrix(paths_to_matrix(paths))
+
+    def _descend(self, count: int, columns) -> BatchResult:
+        nodes = np.full(count, self.graph.root, dtype=np.intc)
+        answered = np.zeros(count, dtype=np.int32)
+        alive = np.full(count, self.graph.root != NO_NODE)
+
+        for column in columns:
+            if not alive.any():
+                break
+            next_nodes = np.where(column == ANSWER_YES, self.yes[nodes], self.no[nodes])
+            # Строка останавливается на пропуске ответа или в листе
+            alive &= (column >= 0) & (next_nodes != NO_NODE)
+            nodes = np.where(alive, next_nodes, nodes)
+            answered += alive
+
+        if self.graph.root == NO_NODE:
+            is_final = np.zeros(count, dtype=bool)
+            diagnoses = np.full(count, None, dtype=object)
+        else:
+            is_final = self.is_leaf[nodes]
+            diagnoses = np.where(is_final, self.texts[self.text_index[nodes]], None)
+        return BatchResult(nodes, is_final, answered, diagnoses)
+
+def paths_to_matrix(paths: Iterable[List[str]]) -> np.ndarray:
+    """Преобразование списков ответов в матрицу, дополненную ANSWER_NONE"""
+    paths = list(paths)
+    width = max((len(path) for path in paths), default=0)
+    matrix = np.full((len(paths), width), ANSWER_NONE, dtype=np.int8)
+    for row, path in enumerate(paths):
+        for column, answer in enumerate(path):
+            if answer not in ('yes', 'no'):
+                raise ValueError(f"Недопустимый ответ: {answer}")
+            matrix[row, column] = ANSWER_YES if answer == 'yes' else ANSWER_NO
+    return matrix
@@ -1,71 +1,353 @@
 import os
-import json
+import threading
 from datetime import datetime
+from typing import Dict, List, NamedTuple, Optional
+from models.candidate_sets import FrontierEntry
+from models.compiled_graph import NO_NODE, pack_path, unpack_path
+from models.response_table import QuestionEntry
+from sqlalchemy.orm.exc import StaleDataError
 from repositories.consultation_repository import ConsultationRepository
-from services.diagnosis_service import DiagnosisService
+from services.consultation_state_cache import ConsultationState, ConsultationStateCache
+from services.diagnosis_service import DiagnosisService, find_knowledge_graph_path
+from services.snapshot_store import SnapshotStore
 
-# Создаем единственный экземпляр DiagnosisService
-_diagnosis_service_instance = None
+# Хранилище снимков базы знаний (создается при первом обращении)
+_snapshot_store = None
+
+# Кэш состояния активных консультаций процесса
+_state_cache = None
+
+# Создание хранилища и кэша при первом обращении из нескольких потоков
+_init_lock = threading.Lock()
+
+# Статусы, при которых состояние консультации держится в кэше
+CACHEABLE_STATUSES = ('active', 'draft')
+
+# Сколько оставшихся диагнозов возвращать с каждым ответом
+MAX_CANDIDATES = 20
+
+class AnswerResult(NamedTuple):
+    """Результат сохранения ответа, посчитанный в памяти без повторных чтений"""
+    consultation_id: int
+    diagnosis_data: Dict
+    candidates: List[Dict]
+    progress: Dict
+    next_question: Optional[QuestionEntry]
+    # Компактное поддерево для локального перехода по ответам (JSON)
+    prefetch: Optional[bytes] = None
+
+class PlannedAnswers(NamedTuple):
+    """Проверенная последовательность ответов, еще не записанная в БД"""
+    diagnosis_data: Dict
+    answer_rows: List[Dict]
+    candidates: List[Dict]
+    snapshot: DiagnosisService
+
+class ConsultationConflictError(ValueError):
+    """Состояние консультации в БД разошлось с ожидаемым клиентом"""
+
+def _get_snapshot_archive_dir():
+    """Каталог архива версий базы знаний"""
+    archive_dir = os.getenv('KNOWLEDGE_BASE_ARCHIVE_DIR')
+    if archive_dir:
+        return archive_dir
+    data_path = find_knowledge_graph_path()
+    return os.path.join(os.path.dirname(data_path), 'snapshots') if data_path else None
+
+def get_snapshot_store() -> SnapshotStore:
+    """Получение хранилища снимков базы знаний
+
+    Первые запросы потоков воркера могут прийти одновременно: база знаний
+    загружается один раз под блокировкой, дальше блокировка не берется.
+    """
+    global _snapshot_store
+    if _snapshot_store is None:
+        with _init_lock:
+            if _snapshot_store is None:
+                store = SnapshotStore(
+                    lambda knowledge_graph=None, data_path=None: DiagnosisService(
+                        data_path=data_path, knowledge_graph=knowledge_graph, version=0),
+                    max_snapshots=int(os.getenv('KNOWLEDGE_BASE_MAX_SNAPSHOTS', '8')),
+                    archive_dir=_get_snapshot_archive_dir()
+                )
+                store.set_current(DiagnosisService())
+                _snapshot_store = store
+    return _snapshot_store
 
 def get_diagnosis_service():
-    """Получение единственного экземпляра DiagnosisService"""
-    global _diagnosis_service_instance
-    if _diagnosis_service_instance is None:
-        _diagnosis_service_instance = DiagnosisService()
-    return _diagnosis_service_instance
+    """Получение текущего снимка DiagnosisService"""
+    return get_snapshot_store().current
 
-class ConsultationService:
-    def __init__(self, db_session):
-        self.consultation_repository = ConsultationRepository(db_session)
+def set_diagnosis_service(service: DiagnosisService):
+    """Атомарная замена снимка базы знаний (запросы в работе сохраняют старый)"""
+    get_snapshot_store().set_current(service)
+
+def get_diagnosis_snapshot(content_hash: str, load: bool = True):
+    """Получение снимка базы знаний по хешу содержимого (при load=False - только из памяти)"""
+    store = get_snapshot_store()
+    return store.get(content_hash) if load else store.peek(content_hash)
+
+def get_consultation_state_cache() -> ConsultationStateCache:
+    """Получение кэша состояния активных консультаций"""
+    global _state_cache
+    if _state_cache is None:
+        with _init_lock:
+            if _state_cache is None:
+                _state_cache = ConsultationStateCache(
+                    max_entries=int(os.getenv('CONSULTATION_CACHE_SIZE', '1024')),
+                    ttl_seconds=float(os.getenv('CONSULTATION_CACHE_TTL', '300'))
+                )
+    return _state_cache
+
+class ConsultationLogic:
+    """Расчеты по состоянию консультации без обращения к БД
+
+    Общая часть ConsultationService и AsyncConsultationService: наследники
+    добавляют чтение и запись через свой репозиторий.
+    """
+
+    def __init__(self):
+        # Снимок базы знаний фиксируется на время обработки запроса
         self.diagnosis_service = get_diagnosis_service()
+        self.state_cache = get_consultation_state_cache()
 
-    def _get_consultation_or_raise(self, consultation_id: int):
-        """Получение консультации или выброс исключения если не найдена"""
-        consultation = self.consultation_repository.get_consultation_by_id(consultation_id)
-        if not consultation:
-            raise ValueError("Консультация не найдена")
-        return consultation
+    def _state_from_row(self, row) -> ConsultationState:
+        """Состояние консультации из строки с данными диагноза, статусом и версией"""
+        return ConsultationState(row.sub_graph_find_diagnosis or {}, row.status, row.version)
+
+    def _cache_state(self, consultation_id: int, state: ConsultationState):
+        """Запись состояния в кэш, пока консультация не завершена"""
+        if state.status in CACHEABLE_STATUSES:
+            self.state_cache.put(consultation_id, state)
 
     def _get_diagnosis_data(self, consultation):
         """Получение данных диагноза из консультации"""
         return consultation.sub_graph_find_diagnosis or {}
 
+    def _get_snapshot(self, diagnosis_data: dict, load: bool = True) -> Optional[DiagnosisService]:
+        """Получение снимка базы знаний, на котором начата консультация
+
+        При load=False снимок берется только из памяти: None означает, что
+        версию нужно загрузить из архива.
+        """
+        content_hash = diagnosis_data.get('kb_hash')
+        if content_hash is None or content_hash == self.diagnosis_service.content_hash:
+            return self.diagnosis_service
+        
+        snapshot = get_diagnosis_snapshot(content_hash, load)
+        if snapshot is None and not load:
+            return None
+        if snapshot is None:
+            # Версия недоступна: путь будет заново разрешен по текущему графу
+            print(f"Knowledge base snapshot {content_hash} unavailable, using current")
+            return self.diagnosis_service
+        return snapshot
+
+    def _get_current_node_id(self, diagnosis_data: dict, snapshot: DiagnosisService) -> int:
+        """Получение id текущего узла графа консультации"""
+        node_id = diagnosis_data.get('current_node')
+        if node_id is None or diagnosis_data.get('kb_hash') != snapshot.content_hash:
+            # Консультации, начатые до компиляции графа или на недоступной
+            # версии базы знаний, заново находят узел по пути
+            node_id = snapshot.resolve_path(diagnosis_data.get('current_path', []))
+        return node_id
+
+    def _get_frontier(self, diagnosis_data: dict, snapshot: DiagnosisService):
+        """Получение живых веток консультации
+
+        Пока не было ответа 'unknown', ветка одна - текущий узел.
+        """
+        stored = diagnosis_data.get('frontier')
+        if not stored:
+            node_id = self._get_current_node_id(diagnosis_data, snapshot)
+            if node_id == NO_NODE:
+                return []
+            return [FrontierEntry(node_id, pack_path(diagnosis_data.get('current_path', [])), 1.0)]
+        
+        frontier = [FrontierEntry(*entry) for entry in stored]
+        if diagnosis_data.get('kb_hash') != snapshot.content_hash:
+            # Версия базы знаний недоступна: узлы веток находятся заново по путям
+            frontier = [entry._replace(node_id=snapshot.resolve_path(unpack_path(entry.packed)))
+                        for entry in frontier]
+            frontier = [entry for entry in frontier if entry.node_id != NO_NODE]
+        return frontier
+
     def _create_initial_diagnosis_data(self, first_question: dict):
         """Создание начальных данных диагноза"""
         return {
             'current_path': [],
+            'current_node': self.diagnosis_service.get_root_node_id(),
+            'frontier': [list(entry) for entry in self.diagnosis_service.get_initial_frontier()],
+            'kb_hash': self.diagnosis_service.content_hash,
             'current_question': first_question['text'],
-            'answers': {},
+            'answer_count': 0,
             'started_at': datetime.utcnow().isoformat()
         }
 
-    def _update_diagnosis_after_answer(self, diagnosis_data: dict, current_question: dict, answer: str, next_question: dict):
-        """Обновление данных диагноза после ответа"""
-        # Сохраняем ответ в историю
-        question_number = len(diagnosis_data.get('answers', {})) + 1
-        question_key = f"q{question_number}"
-        
-        if 'answers' not in diagnosis_data:
-            diagnosis_data['answers'] = {}
-        
-        diagnosis_data['answers'][question_key] = {
-            'question': current_question['text'],
+    def _get_answer_count(self, diagnosis_data: dict) -> int:
+        """Число ответов консультации (сами ответы хранятся в журнале)"""
+        return diagnosis_data.get('answer_count', len(diagnosis_data.get('answers', {})))
+
+    def _update_diagnosis_after_answer(self, diagnosis_data: dict, snapshot: DiagnosisService, current_node, answer: str,
+                                       frontier, candidates):
+        """Обновление данных диагноза после ответа
+
+        Возвращает новое состояние консультации и строку журнала ответов.
+        """
+        answer_count = self._get_answer_count(diagnosis_data) + 1
+        answer_data = {
+            'seq': answer_count,
+            'node': current_node.id,
+            'question': current_node.text or 'Вопрос',
             'answer': answer,
-            'timestamp': datetime.utcnow().isoformat()
+            'ts': datetime.utcnow()
         }
         
-        # Обновляем путь и вопрос
+        # Текущим становится узел первой ветки (вопрос задается по нему)
+        next_node = snapshot.get_node(frontier[0].node_id)
         updated_diagnosis_data = diagnosis_data.copy()
-        updated_diagnosis_data['current_path'] = next_question['path']
-        updated_diagnosis_data['current_question'] = next_question['text']
-        
-        # Если достигли конечного диагноза
-        if next_question['is_final']:
-            diagnosis = self.diagnosis_service.get_diagnosis(next_question['path'])
-            updated_diagnosis_data['final_diagnosis_candidate'] = diagnosis
+        updated_diagnosis_data['answer_count'] = answer_count
+        updated_diagnosis_data['current_path'] = unpack_path(frontier[0].packed)
+        updated_diagnosis_data['current_node'] = next_node.id
+        updated_diagnosis_data['frontier'] = [list(entry) for entry in frontier]
+        updated_diagnosis_data['kb_hash'] = snapshot.content_hash
+        updated_diagnosis_data['current_question'] = next_node.text or 'Следующий вопрос'
+        
+        # Если все ветки дошли до диагнозов - берем наиболее вероятный
+        if next_node.is_final:
+            updated_diagnosis_data['final_diagnosis_candidate'] = candidates[0]['diagnosis'] if candidates else next_node.text
             updated_diagnosis_data['completed_at'] = datetime.utcnow().isoformat()
         
-        return updated_diagnosis_data
+        return updated_diagnosis_data, answer_data
+
+    def _plan_answers(self, state: ConsultationState, answers: List[str], base_count: int = None,
+                      snapshot: DiagnosisService = None) -> Optional[PlannedAnswers]:
+        """Проверка последовательности ответов по графу и новое состояние
+
+        Возвращает None, если base_count не совпадает с числом ответов.
+        """
+        diagnosis_data = state.diagnosis_data
+        answer_count = self._get_answer_count(diagnosis_data)
+        if base_count is not None and base_count != answer_count:
+            return None
+        
+        if snapshot is None:
+            snapshot = self._get_snapshot(diagnosis_data)
+        updated_diagnosis_data = diagnosis_data
+        answer_rows = []
+        candidates = []
+        for index, answer in enumerate(answers, start=1):
+            frontier = self._get_frontier(updated_diagnosis_data, snapshot)
+            
+            # Получаем текущий вопрос для сохранения
+            current_node = snapshot.get_node(frontier[0].node_id) if frontier else None
+            if current_node is None:
+                raise ValueError("Текущий вопрос не найден")
+            
+            # Переводим живые ветки по ответу и пересчитываем кандидатов
+            try:
+                frontier = snapshot.advance_frontier(frontier, answer)
+            except ValueError as e:
+                raise ValueError(f"Ответ {index}: {e}" if len(answers) > 1 else str(e))
+            candidates = snapshot.rank_candidates(frontier, MAX_CANDIDATES)
+            
+            # Обновляем данные диагноза
+            updated_diagnosis_data, answer_data = self._update_diagnosis_after_answer(
+                updated_diagnosis_data, snapshot, current_node, answer, frontier, candidates
+            )
+            answer_rows.append(answer_data)
+        
+        return PlannedAnswers(updated_diagnosis_data, answer_rows, candidates, snapshot)
+
+    def _replay_remainder(self, answers: List[str], answer_count: int, saved: List[str]) -> List[str]:
+        """Часть последовательности после уже сохраненных ответов"""
+        if answer_count and answers[:answer_count] != saved:
+            raise ConsultationConflictError("Сохраненные ответы не совпадают с началом последовательности")
+        return answers[answer_count:]
+
+    def _build_completion(self, diagnosis_data: dict, final_diagnosis: str = None, notes: str = None) -> dict:
+        """Поля консультации при завершении"""
+        if not final_diagnosis and 'final_diagnosis_candidate' in diagnosis_data:
+            final_diagnosis = diagnosis_data['final_diagnosis_candidate']
+        
+        # Обновляем данные консультации
+        consultation_data = {
+            'status': 'completed',
+            'final_diagnosis': final_diagnosis,
+            'notes': notes
+        }
+        
+        if 'completed_at' not in diagnosis_data:
+            diagnosis_data['completed_at'] = datetime.utcnow().isoformat()
+        
+        consultation_data['sub_graph_find_diagnosis'] = diagnosis_data
+        return consultation_data
+
+    def _build_result(self, consultation_id: int, diagnosis_data: dict, snapshot: DiagnosisService, status: str,
+                      candidates: List[Dict] = None) -> AnswerResult:
+        """Прогресс, следующий вопрос и поддерево для предзагрузки по состоянию"""
+        frontier = self._get_frontier(diagnosis_data, snapshot)
+        if candidates is None:
+            candidates = snapshot.rank_candidates(frontier, MAX_CANDIDATES) if frontier else []
+        
+        # Локально можно идти только по единственной ветке (после 'unknown'
+        # следующий вопрос зависит от весов веток и считается на сервере)
+        prefetch = None
+        if len(frontier) == 1 and not snapshot.graph.is_final(frontier[0].node_id):
+            prefetch = snapshot.get_subtree_json(frontier[0].node_id)
+        
+        return AnswerResult(
+            consultation_id=consultation_id,
+            diagnosis_data=diagnosis_data,
+            candidates=candidates,
+            progress=self._build_progress(diagnosis_data, snapshot, status == 'completed'),
+            next_question=snapshot.get_question_entry(diagnosis_data.get('current_path', [])),
+            prefetch=prefetch
+        )
+
+    def _build_progress(self, diagnosis_data: dict, snapshot: DiagnosisService, is_completed: bool):
+        """Прогресс консультации по данным диагноза"""
+        total_questions = self._get_answer_count(diagnosis_data)
+        
+        # Получаем актуальный текущий вопрос
+        current_node = snapshot.get_node(self._get_current_node_id(diagnosis_data, snapshot))
+        current_question = current_node.text if current_node and current_node.text is not None else diagnosis_data.get('current_question', '')
+        
+        progress = {
+            'current_question': current_question,
+            'questions_answered': total_questions,
+            'depth': len(diagnosis_data.get('current_path', [])),
+            'is_completed': is_completed
+        }
+        if current_node is not None:
+            # Оценка оставшихся вопросов - поиск в предвычисленных массивах
+            progress.update(snapshot.get_progress(current_node.id, total_questions))
+        return progress
+
+class ConsultationService(ConsultationLogic):
+    def __init__(self, db_session):
+        super().__init__()
+        self.consultation_repository = ConsultationRepository(db_session)
+
+    def _get_state(self, consultation_id: int) -> Optional[ConsultationState]:
+        """Состояние консультации из кэша, при промахе - из БД"""
+        state = self.state_cache.get(consultation_id)
+        if state is not None:
+            return state
+        
+        row = self.consultation_repository.get_consultation_state(consultation_id)
+        if row is None:
+            return None
+        state = self._state_from_row(row)
+        self._cache_state(consultation_id, state)
+        return state
+
+    def _get_consultation_or_raise(self, consultation_id: int):
+        """Получение консультации или выброс исключения если не найдена"""
+        consultation = self.consultation_repository.get_consultation_by_id(consultation_id)
+        if not consultation:
+            raise ValueError("Консультация не найдена")
+        return consultation
 
     def start_consultation(self, patient_id: int, doctor_id: int):
         """Начало новой консультации"""
@@ -87,95 +369,140 @@ class ConsultationService:
             'sub_graph_find_diagnosis': self._create_initial_diagnosis_data(first_question)
         }
         
-        return self.consultation_repository.create_consultation(consultation_data)
+        consultation = self.consultation_repository.create_consultation(consultation_data)
+        self.state_cache.put(consultation.id, ConsultationState(
+            consultation_data['sub_graph_find_diagnosis'], 'active', consultation.version))
+        return consultation
 
-    def save_consultation_answer(self, consultation_id: int, answer: str):
-        """Сохранение ответа на вопрос и переход к следующему"""
-        consultation = self._get_consultation_or_raise(consultation_id)
-        diagnosis_data = self._get_diagnosis_data(consultation)
-        current_path = diagnosis_data.get('current_path', [])
+    def save_consultation_answer(self, consultation_id: int, answer: str) -> AnswerResult:
+        """Сохранение ответа на вопрос и переход к следующему
+
+        Ответ 'unknown' оставляет живыми обе ветки.
+        """
+        return self.apply_answers(consultation_id, [answer])
+
+    def apply_answers(self, consultation_id: int, answers: List[str], base_count: int = None) -> AnswerResult:
+        """Применение последовательности ответов одной транзакцией
+
+        Состояние берется из кэша; при промахе - одно чтение строки
+        консультации без блокировки. Последовательность проверяется по графу
+        целиком до записи, затем ответы вставляются в журнал и состояние
+        обновляется одним UPDATE с проверкой версии строки: конкурентная
+        запись дает ConsultationConflictError, а не ожидание блокировки.
+        Прогресс и следующий вопрос считаются по обновленным данным в
+        памяти. base_count - число ответов,
+        после которого клиент набрал последовательность: при расхождении
+        ничего не записывается и выбрасывается ConsultationConflictError.
+        """
+        if not answers:
+            raise ValueError("Нет ответов для сохранения")
+        
+        state = self.state_cache.get(consultation_id)
+        if state is not None:
+            result = self._apply_answers(consultation_id, state, answers, base_count)
+            if result is not None:
+                return result
+            # Состояние в кэше разошлось с БД или с клиентом: проверяем по БД
+            print(f"Consultation {consultation_id} cached state does not match, reloading")
+            self.state_cache.invalidate(consultation_id)
+        
+        row = self.consultation_repository.get_consultation_state(consultation_id)
+        if row is None:
+            raise ValueError("Консультация не найдена")
+        state = self._state_from_row(row)
+        result = self._apply_answers(consultation_id, state, answers, base_count)
+        if result is None:
+            raise ConsultationConflictError("Консультация изменена другим запросом")
+        return result
+
+    def replay_answers(self, consultation_id: int, answers: List[str]) -> AnswerResult:
+        """Повтор полной последовательности ответов (ввод с бумажной карты, возобновление)
+
+        Если часть последовательности уже сохранена, она сверяется с журналом
+        и пропускается, поэтому повторная отправка той же последовательности
+        безопасна. Несовпадение сохраненной части - ConsultationConflictError.
+        """
+        state = self._get_state(consultation_id)
+        if state is None:
+            raise ValueError("Консультация не найдена")
         
-        # Получаем текущий вопрос для сохранения
-        current_question = self.diagnosis_service.get_question_by_path(current_path)
-        if not current_question:
-            raise ValueError("Текущий вопрос не найден")
+        answer_count = self._get_answer_count(state.diagnosis_data)
+        saved = []
+        if answer_count:
+            saved = [answer.answer for answer in self.consultation_repository.get_answers(consultation_id)]
         
-        # Получаем следующий вопрос
-        next_question = self.diagnosis_service.get_next_question(current_path, answer)
-        if not next_question:
-            raise ValueError("Не удалось получить следующий вопрос")
+        remaining = self._replay_remainder(answers, answer_count, saved)
+        if not remaining:
+            return self.get_current_state(consultation_id)
+        return self.apply_answers(consultation_id, remaining, base_count=answer_count)
+
+    def _apply_answers(self, consultation_id: int, state: ConsultationState, answers: List[str],
+                       base_count: int = None) -> Optional[AnswerResult]:
+        """Применение ответов к состоянию и запись в БД
+
+        Возвращает None, если состояние в БД уже не совпадает с переданным.
+        """
+        plan = self._plan_answers(state, answers, base_count)
+        if plan is None:
+            return None
         
-        # Обновляем данные диагноза
-        updated_diagnosis_data = self._update_diagnosis_after_answer(
-            diagnosis_data, current_question, answer, next_question
-        )
+        # Ответ собирается до коммита: после него атрибуты строки устаревают
+        result = self._build_result(consultation_id, plan.diagnosis_data, plan.snapshot, state.status, plan.candidates)
         
-        # Обновляем консультацию в БД
-        consultation_data = {
-            'sub_graph_find_diagnosis': updated_diagnosis_data
-        }
+        saved = self.consultation_repository.append_answers(
+            consultation_id, plan.answer_rows, plan.diagnosis_data, expected_version=state.version
+        )
+        if not saved:
+            return None
+        self._cache_state(consultation_id, state._replace(diagnosis_data=plan.diagnosis_data, version=state.version + 1))
+        return result
+
+    def get_current_state(self, consultation_id: int) -> Optional[AnswerResult]:
+        """Текущее состояние консультации в том же виде, что и после ответа"""
+        state = self._get_state(consultation_id)
+        if state is None:
+            return None
         
-        return self.consultation_repository.update_consultation(consultation_id, consultation_data)
+        diagnosis_data = state.diagnosis_data
+        return self._build_result(consultation_id, diagnosis_data, self._get_snapshot(diagnosis_data), state.status)
 
     def get_current_question(self, consultation_id: int):
-        """Получение текущего вопроса консультации"""
-        consultation = self.consultation_repository.get_consultation_by_id(consultation_id)
-        if not consultation:
+        """Получение текущего вопроса консультации (запись с готовым JSON)"""
+        state = self._get_state(consultation_id)
+        if state is None:
             return None
         
-        diagnosis_data = self._get_diagnosis_data(consultation)
-        current_path = diagnosis_data.get('current_path', [])
+        diagnosis_data = state.diagnosis_data
+        snapshot = self._get_snapshot(diagnosis_data)
         
-        return self.diagnosis_service.get_question_by_path(current_path)
+        return snapshot.get_question_entry(diagnosis_data.get('current_path', []))
 
     def get_consultation_progress(self, consultation_id: int):
         """Получение прогресса консультации"""
-        consultation = self.consultation_repository.get_consultation_by_id(consultation_id)
-        if not consultation:
+        state = self._get_state(consultation_id)
+        if state is None:
             return None
         
-        diagnosis_data = self._get_diagnosis_data(consultation)
-        answers = diagnosis_data.get('answers', {})
-        current_path = diagnosis_data.get('current_path', [])
-        
-        total_questions = len(answers)
-        
-        # Получаем актуальный текущий вопрос
-        current_question_obj = self.diagnosis_service.get_question_by_path(current_path)
-        current_question = current_question_obj['text'] if current_question_obj else diagnosis_data.get('current_question', '')
-        
-        return {
-            'current_question': current_question,
-            'questions_answered': total_questions,
-            'is_completed': consultation.status == 'completed'
-        }
+        diagnosis_data = state.diagnosis_data
+        return self._build_progress(diagnosis_data, self._get_snapshot(diagnosis_data),
+                                    state.status == 'completed')
 
     def complete_consultation(self, consultation_id: int, final_diagnosis: str = None, notes: str = None):
         """Завершение консультации"""
         consultation = self._get_consultation_or_raise(consultation_id)
         diagnosis_data = self._get_diagnosis_data(consultation)
         
-        if not final_diagnosis and 'final_diagnosis_candidate' in diagnosis_data:
-            final_diagnosis = diagnosis_data['final_diagnosis_candidate']
-        
-        # Обновляем данные консультации
-        consultation_data = {
-            'status': 'completed',
-            'final_diagnosis': final_diagnosis,
-            'notes': notes
-        }
-        
-        if 'completed_at' not in diagnosis_data:
-            diagnosis_data['completed_at'] = datetime.utcnow().isoformat()
-        
-        consultation_data['sub_graph_find_diagnosis'] = diagnosis_data
+        consultation_data = self._build_completion(diagnosis_data, final_diagnosis, notes)
         
-        return self.consultation_repository.update_consultation(consultation_id, consultation_data)
+        # Ответ, сохраненный после чтения, дает конфликт версии вместо потери
+        return self._write_versioned(
+            consultation_id, self.consultation_repository.update_consultation, consultation_data)
 
     def cancel_consultation(self, consultation_id: int):
         """Отмена консультации"""
         self._get_consultation_or_raise(consultation_id)
-        return self.consultation_repository.update_consultation_status(consultation_id, 'canceled')
+        return self._write_versioned(
+            consultation_id, self.consultation_repository.update_consultation_status, 'canceled')
 
     def save_as_draft(self, consultation_id: int):
         """Сохранение консультации как черновика"""
@@ -183,10 +510,24 @@ class ConsultationService:
         
         # Если консультация активна, но не завершена - сохраняем как черновик
         if consultation.status == 'active':
-            return self.consultation_repository.update_consultation_status(consultation_id, 'draft')
+            consultation = self._write_versioned(
+                consultation_id, self.consultation_repository.update_consultation_status, 'draft')
         
         return consultation
 
+    def _write_versioned(self, consultation_id: int, write, *args):
+        """Запись через ORM с проверкой версии строки и сбросом кэша состояния"""
+        try:
+            return write(consultation_id, *args)
+        except StaleDataError:
+            raise ConsultationConflictError("Консультация изменена другим запросом")
+        finally:
+            self.state_cache.invalidate(consultation_id)
+
+    def get_answer_history(self, consultation_id: int):
+        """История вопросов и ответов консультации из журнала"""
+        return [answer.to_dict() for answer in self.consultation_repository.get_answers(consultation_id)]
+
     def get_consultation_result(self, consultation_id: int):
         """Получение результатов консультации"""
         consultation = self.consultation_repository.get_consultation_by_id(consultation_id)
@@ -196,23 +537,18 @@ class ConsultationService:
         diagnosis_data = self._get_diagnosis_data(consultation)
         current_path = diagnosis_data.get('current_path', [])
         
-        # Получаем диагноз из графа
-        graph_diagnosis = self.diagnosis_service.get_diagnosis(current_path)
-        final_diagnosis = consultation.final_diagnosis or graph_diagnosis
-        
-        # Формируем историю вопросов-ответов
-        qa_history = []
-        answers = diagnosis_data.get('answers', {})
-        for key, qa in sorted(answers.items()):
-            qa_history.append({
-                'question': qa['question'],
-                'answer': qa['answer'],
-                'timestamp': qa.get('timestamp')
-            })
+        # Получаем диагноз из графа (после ответов 'unknown' - наиболее вероятный)
+        graph_diagnosis = self._get_snapshot(diagnosis_data).get_diagnosis(current_path)
+        final_diagnosis = consultation.final_diagnosis or diagnosis_data.get('final_diagnosis_candidate') or graph_diagnosis
+        
+        # История вопросов-ответов из журнала
+        qa_history = self.get_answer_history(consultation_id)
         
         # Формируем список симптомов для отображения
         symptoms_evidence = []
         for qa in qa_history:
+            if qa['answer'] == 'unknown':
+                continue
             symptoms_evidence.append({
                 'name': qa['question'],
                 'present': qa['answer'] == 'yes'
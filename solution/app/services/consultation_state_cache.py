@@ -0,0 +1,100 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, NamedTuple, Optional
+from utils.metrics import metrics
+
+cache_hits_total = metrics.counter(
+    'consultation_state_cache_hits_total',
+    'Consultation state lookups served from the in-process cache')
+cache_misses_total = metrics.counter(
+    'consultation_state_cache_misses_total',
+    'Consultation state lookups that fell back to the database')
+cache_hit_ratio = metrics.gauge(
+    'consultation_state_cache_hit_ratio',
+    'Share of consultation state lookups served from the cache')
+cache_evictions_total = metrics.counter(
+    'consultation_state_cache_evictions_total',
+    'Consultation states evicted to keep the cache within its size')
+cache_expirations_total = metrics.counter(
+    'consultation_state_cache_expirations_total',
+    'Consultation states dropped after their TTL expired')
+cache_invalidations_total = metrics.counter(
+    'consultation_state_cache_invalidations_total',
+    'Consultation states invalidated on status change or version mismatch')
+cache_entries = metrics.gauge(
+    'consultation_state_cache_entries',
+    'Consultation states currently cached')
+
+class ConsultationState(NamedTuple):
+    """Состояние активной консультации: данные диагноза, статус и версия строки"""
+    diagnosis_data: Dict
+    status: str
+    version: int
+
+class ConsultationStateCache:
+    """Кэш состояния активных консультаций процесса
+
+    Ключ - id консультации. Записи вытесняются по LRU при превышении
+    max_entries и по истечении ttl_seconds с момента записи. Кэш
+    пополняется при каждом сохранении ответа (write-through), а устаревание
+    относительно других процессов обнаруживается условным UPDATE по версии
+    строки: при несовпадении запись сбрасывается.
+    """
+
+    def __init__(self, max_entries: int = 1024, ttl_seconds: float = 300.0, clock=time.monotonic):
+        self.max_entries = max(1, max_entries)
+        self.ttl_seconds = ttl_seconds
+        self.clock = clock
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._lookups = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, consultation_id: int) -> Optional[ConsultationState]:
+        """Состояние из кэша или None (промах или истекший TTL)"""
+        with self._lock:
+            entry = self._entries.get(consultation_id)
+            if entry is not None and entry[1] <= self.clock():
+                del self._entries[consultation_id]
+                cache_expirations_total.inc()
+                cache_entries.set(len(self._entries))
+                entry = None
+            if entry is not None:
+                self._entries.move_to_end(consultation_id)
+            self._record_lookup(entry is not None)
+        return entry[0] if entry is not None else None
+
+    def put(self, consultation_id: int, state: ConsultationState):
+        """Запись состояния (вызывается после успешной записи в БД)"""
+        with self._lock:
+            self._entries[consultation_id] = (state, self.clock() + self.ttl_seconds)
+            self._entries.move_to_end(consultation_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                cache_evictions_total.inc()
+            cache_entries.set(len(self._entries))
+
+    def invalidate(self, consultation_id: int):
+        """Сброс состояния консультации"""
+        with self._lock:
+            if self._entries.pop(consultation_id, None) is not None:
+                cache_invalidations_total.inc()
+            cache_entries.set(len(self._entries))
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            cache_entries.set(0)
+
+    def _record_lookup(self, hit: bool):
+        self._lookups += 1
+        if hit:
+            self._hits += 1
+            cache_hits_total.inc()
+        else:
+            cache_misses_total.inc()
+        cache_hit_ratio.set(round(self._hits / self._lookups, 4))
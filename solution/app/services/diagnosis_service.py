@@ -1,38 +1,109 @@
 import json
 import os
+import time
 from typing import Dict, List, Optional
+from models.binary_graph import is_binary_graph_file, load_binary_graph
+from models.candidate_sets import CandidateSets, FrontierEntry, advance_frontier
+from models.compiled_graph import CompiledGraph, GraphNode, NO_NODE, unpack_path, validate_graph_dict
+from models.graph_indexes import GraphIndexes
+from models.node_stats import NodeStats
+from models.response_table import QuestionEntry, ResponseTable
+from models.subtree_prefetch import SubtreeCache
+from services.snapshot_store import graph_content_hash
+
+# Основной путь в Docker - правильная структура
+KNOWLEDGE_GRAPH_PATH = '/app/solution/statistics/data.json'
+
+# Сколько уровней поддерева отправляется клиенту вместе с вопросом
+PREFETCH_DEPTH = int(os.getenv('CONSULTATION_PREFETCH_DEPTH', '3'))
+PREFETCH_CACHE_SIZE = int(os.getenv('CONSULTATION_PREFETCH_CACHE_SIZE', '10000'))
+
+# Альтернативные пути для отладки
+ALTERNATIVE_KNOWLEDGE_GRAPH_PATHS = [
+    '/app/statistics/data.json',
+    './solution/statistics/data.json',
+    '../solution/statistics/data.json',
+    'solution/statistics/data.json'
+]
+
+def find_knowledge_graph_path() -> Optional[str]:
+    """Поиск файла базы знаний (скомпилированного .okg или data.json)"""
+    binary_path = os.getenv('KNOWLEDGE_BASE_BINARY_PATH')
+    if binary_path and os.path.exists(binary_path):
+        return binary_path
+    
+    if os.path.exists(KNOWLEDGE_GRAPH_PATH):
+        return KNOWLEDGE_GRAPH_PATH
+    
+    print(f"File not found: {KNOWLEDGE_GRAPH_PATH}")
+    
+    for alt_path in ALTERNATIVE_KNOWLEDGE_GRAPH_PATHS:
+        if os.path.exists(alt_path):
+            return alt_path
+    return None
 
 class DiagnosisService:
-    def __init__(self):
-        self.knowledge_graph = self._load_knowledge_graph()
-        if self.knowledge_graph:
-            print(f"Root question: {self.knowledge_graph.get('text', 'UNKNOWN')}")
+    """Снимок базы знаний: исходный граф и его скомпилированные структуры
+
+    Экземпляр не изменяется после создания. При перезагрузке data.json
+    создается новый экземпляр, а запросы в процессе выполнения продолжают
+    работать со снимком, полученным в начале запроса. Консультации
+    закрепляются за снимком по content_hash.
+    """
+
+    def __init__(self, data_path: str = None, knowledge_graph: Dict = None, version: int = 1, content_hash: str = None):
+        self.version = version
+        self.loaded_at = time.time()
+        if knowledge_graph is None and data_path is None:
+            data_path = find_knowledge_graph_path()
+        
+        if knowledge_graph is None and data_path and is_binary_graph_file(data_path):
+            # Скомпилированный граф отображается в память без разбора JSON
+            self.knowledge_graph = None
+            self.graph = load_binary_graph(data_path)
+            self.content_hash = content_hash or self.graph.content_hash
+        else:
+            if knowledge_graph is not None:
+                self.knowledge_graph = knowledge_graph
+            else:
+                self.knowledge_graph = self._load_knowledge_graph(data_path)
+            # Адрес снимка: хеш канонического представления графа
+            self.content_hash = content_hash or graph_content_hash(self.knowledge_graph)
+            # Граф компилируется один раз, все переходы выполняются по id узлов;
+            # одинаковые поддеревья становятся общими и в графе, и в словаре
+            self.graph = CompiledGraph.from_dict(self.knowledge_graph, share_dicts=True)
+            stats = self.graph.dedup_stats
+            if stats.saved_nodes:
+                print(f"Knowledge graph: {stats.nodes} nodes, {stats.saved_nodes} of {stats.source_nodes} "
+                      f"shared as duplicate subtrees (~{stats.saved_bytes / 1024:.1f} KiB saved)")
+        
+        # Готовые ответы API для каждого узла (база знаний неизменна до перезагрузки);
+        # для отображенного в память графа записи строятся по мере обращения
+        self.responses = ResponseTable(self.graph, eager=self.knowledge_graph is not None)
+        # Обратные индексы (для отображенного в память графа - при первом обращении)
+        self._indexes = GraphIndexes(self.graph) if self.knowledge_graph is not None else None
+        # Глубина, границы числа оставшихся вопросов и число листьев каждого узла
+        self._node_stats = NodeStats(self.graph) if self.knowledge_graph is not None else None
+        self._batch = None
+        self._candidate_sets = None
+        self._subtrees = None
+        if self.graph.root != NO_NODE:
+            print(f"Root question: {self.graph.text(self.graph.root)} (version {self.version})")
     
-    def _load_knowledge_graph(self) -> Dict:
+    @staticmethod
+    def parse_knowledge_graph(data_path: str) -> Dict:
+        """Чтение и проверка data.json (ValueError при ошибке структуры)"""
+        with open(data_path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        validate_graph_dict(data)
+        return data
+    
+    def _load_knowledge_graph(self, data_path: Optional[str]) -> Dict:
         """Загрузка графа знаний из data.json"""
         try:
-            # Основной путь в Docker - правильная структура
-            data_path = '/app/solution/statistics/data.json'
-            
-            if os.path.exists(data_path):
+            if data_path:
                 with open(data_path, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                    return data
-            
-            print(f"File not found: {data_path}")
-            
-            # Альтернативные пути для отладки
-            alternative_paths = [
-                '/app/statistics/data.json',
-                './solution/statistics/data.json',
-                '../solution/statistics/data.json',
-                'solution/statistics/data.json'
-            ]
-            
-            for alt_path in alternative_paths:
-                if os.path.exists(alt_path):
-                    with open(alt_path, 'r', encoding='utf-8') as f:
-                        return json.load(f)
+                    return json.load(f)
             
             print("data.json not found anywhere, using fallback")
             return self._get_fallback_graph()
@@ -59,18 +130,130 @@ class DiagnosisService:
             }
         }
     
+    def _question_from_node(self, node_id: int, default_text: str) -> Dict:
+        """Формирование описания вопроса по id узла"""
+        text = self.graph.text(node_id)
+        return {
+            'text': text if text is not None else default_text,
+            'is_final': self.graph.is_final(node_id),
+            'has_yes': self.graph.yes[node_id] != NO_NODE,
+            'has_no': self.graph.no[node_id] != NO_NODE
+        }
+
+    def get_root_node_id(self) -> int:
+        """Получение id корневого узла"""
+        return self.graph.root
+
+    def resolve_path(self, path: List[str]) -> int:
+        """Получение id узла по пути ответов"""
+        return self.graph.resolve_path(path)
+
+    def get_node(self, node_id: int) -> Optional[GraphNode]:
+        """Получение узла по id за O(1)"""
+        return self.graph.node(node_id)
+
+    def get_question_by_node(self, node_id: int) -> Optional[Dict]:
+        """Получение вопроса по id узла"""
+        if self.graph.node(node_id) is None:
+            return None
+        
+        return self._question_from_node(node_id, 'Вопрос')
+
+    @property
+    def indexes(self) -> GraphIndexes:
+        """Обратные индексы диагнозов и вопросов"""
+        if self._indexes is None:
+            self._indexes = GraphIndexes(self.graph)
+        return self._indexes
+
+    @property
+    def node_stats(self) -> NodeStats:
+        """Предвычисленные свойства узлов"""
+        if self._node_stats is None:
+            self._node_stats = NodeStats(self.graph)
+        return self._node_stats
+
+    def get_progress(self, node_id: int, answered: int) -> Dict:
+        """Прогресс консультации в узле (без обхода поддерева)"""
+        return self.node_stats.progress(node_id, answered)
+
+    @property
+    def batch(self):
+        """Пакетный прогон наборов ответов (NumPy импортируется при первом обращении)"""
+        if self._batch is None:
+            from services.batch_diagnosis import BatchDiagnoser
+            self._batch = BatchDiagnoser(self.graph)
+        return self._batch
+
+    def find_diagnosis_paths(self, diagnosis: str) -> List[List[str]]:
+        """Все пути ответов, ведущие к диагнозу"""
+        return [unpack_path(packed) for packed in self.indexes.find_diagnosis_paths(diagnosis)]
+
+    def find_question_nodes(self, question: str) -> List[int]:
+        """Id всех узлов дерева с данным вопросом"""
+        return self.indexes.find_question_nodes(question)
+
+    def list_diagnoses(self) -> List[Dict]:
+        """Список всех диагнозов базы знаний с числом ведущих к ним путей"""
+        return [
+            {'diagnosis': self.indexes.diagnosis_names[key], 'paths_count': len(paths)}
+            for key, paths in self.indexes.diagnosis_paths.items()
+        ]
+
+    def get_question_entry(self, path: List[str]) -> Optional[QuestionEntry]:
+        """Получение готового описания вопроса (с JSON) по пути"""
+        return self.responses.get(path)
+
+    def get_subtree_json(self, node_id: int) -> Optional[bytes]:
+        """Компактное поддерево на PREFETCH_DEPTH уровней от узла (готовый JSON)"""
+        if self._subtrees is None:
+            self._subtrees = SubtreeCache(self.graph, self.node_stats, PREFETCH_DEPTH, PREFETCH_CACHE_SIZE)
+        return self._subtrees.get(node_id)
+
+    @property
+    def consultations_ready(self) -> bool:
+        """Структуры, нужные ответам консультаций, уже построены"""
+        return self._node_stats is not None and self._candidate_sets is not None and self._subtrees is not None
+
+    def prepare_consultations(self):
+        """Построение заранее структур, которые консультации строят при первом обращении"""
+        if self._candidate_sets is None:
+            self._candidate_sets = CandidateSets(self.graph)
+        if self._subtrees is None:
+            self._subtrees = SubtreeCache(self.graph, self.node_stats, PREFETCH_DEPTH, PREFETCH_CACHE_SIZE)
+
+    def get_next_node_id(self, node_id: int, answer: str) -> int:
+        """Получение id следующего узла по ответу за O(1)"""
+        return self.graph.child(node_id, answer)
+
+    @property
+    def candidate_sets(self) -> CandidateSets:
+        """Маски достижимых диагнозов (строятся при первом обращении)"""
+        if self._candidate_sets is None:
+            self._candidate_sets = CandidateSets(self.graph)
+        return self._candidate_sets
+
+    def get_initial_frontier(self) -> List[FrontierEntry]:
+        """Живые ветки в начале консультации (только корень)"""
+        if self.graph.root == NO_NODE:
+            return []
+        return [FrontierEntry(self.graph.root, 1, 1.0)]
+
+    def advance_frontier(self, frontier: List[FrontierEntry], answer: str) -> List[FrontierEntry]:
+        """Переход живых веток по ответу yes/no/unknown"""
+        return advance_frontier(self.graph, frontier, answer)
+
+    def rank_candidates(self, frontier: List[FrontierEntry], limit: int = None) -> List[Dict]:
+        """Ранжированные диагнозы, достижимые из живых веток"""
+        return self.candidate_sets.rank(frontier, limit)
+
     def get_initial_question(self) -> Optional[Dict]:
         """Получение начального вопроса"""
-        if not self.knowledge_graph:
+        if self.graph.root == NO_NODE:
             return None
         
-        question = {
-            'text': self.knowledge_graph.get('text', 'Начало диагностики'),
-            'is_final': False,
-            'has_yes': 'yes' in self.knowledge_graph and self.knowledge_graph['yes'] is not None,
-            'has_no': 'no' in self.knowledge_graph and self.knowledge_graph['no'] is not None
-        }
-        
+        question = self._question_from_node(self.graph.root, 'Начало диагностики')
+        question['is_final'] = False
         return question
     
     def get_next_question(self, current_path: List[str], answer: str) -> Optional[Dict]:
@@ -79,68 +262,30 @@ class DiagnosisService:
         if answer not in ['yes', 'no']:
             return None
         
-        # Начинаем с корня
-        current_node = self.knowledge_graph
-        
-        # Проходим по текущему пути
-        for i, step in enumerate(current_path):
-            if step in current_node:
-                current_node = current_node[step]
-            else:
-                return None
+        node_id = self.graph.resolve_path(current_path)
+        if node_id == NO_NODE:
+            return None
         
-        # Переходим по ответу
-        if answer in current_node and current_node[answer] is not None:
-            next_node = current_node[answer]
-            new_path = current_path + [answer]
-            
-            is_final = next_node.get('yes') is None and next_node.get('no') is None
-            
-            result = {
-                'text': next_node.get('text', 'Следующий вопрос'),
-                'is_final': is_final,
-                'has_yes': 'yes' in next_node and next_node['yes'] is not None,
-                'has_no': 'no' in next_node and next_node['no'] is not None,
-                'path': new_path
-            }
-            
-            return result
+        next_node_id = self.graph.child(node_id, answer)
+        if next_node_id == NO_NODE:
+            return None
         
-        return None
+        result = self._question_from_node(next_node_id, 'Следующий вопрос')
+        result['path'] = current_path + [answer]
+        return result
     
     def get_question_by_path(self, path: List[str]) -> Optional[Dict]:
         """Получение вопроса по пути"""
-        
-        if not self.knowledge_graph:
+        node_id = self.graph.resolve_path(path)
+        if node_id == NO_NODE:
             return None
-            
-        current_node = self.knowledge_graph
-        
-        for i, step in enumerate(path):
-            if step in current_node and current_node[step] is not None:
-                current_node = current_node[step]
-            else:
-                return None
         
-        is_final = current_node.get('yes') is None and current_node.get('no') is None
-        
-        question = {
-            'text': current_node.get('text', 'Вопрос'),
-            'is_final': is_final,
-            'has_yes': 'yes' in current_node and current_node['yes'] is not None,
-            'has_no': 'no' in current_node and current_node['no'] is not None
-        }
-        
-        return question
+        return self._question_from_node(node_id, 'Вопрос')
     
     def get_diagnosis(self, path: List[str]) -> Optional[str]:
         """Получение диагноза по пути"""
-        current_node = self.knowledge_graph
-        
-        for step in path:
-            if step in current_node:
-                current_node = current_node[step]
-            else:
-                return None
+        node_id = self.graph.resolve_path(path)
+        if node_id == NO_NODE:
+            return None
         
-        return current_node.get('text')
\ No newline at end of file
+        return self.graph.text(node_id)
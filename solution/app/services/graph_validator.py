@@ -0,0 +1,167 @@
+import multiprocessing
+import os
+from array import array
+from collections import Counter
+from typing import Dict
+from models.compiled_graph import CompiledGraph, NO_NODE
+
+# Сколько примеров проблемных узлов сохранять в отчете
+MAX_EXAMPLES = 10
+
+# Граф, доступный процессам-обработчикам (наследуется при fork)
+_worker_graph = None
+
+class SubtreeReport:
+    """Статистика по одному поддереву, собранная за один ленивый обход
+
+    Общий узел DAG учитывается на каждом ведущем к нему пути.
+    """
+
+    def __init__(self):
+        self.visited = 0
+        self.leaves = 0
+        self.min_depth = None
+        self.max_depth = 0
+        self.depth_sum = 0
+        self.depth_histogram = Counter()
+        self.missing_texts = 0
+        self.missing_text_examples = []
+        self.leaf_texts = Counter()
+
+    def merge(self, other: 'SubtreeReport'):
+        self.visited += other.visited
+        self.leaves += other.leaves
+        if other.min_depth is not None:
+            self.min_depth = other.min_depth if self.min_depth is None else min(self.min_depth, other.min_depth)
+        self.max_depth = max(self.max_depth, other.max_depth)
+        self.depth_sum += other.depth_sum
+        self.depth_histogram.update(other.depth_histogram)
+        self.missing_texts += other.missing_texts
+        self.missing_text_examples.extend(other.missing_text_examples[:MAX_EXAMPLES - len(self.missing_text_examples)])
+        self.leaf_texts.update(other.leaf_texts)
+
+def _scan_subtree(graph: CompiledGraph, start: int, depth: int, packed: int) -> SubtreeReport:
+    """Обход поддерева с накоплением статистики (память - O(глубины + числа диагнозов))"""
+    report = SubtreeReport()
+    for node_id, node_depth, node_packed in graph.iter_nodes(start, depth, packed):
+        report.visited += 1
+        text = graph.text(node_id)
+        if not text or not text.strip():
+            report.missing_texts += 1
+            if len(report.missing_text_examples) < MAX_EXAMPLES:
+                report.missing_text_examples.append(node_packed)
+
+        if graph.yes[node_id] == NO_NODE and graph.no[node_id] == NO_NODE:
+            report.leaves += 1
+            report.depth_sum += node_depth
+            report.depth_histogram[node_depth] += 1
+            report.max_depth = max(report.max_depth, node_depth)
+            report.min_depth = node_depth if report.min_depth is None else min(report.min_depth, node_depth)
+            if text:
+                report.leaf_texts[text] += 1
+    return report
+
+def _scan_task(task):
+    return _scan_subtree(_worker_graph, *task)
+
+def _split_tree(graph: CompiledGraph, task_count: int):
+    """Разбиение дерева на поддеревья для параллельной обработки
+
+    Возвращает узлы над границей разбиения (обрабатываются в текущем
+    процессе) и корни поддеревьев (start, depth, packed).
+    """
+    frontier = [(graph.root, 0, 1)]
+    top_nodes = []
+    while len(frontier) < task_count and not all(graph.is_final(node_id) for node_id, _, _ in frontier):
+        next_frontier = []
+        for node_id, depth, packed in frontier:
+            if graph.is_final(node_id):
+                next_frontier.append((node_id, depth, packed))
+                continue
+            top_nodes.append((node_id, depth, packed))
+            yes_id, no_id = graph.yes[node_id], graph.no[node_id]
+            if yes_id != NO_NODE:
+                next_frontier.append((yes_id, depth + 1, (packed << 1) | 1))
+            if no_id != NO_NODE:
+                next_frontier.append((no_id, depth + 1, packed << 1))
+        frontier = next_frontier
+    return top_nodes, frontier
+
+def _find_unreachable(graph: CompiledGraph):
+    """Достижимость узлов: число достижимых, корни недостижимых фрагментов
+    (узлы без входящих ссылок, кроме корня) и число общих узлов DAG"""
+    references = array('i', [0]) * len(graph)
+    for children in (graph.yes, graph.no):
+        for child_id in children:
+            if child_id != NO_NODE:
+                references[child_id] += 1
+
+    # Общие узлы DAG помечаются один раз, поэтому обход - O(числа узлов)
+    reachable = bytearray(len(graph))
+    stack = [graph.root] if graph.root != NO_NODE else []
+    while stack:
+        node_id = stack.pop()
+        if reachable[node_id]:
+            continue
+        reachable[node_id] = 1
+        for child_id in (graph.yes[node_id], graph.no[node_id]):
+            if child_id != NO_NODE:
+                stack.append(child_id)
+
+    unreachable_roots = [node_id for node_id in range(len(graph))
+                         if not references[node_id] and node_id != graph.root]
+    shared = sum(1 for count in references if count > 1)
+    return sum(reachable), unreachable_roots, shared
+
+def validate_graph(graph: CompiledGraph, workers: int = None) -> Dict:
+    """Проверка всего дерева: недостижимые узлы, повторяющиеся диагнозы,
+    узлы без текста и статистика глубины листьев"""
+    global _worker_graph
+    workers = workers or os.cpu_count() or 1
+
+    report = SubtreeReport()
+    if graph.root != NO_NODE:
+        top_nodes, subtrees = _split_tree(graph, workers * 4)
+        for node_id, depth, packed in top_nodes:
+            # Узлы над границей разбиения проверяются без обхода потомков
+            report.visited += 1
+            text = graph.text(node_id)
+            if not text or not text.strip():
+                report.missing_texts += 1
+                report.missing_text_examples.append(packed)
+
+        if workers > 1 and len(subtrees) > 1 and 'fork' in multiprocessing.get_all_start_methods():
+            _worker_graph = graph
+            try:
+                with multiprocessing.get_context('fork').Pool(workers) as pool:
+                    for subtree_report in pool.imap_unordered(_scan_task, subtrees):
+                        report.merge(subtree_report)
+            finally:
+                _worker_graph = None
+        else:
+            for subtree in subtrees:
+                report.merge(_scan_subtree(graph, *subtree))
+
+    reachable, unreachable_roots, shared = _find_unreachable(graph)
+    unreachable = len(graph) - reachable
+    duplicates = {text: count for text, count in report.leaf_texts.items() if count > 1}
+    return {
+        'nodes': len(graph),
+        'reachable_nodes': reachable,
+        'shared_nodes': shared,
+        'paths_visited': report.visited,
+        'unreachable_nodes': unreachable,
+        'unreachable_examples': unreachable_roots[:MAX_EXAMPLES],
+        'leaves': report.leaves,
+        'distinct_diagnoses': len(report.leaf_texts),
+        'duplicate_diagnoses': duplicates,
+        'missing_texts': report.missing_texts,
+        'missing_text_examples': report.missing_text_examples[:MAX_EXAMPLES],
+        'depth': {
+            'min': report.min_depth,
+            'max': report.max_depth,
+            'mean': report.depth_sum / report.leaves if report.leaves else None,
+            'histogram': dict(sorted(report.depth_histogram.items()))
+        },
+        'is_valid': not unreachable and not report.missing_texts
+    }
@@ -0,0 +1,159 @@
+import os
+import threading
+import time
+from models.binary_graph import is_binary_graph_file
+from services.diagnosis_service import DiagnosisService, find_knowledge_graph_path
+from services.consultation_service import get_diagnosis_service, set_diagnosis_service
+from services.snapshot_store import graph_content_hash
+from utils.metrics import metrics
+
+try:
+    # Необязательный backend на inotify (только Linux)
+    from inotify_simple import INotify, flags as inotify_flags
+except ImportError:
+    INotify = None
+
+reload_seconds = metrics.histogram(
+    'knowledge_base_reload_seconds',
+    'Time from detecting a data.json change to swapping in the new snapshot')
+parse_seconds = metrics.histogram(
+    'knowledge_base_parse_seconds',
+    'Time spent parsing and validating data.json')
+reloads_total = metrics.counter(
+    'knowledge_base_reloads_total',
+    'Successful knowledge base reloads')
+reload_failures_total = metrics.counter(
+    'knowledge_base_reload_failures_total',
+    'Knowledge base reloads rejected by parsing or validation')
+snapshot_version = metrics.gauge(
+    'knowledge_base_snapshot_version',
+    'Version of the knowledge base snapshot currently served')
+
+class KnowledgeBaseWatcher:
+    """Фоновое отслеживание файла базы знаний и атомарная замена снимка
+
+    Разбор, проверка и компиляция нового файла выполняются в отдельном
+    потоке. Готовый снимок передается в on_reload, который подменяет
+    ссылку на текущий снимок одним присваиванием.
+    """
+
+    def __init__(self, data_path: str, on_reload, get_current, interval: float = 2.0, use_inotify: bool = True):
+        self.data_path = os.path.abspath(data_path)
+        self.on_reload = on_reload
+        self.get_current = get_current
+        self.interval = interval
+        self.use_inotify = use_inotify and INotify is not None
+        self._last_signature = self._signature()
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def _signature(self):
+        """Отпечаток файла для определения изменений (mtime и размер)"""
+        try:
+            stat = os.stat(self.data_path)
+            return (stat.st_mtime_ns, stat.st_size)
+        except OSError:
+            return None
+
+    def start(self):
+        """Запуск наблюдения в фоновом потоке"""
+        if self._thread is not None:
+            return
+        target = self._run_inotify if self.use_inotify else self._run_polling
+        self._thread = threading.Thread(target=target, name='knowledge-base-watcher', daemon=True)
+        self._thread.start()
+        print(f"Knowledge base watcher started for {self.data_path} "
+              f"({'inotify' if self.use_inotify else 'mtime polling'})")
+
+    def stop(self):
+        """Остановка наблюдения"""
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.interval * 2)
+            self._thread = None
+
+    def _run_polling(self):
+        while not self._stop_event.wait(self.interval):
+            self.check_now()
+
+    def _run_inotify(self):
+        inotify = INotify()
+        # Следим за каталогом: редакторы часто заменяют файл через rename
+        watch_flags = inotify_flags.CLOSE_WRITE | inotify_flags.MOVED_TO | inotify_flags.CREATE
+        inotify.add_watch(os.path.dirname(self.data_path), watch_flags)
+        file_name = os.path.basename(self.data_path)
+        try:
+            while not self._stop_event.is_set():
+                events = inotify.read(timeout=int(self.interval * 1000))
+                if any(event.name == file_name for event in events) or not events:
+                    # Без событий проверяем mtime на случай пропущенных уведомлений
+                    self.check_now()
+        finally:
+            inotify.close()
+
+    def check_now(self) -> bool:
+        """Проверка файла и перезагрузка при изменении"""
+        signature = self._signature()
+        if signature is None or signature == self._last_signature:
+            return False
+
+        detected_at = time.perf_counter()
+        self._last_signature = signature
+        try:
+            current = self.get_current()
+            if is_binary_graph_file(self.data_path):
+                # Скомпилированный граф: разбор сводится к отображению файла в память
+                snapshot = DiagnosisService(data_path=self.data_path, version=current.version + 1)
+                parse_seconds.observe(time.perf_counter() - detected_at)
+                if snapshot.content_hash == current.content_hash:
+                    snapshot.graph.close()
+                    return False
+            else:
+                knowledge_graph = DiagnosisService.parse_knowledge_graph(self.data_path)
+                parse_seconds.observe(time.perf_counter() - detected_at)
+
+                content_hash = graph_content_hash(knowledge_graph)
+                if content_hash == current.content_hash:
+                    # Содержимое не изменилось (например, только форматирование)
+                    return False
+                snapshot = DiagnosisService(knowledge_graph=knowledge_graph, version=current.version + 1,
+                                            content_hash=content_hash)
+            # Структуры консультаций строятся здесь, а не в первом запросе к новой версии
+            snapshot.prepare_consultations()
+            self.on_reload(snapshot)
+        except (OSError, ValueError) as e:
+            # Битый или недописанный файл: продолжаем работать со старым снимком
+            reload_failures_total.inc()
+            print(f"Knowledge base reload rejected: {e}")
+            return False
+
+        reload_seconds.observe(time.perf_counter() - detected_at)
+        reloads_total.inc()
+        snapshot_version.set(snapshot.version)
+        print(f"Knowledge base reloaded, version {snapshot.version}")
+        return True
+
+_watcher = None
+
+def start_knowledge_base_watcher():
+    """Запуск отслеживания data.json, если оно включено в окружении"""
+    global _watcher
+    if os.getenv('KNOWLEDGE_BASE_WATCH', 'true').lower() != 'true' or _watcher is not None:
+        return _watcher
+
+    data_path = find_knowledge_graph_path()
+    if not data_path:
+        print("Knowledge base watcher disabled: data.json not found")
+        return None
+
+    # Загружаем текущий снимок до начала наблюдения
+    snapshot_version.set(get_diagnosis_service().version)
+    _watcher = KnowledgeBaseWatcher(
+        data_path,
+        on_reload=set_diagnosis_service,
+        get_current=get_diagnosis_service,
+        interval=float(os.getenv('KNOWLEDGE_BASE_POLL_INTERVAL', '2.0')),
+        use_inotify=os.getenv('KNOWLEDGE_BASE_INOTIFY', 'true').lower() == 'true'
+    )
+    _watcher.start()
+    return _watcher
@@ -0,0 +1,53 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+from utils.metrics import metrics
+
+count_cache_hits_total = metrics.counter(
+    'patient_count_cache_hits_total',
+    'Patient list totals served from the in-process cache')
+count_cache_misses_total = metrics.counter(
+    'patient_count_cache_misses_total',
+    'Patient list totals counted in the database')
+
+class PatientCountCache:
+    """Кэш числа пациентов по фильтрам списка
+
+    Ключ - кортеж фильтров (поиск, пол, врач). COUNT(*) по большой таблице
+    читает весь индекс, поэтому итог страницы держится ttl_seconds. Запись
+    пациента в этом процессе сбрасывает кэш целиком; записи других
+    процессов становятся видны по истечении TTL.
+    """
+
+    def __init__(self, max_entries: int = 256, ttl_seconds: float = 30.0, clock=time.monotonic):
+        self.max_entries = max(1, max_entries)
+        self.ttl_seconds = ttl_seconds
+        self.clock = clock
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key) -> Optional[int]:
+        """Число из кэша или None (промах или истекший TTL)"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] <= self.clock():
+                del self._entries[key]
+                entry = None
+            if entry is not None:
+                self._entries.move_to_end(key)
+                count_cache_hits_total.inc()
+                return entry[0]
+        count_cache_misses_total.inc()
+        return None
+
+    def put(self, key, count: int):
+        with self._lock:
+            self._entries[key] = (count, self.clock() + self.ttl_seconds)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
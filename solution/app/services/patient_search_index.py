@@ -0,0 +1,184 @@
+import bisect
+import heapq
+import re
+import threading
+import time
+from array import array
+from collections import Counter
+from typing import Dict, List, NamedTuple, Optional
+from utils.metrics import metrics
+
+search_index_rebuilds_total = metrics.counter(
+    'patient_search_index_rebuilds_total',
+    'In-process patient search index rebuilds from the database')
+search_index_entries = metrics.gauge(
+    'patient_search_index_entries',
+    'Patients held by the in-process search index')
+
+_word_re = re.compile(r'[0-9a-zа-я@._+-]+')
+_phone_re = re.compile(r'[\d\s()+-]*\d[\d\s()+-]*')
+
+def normalize(text: Optional[str]) -> str:
+    """Текст для сравнения: регистр и ё не различаются"""
+    return (text or '').casefold().replace('ё', 'е')
+
+def trigrams(text: str) -> set:
+    """Триграммы слов текста с дополнением пробелами, как в pg_trgm"""
+    result = set()
+    for word in _word_re.findall(text):
+        padded = f"  {word} "
+        result.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return result
+
+class SearchEntry(NamedTuple):
+    """Пациент в индексе: нормализованные ФИО и текст поиска (ФИО, цифры телефона, email)"""
+    name_key: tuple
+    text: str
+
+class PatientSearchIndex:
+    """Внутрипроцессный n-граммный индекс пациентов
+
+    Замена GIN индексов pg_trgm для SQLite и PostgreSQL без расширения.
+    Поиск: подстрока или доля общих триграмм запроса не ниже threshold,
+    подсказки: бинарный поиск по отсортированным фамилиям. Индекс строится
+    из БД целиком и перестраивается по истечении ttl_seconds; записи
+    пациентов в этом процессе попадают в него сразу (put). Списки триграмм
+    только дополняются, поэтому кандидаты всегда сверяются с актуальной
+    записью. Устаревший индекс перестраивает один запрос (begin_rebuild),
+    остальные тем временем ищут по прежней версии.
+    """
+
+    def __init__(self, ttl_seconds: float = 300.0, threshold: float = 0.5, clock=time.monotonic):
+        self.ttl_seconds = ttl_seconds
+        self.threshold = threshold
+        self.clock = clock
+        self._entries: Dict[int, SearchEntry] = {}
+        self._postings: Dict[str, array] = {}
+        self._names: List[tuple] = []
+        self._built_at = None
+        self._lock = threading.Lock()
+        self._rebuild_lock = threading.Lock()
+        self._ready = threading.Event()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def is_stale(self) -> bool:
+        """Индекс еще не построен или старше TTL"""
+        return self._built_at is None or self._built_at + self.ttl_seconds <= self.clock()
+
+    def begin_rebuild(self) -> bool:
+        """Право на перестроение: True только одному вызывающему и только для устаревшего индекса"""
+        if not self._rebuild_lock.acquire(blocking=False):
+            return False
+        if not self.is_stale():
+            self._rebuild_lock.release()
+            return False
+        return True
+
+    def end_rebuild(self):
+        self._rebuild_lock.release()
+
+    def wait_ready(self, timeout: float) -> bool:
+        """Ожидание первого построения (True, если индекс уже есть)"""
+        return self._ready.wait(timeout)
+
+    def rebuild(self, rows):
+        """Построение по строкам (id, last_name, first_name, middle_name, phone, email)"""
+        entries, postings, names = {}, {}, []
+        for row in rows:
+            entry = self._entry(row)
+            entries[row[0]] = entry
+            names.append(entry.name_key + (row[0],))
+            for gram in trigrams(entry.text):
+                postings.setdefault(gram, array('l')).append(row[0])
+        names.sort()
+
+        with self._lock:
+            self._entries, self._postings, self._names = entries, postings, names
+            self._built_at = self.clock()
+            search_index_entries.set(len(entries))
+        self._ready.set()
+        search_index_rebuilds_total.inc()
+
+    def put(self, patient):
+        """Добавление или обновление пациента после записи в БД"""
+        row = (patient.id, patient.last_name, patient.first_name, patient.middle_name, patient.phone, patient.email)
+        entry = self._entry(row)
+        with self._lock:
+            if self._built_at is None:
+                return
+            previous = self._entries.get(patient.id)
+            if previous is not None:
+                position = bisect.bisect_left(self._names, previous.name_key + (patient.id,))
+                if position < len(self._names) and self._names[position][-1] == patient.id:
+                    del self._names[position]
+            self._entries[patient.id] = entry
+            bisect.insort(self._names, entry.name_key + (patient.id,))
+            for gram in trigrams(entry.text):
+                self._postings.setdefault(gram, array('l')).append(patient.id)
+            search_index_entries.set(len(self._entries))
+
+    def search(self, term: str, limit: int = 20) -> List[int]:
+        """id пациентов по убыванию сходства с запросом"""
+        query = normalize(term).strip()
+        if _phone_re.fullmatch(query):
+            # Телефон в индексе хранится цифрами
+            query = re.sub(r'\D', '', query)
+        grams = trigrams(query)
+        if not grams:
+            return []
+
+        with self._lock:
+            scores = {}
+            # Подстрока: кандидаты из самого короткого списка внутренних триграмм запроса
+            inner = [word[i:i + 3] for word in _word_re.findall(query) for i in range(len(word) - 2)]
+            if inner:
+                rarest = min(inner, key=lambda gram: len(self._postings.get(gram, ())))
+                for patient_id in self._postings.get(rarest, ()):
+                    entry = self._entries.get(patient_id)
+                    if entry is not None and query in entry.text:
+                        scores[patient_id] = 1.0
+
+            # Нечеткое совпадение: доля триграмм запроса, найденных у пациента.
+            # Подстрока ранжируется выше, поэтому при полной выдаче подсчет не нужен
+            counts = Counter()
+            if len(scores) < limit:
+                for gram in grams:
+                    counts.update(self._postings.get(gram, ()))
+            needed = max(1, int(len(grams) * self.threshold))
+            for patient_id, count in counts.items():
+                entry = self._entries.get(patient_id)
+                if count < needed or entry is None or patient_id in scores:
+                    continue
+                score = len(grams & trigrams(entry.text)) / len(grams)
+                if score >= self.threshold:
+                    scores[patient_id] = score
+
+            scored = [(-score, self._entries[patient_id].name_key, patient_id) for patient_id, score in scores.items()]
+        return [patient_id for _, _, patient_id in heapq.nsmallest(limit, scored)]
+
+    def typeahead(self, term: str, limit: int = 10) -> List[int]:
+        """id пациентов, у которых слова запроса - начала фамилии, имени и отчества"""
+        words = normalize(term).split()
+        if not words:
+            return []
+
+        result = []
+        with self._lock:
+            position = bisect.bisect_left(self._names, (words[0],))
+            while position < len(self._names) and len(result) < limit:
+                name = self._names[position]
+                if not name[0].startswith(words[0]):
+                    break
+                if all(part.startswith(word) for part, word in zip(name[1:3], words[1:])) and \
+                        self._entries.get(name[-1], SearchEntry((), '')).name_key == name[:-1]:
+                    result.append(name[-1])
+                position += 1
+        return result
+
+    def _entry(self, row) -> SearchEntry:
+        _, last_name, first_name, middle_name, phone, email = row
+        name_key = (normalize(last_name), normalize(first_name), normalize(middle_name))
+        phone_digits = re.sub(r'\D', '', phone or '')
+        return SearchEntry(name_key, ' '.join(part for part in name_key + (phone_digits, normalize(email)) if part))
@@ -1,15 +1,92 @@
 # Относительные импорты внутри пакета app
 from repositories.patient_repository import PatientRepository
+from repositories.patient_queries import PATIENT_ORDERINGS, SEARCH_LIMIT, TYPEAHEAD_LIMIT, patient_sort_key
 from models.database_models import SexEnum
+from services.patient_count_cache import PatientCountCache
+from services.patient_search_index import PatientSearchIndex
+from utils.pagination import Page, TotalCount, build_page, decode_cursor
+from sqlalchemy.orm.exc import StaleDataError
 from datetime import datetime
+import os
 import re
+import threading
 
-class PatientService:
-    def __init__(self, db_session):
-        self.patient_repository = PatientRepository(db_session)
+# Без фильтров и начиная с такого числа строк итог списка берется из статистики планировщика
+ESTIMATE_MIN_ROWS = 10000
 
-    def create_patient(self, patient_data: dict):
-        """Создание нового пациента с валидацией"""
+# Сколько кандидатов брать из n-граммного индекса, когда результат еще фильтруется по врачу
+INDEX_CANDIDATES = 500
+
+# Шаг ожидания первого построения индекса другим запросом (затем - повторная попытка)
+SEARCH_INDEX_WAIT_SECONDS = 1.0
+
+_count_cache = None
+_search_index = None
+_init_lock = threading.Lock()
+
+def get_patient_count_cache() -> PatientCountCache:
+    """Получение кэша числа пациентов процесса"""
+    global _count_cache
+    if _count_cache is None:
+        with _init_lock:
+            if _count_cache is None:
+                _count_cache = PatientCountCache(ttl_seconds=float(os.getenv('PATIENT_COUNT_CACHE_TTL', '30')))
+    return _count_cache
+
+def get_patient_search_index() -> PatientSearchIndex:
+    """Получение внутрипроцессного поискового индекса (без pg_trgm)"""
+    global _search_index
+    if _search_index is None:
+        with _init_lock:
+            if _search_index is None:
+                _search_index = PatientSearchIndex(ttl_seconds=float(os.getenv('PATIENT_SEARCH_INDEX_TTL', '300')))
+    return _search_index
+
+class PatientConflictError(ValueError):
+    """Данные пациента изменены после того, как их прочитал клиент"""
+
+class PatientLogic:
+    """Проверка данных пациента и сборка страниц списка без обращения к БД
+
+    Общая часть PatientService и AsyncPatientService.
+    """
+
+    def _decode_page_cursors(self, sort: str, after: str = None, before: str = None):
+        """Значения ключа из курсоров страницы (задается не больше одного)"""
+        if sort not in PATIENT_ORDERINGS:
+            raise ValueError(f"Неизвестный порядок сортировки: {sort}")
+        if after and before:
+            raise ValueError("Курсоры after и before взаимоисключающие")
+        return (decode_cursor(after, sort) if after else None,
+                decode_cursor(before, sort) if before else None)
+
+    def _build_patients_page(self, rows, limit: int, sort: str, after=None, before=None, total=None) -> Page:
+        return build_page(list(rows), limit, patient_sort_key(sort), sort, after, before)._replace(total=total)
+
+    def _count_key(self, search: str = None, sex: str = None, doctor_id: int = None):
+        return (search or None, sex or None, doctor_id or None)
+
+    def _search_term(self, search_term: str):
+        """Запрос поиска без лишних пробелов; пустой запрос - None"""
+        return (search_term or '').strip() or None
+
+    def _index_limit(self, limit: int, doctor_id: int = None) -> int:
+        """Сколько id брать из индекса: с фильтром по врачу часть отсеется в БД"""
+        return max(limit, INDEX_CANDIDATES) if doctor_id else limit
+
+    def _index_patient(self, patient):
+        """Пациент после записи - в поисковый индекс процесса, если он построен"""
+        if patient is not None:
+            self.search_index.put(patient)
+
+    def _estimated_total(self, estimate):
+        """Оценка планировщика как итог, если таблица достаточно велика"""
+        if estimate is not None and estimate >= ESTIMATE_MIN_ROWS:
+            return TotalCount(estimate, estimated=True)
+        return None
+
+    def _validate_new_patient(self, patient_data: dict):
+        """Проверка полей нового пациента (пол приводится к M/F)"""
         # Валидация обязательных полей
         required_fields = ['last_name', 'first_name', 'birthday', 'sex']
         for field in required_fields:
@@ -48,36 +125,8 @@ class PatientService:
         if patient_data.get('phone') and not self._validate_phone(patient_data['phone']):
             raise ValueError("Некорректный формат телефона")
 
-        # Проверка на существующего пациента по email
-        if patient_data.get('email') and self._patient_exists_by_email(patient_data['email']):
-            raise ValueError("Пациент с таким email уже существует в системе")
-
-        # Создаем пациента
-        return self.patient_repository.create_patient(patient_data)
-
-    def _patient_exists_by_email(self, email: str) -> bool:
-        """Проверка существования пациента по email"""
-        existing_patients = self.patient_repository.search_patients_by_email(email)
-        return len(existing_patients) > 0
-
-    def get_patient(self, patient_id: int):
-        """Получение пациента по ID"""
-        return self.patient_repository.get_patient_by_id(patient_id)
-
-    def get_doctor_patients(self, doctor_id: int):
-        """Получение пациентов врача"""
-        return self.patient_repository.get_patients_by_doctor(doctor_id)
-    
-    def get_all_patients(self):
-        """Получение всех пациентов"""
-        return self.patient_repository.get_all_patients()
-
-    def search_patients(self, search_term: str = None):
-        """Поиск пациентов"""
-        return self.patient_repository.search_patients(search_term)
-
-    def update_patient(self, patient_id: int, patient_data: dict):
-        """Обновление данных пациента"""
+    def _validate_patient_update(self, patient_data: dict):
+        """Проверка изменяемых полей; возвращает поля без версии и ожидаемую версию"""
         # Валидация полей если они присутствуют в обновлении
         if 'last_name' in patient_data and not self._validate_name(patient_data['last_name']):
             raise ValueError("Фамилия должна содержать только буквы")
@@ -101,11 +150,14 @@ class PatientService:
             if patient_data['sex'] not in ['M', 'F']:
                 raise ValueError("Некорректное значение пола. Допустимые значения: M, F")
 
-        return self.patient_repository.update_patient(patient_id, patient_data)
-
-    def search_patients(self, search_term: str, doctor_id: int = None):
-        """Поиск пациентов"""
-        return self.patient_repository.search_patients(search_term, doctor_id)
+        patient_data = dict(patient_data)
+        expected_version = patient_data.pop('version', None)
+        if expected_version is not None:
+            try:
+                expected_version = int(expected_version)
+            except (TypeError, ValueError):
+                raise ValueError("Некорректная версия данных пациента")
+        return patient_data, expected_version
 
     def _validate_name(self, name: str) -> bool:
         """Валидация имени (только буквы, дефисы, пробелы)"""
@@ -143,4 +195,119 @@ class PatientService:
         """Валидация телефона (российский формат)"""
         # Упрощенная валидация для российских номеров
         cleaned_phone = re.sub(r'[^\d+]', '', phone)
-        return len(cleaned_phone) >= 10 and cleaned_phone.startswith(('7', '8', '+7'))
\ No newline at end of file
+        return len(cleaned_phone) >= 10 and cleaned_phone.startswith(('7', '8', '+7'))
+
+class PatientService(PatientLogic):
+    def __init__(self, db_session):
+        self.patient_repository = PatientRepository(db_session)
+        self.count_cache = get_patient_count_cache()
+        self.search_index = get_patient_search_index()
+
+    def create_patient(self, patient_data: dict):
+        """Создание нового пациента с валидацией"""
+        self._validate_new_patient(patient_data)
+
+        # Проверка на существующего пациента по email
+        if patient_data.get('email') and self._patient_exists_by_email(patient_data['email']):
+            raise ValueError("Пациент с таким email уже существует в системе")
+
+        # Создаем пациента
+        patient = self.patient_repository.create_patient(patient_data)
+        self.count_cache.clear()
+        self._index_patient(patient)
+        return patient
+
+    def _patient_exists_by_email(self, email: str) -> bool:
+        """Проверка существования пациента по email"""
+        existing_patients = self.patient_repository.search_patients_by_email(email)
+        return len(existing_patients) > 0
+
+    def get_patient(self, patient_id: int):
+        """Получение пациента по ID"""
+        return self.patient_repository.get_patient_by_id(patient_id)
+
+    def get_doctor_patients(self, doctor_id: int):
+        """Получение пациентов врача"""
+        return self.patient_repository.get_patients_by_doctor(doctor_id)
+    
+    def get_patients_page(self, sort: str = 'name', after: str = None, before: str = None, limit: int = 20,
+                          search: str = None, sex: str = None, doctor_id: int = None, with_total: bool = True) -> Page:
+        """Страница списка пациентов по курсору after/before с итогом по фильтрам"""
+        after_values, before_values = self._decode_page_cursors(sort, after, before)
+        rows = self.patient_repository.get_patients_page(sort, after_values, before_values, limit, search, sex, doctor_id)
+        total = self._count_patients(search, sex, doctor_id) if with_total else None
+        return self._build_patients_page(rows, limit, sort, after_values, before_values, total)
+
+    def _count_patients(self, search: str = None, sex: str = None, doctor_id: int = None) -> TotalCount:
+        """Итог списка: оценка по статистике для всей таблицы, иначе COUNT из кэша"""
+        key = self._count_key(search, sex, doctor_id)
+        if not any(key):
+            total = self._estimated_total(self.patient_repository.estimate_patient_count())
+            if total is not None:
+                return total
+
+        count = self.count_cache.get(key)
+        if count is None:
+            count = self.patient_repository.count_patients(search, sex, doctor_id)
+            self.count_cache.put(key, count)
+        return TotalCount(count)
+
+    def get_all_patients(self):
+        """Получение всех пациентов"""
+        return self.patient_repository.get_all_patients()
+
+    def search_patients(self, search_term: str, doctor_id: int = None, limit: int = SEARCH_LIMIT):
+        """Поиск пациентов по ФИО, телефону и email, лучшие совпадения первыми
+
+        С pg_trgm поиск идет по GIN индексам, иначе - по n-граммному индексу
+        процесса с загрузкой найденных пациентов по id.
+        """
+        search_term = self._search_term(search_term)
+        if not search_term:
+            return []
+        if self.patient_repository.trigram_search_available():
+            return self.patient_repository.search_patients(search_term, doctor_id, limit)
+        patient_ids = self._get_search_index().search(search_term, self._index_limit(limit, doctor_id))
+        return self.patient_repository.get_patients_by_ids(patient_ids, doctor_id)[:limit]
+
+    def typeahead_patients(self, search_term: str, limit: int = TYPEAHEAD_LIMIT):
+        """Подсказки по началу фамилии (и имени, отчества через пробел)"""
+        search_term = self._search_term(search_term)
+        if not search_term:
+            return []
+        if self.patient_repository.trigram_search_available():
+            return self.patient_repository.typeahead_patients(search_term, limit)
+        return self.patient_repository.get_patients_by_ids(self._get_search_index().typeahead(search_term, limit))
+
+    def _get_search_index(self) -> PatientSearchIndex:
+        """Индекс процесса, перестроенный из БД, если он устарел
+
+        Перестраивает один запрос; остальные читают прежнюю версию, а до
+        первого построения ждут его.
+        """
+        index = self.search_index
+        while index.is_stale():
+            if index.begin_rebuild():
+                try:
+                    index.rebuild(self.patient_repository.get_search_rows())
+                finally:
+                    index.end_rebuild()
+            elif index.wait_ready(SEARCH_INDEX_WAIT_SECONDS):
+                break
+        return index
+
+    def update_patient(self, patient_id: int, patient_data: dict):
+        """Обновление данных пациента
+
+        Необязательное поле version - версия, с которой клиент начал
+        редактирование; при расхождении выбрасывается PatientConflictError.
+        """
+        patient_data, expected_version = self._validate_patient_update(patient_data)
+
+        try:
+            patient = self.patient_repository.update_patient(patient_id, patient_data, expected_version)
+        except StaleDataError:
+            raise PatientConflictError("Данные пациента изменены другим пользователем")
+
+        self._index_patient(patient)
+        return patient
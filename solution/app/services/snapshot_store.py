@@ -0,0 +1,148 @@
+import hashlib
+import json
+import os
+import shutil
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional
+from utils.metrics import metrics
+
+live_snapshots = metrics.gauge(
+    'knowledge_base_live_snapshots',
+    'Knowledge base snapshots kept in memory')
+snapshot_evictions_total = metrics.counter(
+    'knowledge_base_snapshot_evictions_total',
+    'Old knowledge base snapshots evicted from memory')
+snapshot_archive_loads_total = metrics.counter(
+    'knowledge_base_snapshot_archive_loads_total',
+    'Evicted snapshots restored from the on-disk archive')
+
+def canonical_json(knowledge_graph: Dict) -> bytes:
+    """Каноническое представление графа (порядок ключей и пробелы фиксированы)"""
+    return json.dumps(knowledge_graph, sort_keys=True, ensure_ascii=False,
+                      separators=(',', ':')).encode('utf-8')
+
+def graph_content_hash(knowledge_graph: Dict) -> str:
+    """Хеш содержимого графа, не зависящий от форматирования data.json"""
+    return hashlib.sha256(canonical_json(knowledge_graph)).hexdigest()
+
+class SnapshotStore:
+    """Хранилище снимков базы знаний с адресацией по хешу содержимого
+
+    В памяти держится не более max_snapshots версий, старые вытесняются
+    по LRU (текущая версия не вытесняется никогда). Если задан каталог
+    архива, каждая версия сохраняется туда, и вытесненный
+    снимок восстанавливается разбором только своего файла.
+    """
+
+    def __init__(self, snapshot_factory, max_snapshots: int = 8, archive_dir: str = None):
+        self.snapshot_factory = snapshot_factory
+        self.max_snapshots = max(1, max_snapshots)
+        self.archive_dir = archive_dir
+        self._snapshots = OrderedDict()
+        self._current = None
+        self._lock = threading.Lock()
+
+    @property
+    def current(self):
+        return self._current
+
+    def set_current(self, snapshot):
+        """Регистрация снимка и назначение его текущим"""
+        self.put(snapshot)
+        self._current = snapshot
+
+    def put(self, snapshot):
+        """Регистрация снимка в хранилище"""
+        with self._lock:
+            self._snapshots[snapshot.content_hash] = snapshot
+            self._snapshots.move_to_end(snapshot.content_hash)
+            self._evict()
+        self._archive(snapshot)
+
+    def peek(self, content_hash: str):
+        """Снимок из памяти без загрузки из архива (None, если его там нет)"""
+        with self._lock:
+            snapshot = self._snapshots.get(content_hash)
+            if snapshot is not None:
+                self._snapshots.move_to_end(content_hash)
+            return snapshot
+
+    def get(self, content_hash: str):
+        """Получение снимка по хешу (None, если версия недоступна)"""
+        if not content_hash:
+            return None
+
+        snapshot = self.peek(content_hash)
+        if snapshot is not None:
+            return snapshot
+
+        binary_path = self._archive_path(content_hash, '.okg')
+        if binary_path is not None and os.path.exists(binary_path):
+            snapshot = self.snapshot_factory(data_path=binary_path)
+        else:
+            knowledge_graph = self._load_archived(content_hash)
+            if knowledge_graph is None:
+                return None
+            snapshot = self.snapshot_factory(knowledge_graph=knowledge_graph)
+        snapshot_archive_loads_total.inc()
+        with self._lock:
+            self._snapshots[content_hash] = snapshot
+            self._evict()
+        return snapshot
+
+    def __len__(self) -> int:
+        return len(self._snapshots)
+
+    def _evict(self):
+        """Вытеснение самых давно использованных версий (под блокировкой)"""
+        current_hash = self._current.content_hash if self._current is not None else None
+        for content_hash in list(self._snapshots):
+            if len(self._snapshots) <= self.max_snapshots:
+                break
+            if content_hash == current_hash:
+                continue
+            del self._snapshots[content_hash]
+            snapshot_evictions_total.inc()
+        live_snapshots.set(len(self._snapshots))
+
+    def _archive_path(self, content_hash: str, extension: str = '.json') -> Optional[str]:
+        if not self.archive_dir:
+            return None
+        return os.path.join(self.archive_dir, f"{content_hash}{extension}")
+
+    def _archive(self, snapshot):
+        """Сохранение версии в архив (если он настроен)
+
+        Снимки из JSON сохраняются каноническим JSON, снимки из
+        скомпилированного файла - копией файла .okg.
+        """
+        is_binary = snapshot.knowledge_graph is None
+        archive_path = self._archive_path(snapshot.content_hash, '.okg' if is_binary else '.json')
+        if archive_path is None or os.path.exists(archive_path):
+            return
+        try:
+            os.makedirs(self.archive_dir, exist_ok=True)
+            tmp_path = f"{archive_path}.tmp"
+            if is_binary:
+                shutil.copyfile(snapshot.graph.path, tmp_path)
+            else:
+                with open(tmp_path, 'wb') as f:
+                    f.write(canonical_json(snapshot.knowledge_graph))
+            os.replace(tmp_path, archive_path)
+        except OSError as e:
+            print(f"Knowledge base snapshot archive unavailable: {e}")
+
+    def _load_archived(self, content_hash: str) -> Optional[Dict]:
+        archive_path = self._archive_path(content_hash)
+        if archive_path is None or not os.path.exists(archive_path):
+            return None
+        try:
+            with open(archive_path, 'rb') as f:
+                data = f.read()
+        except OSError:
+            return None
+        # Защита от подмененного или поврежденного файла архива
+        if hashlib.sha256(data).hexdigest() != content_hash:
+            return None
+        return json.loads(data)
@@ -0,0 +1,351 @@
+import math
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+from models.compiled_graph import CompiledGraph, NO_NODE, pack_path
+from models.graph_indexes import normalize_text
+
+# Сглаживание частот: диагнозы без консультаций не получают нулевой вес
+DEFAULT_SMOOTHING = 0.5
+
+class Rule(NamedTuple):
+    """Лист исходного дерева: ответы на пути к нему и диагноз"""
+    literals: Dict[str, bool]
+    diagnosis: str
+    depth: int
+    packed: int
+
+def extract_rules(graph: CompiledGraph) -> Tuple[List[Rule], Dict[str, str]]:
+    """Правила (пути к листьям) и исходные тексты вопросов по нормализованному ключу
+
+    Пути, на которых один вопрос получил разные ответы, недостижимы и пропускаются.
+    """
+    rules = []
+    question_texts: Dict[str, str] = {}
+    if graph.root == NO_NODE:
+        return rules, question_texts
+
+    stack = [(graph.root, 1, (), 0)]
+    while stack:
+        node_id, packed, literals, depth = stack.pop()
+        text = graph.text(node_id) or ''
+        if graph.is_final(node_id):
+            answers = {}
+            for key, answer in literals:
+                if answers.setdefault(key, answer) != answer:
+                    break
+            else:
+                rules.append(Rule(answers, text, depth, packed))
+            continue
+
+        key = normalize_text(text)
+        question_texts.setdefault(key, text)
+        for answer, bit in (('no', 0), ('yes', 1)):
+            child_id = graph.child(node_id, answer)
+            if child_id != NO_NODE:
+                stack.append((child_id, (packed << 1) | bit, literals + ((key, answer == 'yes'),), depth + 1))
+    return rules, question_texts
+
+class ConsultationStatistics:
+    """Частоты листьев и доли ответов 'да' по завершенным консультациям"""
+
+    def __init__(self, rules: List[Rule], smoothing: float = DEFAULT_SMOOTHING):
+        self.rules = rules
+        self.counts = [0.0] * len(rules)
+        self.smoothing = smoothing
+        self.rule_by_path = {rule.packed: index for index, rule in enumerate(rules)}
+        self.rules_by_diagnosis: Dict[str, List[int]] = {}
+        for index, rule in enumerate(rules):
+            self.rules_by_diagnosis.setdefault(normalize_text(rule.diagnosis), []).append(index)
+        self.yes_answers: Dict[str, int] = {}
+        self.total_answers: Dict[str, int] = {}
+        self.consultations = 0
+        self.matched_by_path = 0
+        self.matched_by_diagnosis = 0
+        self.skipped = 0
+
+    def add(self, diagnosis_data: Dict, final_diagnosis: Optional[str]):
+        """Учет одной консультации"""
+        self.consultations += 1
+        answers = diagnosis_data.get('answers') or {}
+        ordered = [answers[key] for key in sorted(answers, key=lambda key: int(key[1:]) if key[1:].isdigit() else 0)]
+        path = []
+        for qa in ordered:
+            answer = qa.get('answer')
+            if answer in ('yes', 'no'):
+                key = normalize_text(qa.get('question') or '')
+                self.total_answers[key] = self.total_answers.get(key, 0) + 1
+                self.yes_answers[key] = self.yes_answers.get(key, 0) + (answer == 'yes')
+            path.append(answer)
+
+        # Лист определяется по пути ответов, а при 'unknown' или старом
+        # дереве - по итоговому диагнозу (вес делится между его листьями)
+        rule_index = self.rule_by_path.get(pack_path(path)) if 'unknown' not in path else None
+        if rule_index is not None:
+            self.counts[rule_index] += 1
+            self.matched_by_path += 1
+            return
+
+        candidates = self.rules_by_diagnosis.get(normalize_text(final_diagnosis or ''))
+        if not candidates:
+            self.skipped += 1
+            return
+        for index in candidates:
+            self.counts[index] += 1 / len(candidates)
+        self.matched_by_diagnosis += 1
+
+    def weights(self) -> List[float]:
+        """Вероятности листей (со сглаживанием)"""
+        smoothed = [count + self.smoothing for count in self.counts]
+        total = sum(smoothed) or 1.0
+        return [weight / total for weight in smoothed]
+
+    def yes_rate(self, key: str) -> float:
+        """Доля ответов 'да' на вопрос (со сглаживанием Лапласа)"""
+        return (self.yes_answers.get(key, 0) + 1) / (self.total_answers.get(key, 0) + 2)
+
+# Предел числа состояний поиска, после которого используется жадный выбор
+DEFAULT_MAX_STATES = 50000
+# Сколько лучших по нижней оценке вопросов перебирается в каждом состоянии
+DEFAULT_BEAM = 3
+
+def _entropy(distribution: Dict[str, float]) -> float:
+    total = sum(distribution.values())
+    if total <= 0:
+        return 0.0
+    return -sum(weight / total * math.log2(weight / total) for weight in distribution.values() if weight > 0)
+
+class QuestionPlanner:
+    """Выбор порядка вопросов, минимизирующего ожидаемое число вопросов
+
+    Состояние - множество путей исходного дерева, совместимых с уже
+    полученными ответами. Правила, не содержащие выбранного вопроса,
+    уходят в обе ветки с весом, пропорциональным доле ответов 'да'.
+    Вопрос ищется перебором лучших кандидатов с отсечением по нижней
+    оценке (энтропия распределения диагнозов, как у кода Хаффмана) и
+    запоминанием состояний; при превышении max_states - жадно.
+    """
+
+    def __init__(self, rules: List[Rule], statistics: ConsultationStatistics, question_order: Dict[str, int],
+                 max_states: int = DEFAULT_MAX_STATES, beam: int = DEFAULT_BEAM):
+        self.rules = rules
+        self.statistics = statistics
+        self.question_order = question_order
+        self.max_states = max_states
+        self.beam = beam
+        self.memo: Dict[Tuple[frozenset, frozenset], Tuple[float, str]] = {}
+        self.exhaustive = True
+
+    def split(self, items, key: str):
+        """Разделение путей по ответу на вопрос"""
+        rate = self.statistics.yes_rate(key)
+        yes_items, no_items = [], []
+        for index, weight in items:
+            answer = self.rules[index].literals.get(key)
+            if answer is None:
+                yes_items.append((index, weight * rate))
+                no_items.append((index, weight * (1 - rate)))
+            else:
+                (yes_items if answer else no_items).append((index, weight))
+        return yes_items, no_items
+
+    def lower_bound(self, items) -> float:
+        """Нижняя оценка ожидаемого числа вопросов (вес * энтропия диагнозов)"""
+        distribution: Dict[str, float] = {}
+        for index, weight in items:
+            diagnosis = self.rules[index].diagnosis
+            distribution[diagnosis] = distribution.get(diagnosis, 0.0) + weight
+        return sum(distribution.values()) * _entropy(distribution)
+
+    def _candidates(self, items, asked):
+        """Лучшие вопросы для перебора, упорядоченные по нижней оценке
+
+        Кроме beam вопросов с наименьшей оценкой всегда рассматривается
+        лучший вопрос, не копирующий пути (исходный порядок дерева
+        всегда среди таких), поэтому результат не хуже исходного дерева.
+        """
+        keys = {key for index, _ in items for key in self.rules[index].literals if key not in asked}
+        if not keys:
+            raise ValueError("Пути дерева пересекаются: диагноз не определяется ответами")
+        scored = []
+        for key in keys:
+            yes_items, no_items = self.split(items, key)
+            duplicated = len(yes_items) + len(no_items) > len(items)
+            scored.append((self.lower_bound(yes_items) + self.lower_bound(no_items), self.question_order[key],
+                           duplicated, key, yes_items, no_items))
+        scored.sort(key=lambda candidate: candidate[:2])
+        selected = scored[:self.beam]
+        clean = next((candidate for candidate in scored if not candidate[2]), None)
+        if clean is not None and all(candidate is not clean for candidate in selected):
+            selected.append(clean)
+        return selected
+
+    def _state_key(self, items, asked):
+        indices = frozenset(index for index, _ in items)
+        relevant = frozenset(key for key in asked if any(key in self.rules[index].literals for index in indices))
+        return indices, relevant
+
+    def choose(self, items, asked) -> Optional[str]:
+        """Вопрос для состояния (None, если диагноз уже определен)"""
+        if len({self.rules[index].diagnosis for index, _ in items}) <= 1:
+            return None
+        if self.exhaustive:
+            try:
+                self.cost(items, asked)
+                return self.memo[self._state_key(items, asked)][1]
+            except _SearchBudgetExceeded:
+                self.exhaustive = False
+        candidates = self._candidates(items, asked)
+        # Без полного перебора безопаснее не копировать пути
+        return next((candidate[3] for candidate in candidates if not candidate[2]), candidates[0][3])
+
+    def cost(self, items, asked) -> float:
+        """Минимальная сумма весов заданных вопросов для состояния"""
+        if len({self.rules[index].diagnosis for index, _ in items}) <= 1:
+            return 0.0
+        total = sum(weight for _, weight in items)
+        state_key = self._state_key(items, asked)
+        cached = self.memo.get(state_key)
+        if cached is not None:
+            # Запоминается стоимость на единицу веса состояния
+            return cached[0] * total
+        if len(self.memo) >= self.max_states:
+            raise _SearchBudgetExceeded()
+
+        best_cost, best_key = None, None
+        for bound, _, _, key, yes_items, no_items in sorted(self._candidates(items, asked), key=lambda c: c[:2]):
+            if best_cost is not None and total + bound >= best_cost - 1e-12:
+                break
+            child_asked = asked | {key}
+            cost = total
+            for side_items in (yes_items, no_items):
+                if side_items:
+                    cost += self.cost(side_items, child_asked)
+                if best_cost is not None and cost >= best_cost - 1e-12:
+                    break
+            if best_cost is None or cost < best_cost - 1e-12:
+                best_cost, best_key = cost, key
+        self.memo[state_key] = (best_cost / total if total else 0.0, best_key)
+        return best_cost
+
+class _SearchBudgetExceeded(Exception):
+    pass
+
+def build_optimized_tree(rules: List[Rule], weights: List[float], question_texts: Dict[str, str],
+                         statistics: ConsultationStatistics,
+                         max_states: int = DEFAULT_MAX_STATES) -> Tuple[Dict, Dict[str, float], float]:
+    """Построение эквивалентного дерева с минимальным ожидаемым числом вопросов
+
+    Возвращает словарь дерева в формате data.json, ожидаемое число вопросов
+    по диагнозам и в среднем.
+    """
+    planner = QuestionPlanner(rules, statistics, {key: order for order, key in enumerate(question_texts)}, max_states)
+    root = {}
+    expected_total = 0.0
+    expected_by_diagnosis: Dict[str, float] = {}
+    # (пути с весами, заданные вопросы, словарь узла, глубина)
+    stack = [([(index, weight) for index, weight in enumerate(weights)], frozenset(), root, 0)]
+    while stack:
+        items, asked, node, depth = stack.pop()
+        key = planner.choose(items, asked)
+        if key is None:
+            # Все оставшиеся пути ведут к одному диагнозу - дальнейшие вопросы не нужны
+            diagnosis = rules[items[0][0]].diagnosis
+            node.update({'text': diagnosis, 'yes': None, 'no': None})
+            weight = sum(weight for _, weight in items)
+            expected_total += weight * depth
+            expected_by_diagnosis[diagnosis] = expected_by_diagnosis.get(diagnosis, 0.0) + weight * depth
+            continue
+
+        yes_items, no_items = planner.split(items, key)
+        node['text'] = question_texts[key]
+        asked = asked | {key}
+        # В исходном дереве у вопроса может не быть одного из переходов
+        node['yes'] = {} if yes_items else None
+        node['no'] = {} if no_items else None
+        for answer, answer_items in (('no', no_items), ('yes', yes_items)):
+            if answer_items:
+                stack.append((answer_items, asked, node[answer], depth + 1))
+    return root, expected_by_diagnosis, expected_total
+
+def verify_equivalent(rules: List[Rule], tree: Dict):
+    """Проверка, что новое дерево ставит тот же диагноз при любых ответах
+
+    Для каждого правила обходятся все ветки нового дерева, совместимые
+    с его ответами; все достигнутые листья должны давать его диагноз.
+    """
+    for rule in rules:
+        stack = [tree]
+        while stack:
+            node = stack.pop()
+            if node.get('yes') is None and node.get('no') is None:
+                if node.get('text') != rule.diagnosis:
+                    raise ValueError(f"Новое дерево меняет диагноз '{rule.diagnosis}' на '{node.get('text')}'")
+                continue
+            answer = rule.literals.get(normalize_text(node['text']))
+            for side in ('yes', 'no'):
+                if answer is None or answer == (side == 'yes'):
+                    if node.get(side) is None:
+                        raise ValueError(f"Новое дерево теряет путь к диагнозу '{rule.diagnosis}'")
+                    stack.append(node[side])
+
+def _tree_shape(tree: Dict) -> Tuple[int, int]:
+    """Число узлов и максимальная глубина дерева-словаря"""
+    nodes, max_depth = 0, 0
+    stack = [(tree, 0)]
+    while stack:
+        node, depth = stack.pop()
+        nodes += 1
+        max_depth = max(max_depth, depth)
+        for answer in ('yes', 'no'):
+            if node.get(answer) is not None:
+                stack.append((node[answer], depth + 1))
+    return nodes, max_depth
+
+def optimize_tree(graph: CompiledGraph, knowledge_graph: Dict, consultations: Iterable[Tuple[Dict, Optional[str]]],
+                  smoothing: float = DEFAULT_SMOOTHING) -> Tuple[Dict, Dict]:
+    """Предложение порядка вопросов по статистике завершенных консультаций
+
+    consultations - пары (sub_graph_find_diagnosis, final_diagnosis).
+    Возвращает дерево-кандидат в формате data.json и отчет до/после.
+    Если перестройка не сокращает консультации, кандидатом остается исходное дерево.
+    """
+    rules, question_texts = extract_rules(graph)
+    statistics = ConsultationStatistics(rules, smoothing)
+    for diagnosis_data, final_diagnosis in consultations:
+        statistics.add(diagnosis_data or {}, final_diagnosis)
+    weights = statistics.weights()
+
+    expected_before = sum(weight * rule.depth for rule, weight in zip(rules, weights))
+    before_by_diagnosis: Dict[str, float] = {}
+    frequency: Dict[str, float] = {}
+    for rule, weight in zip(rules, weights):
+        before_by_diagnosis[rule.diagnosis] = before_by_diagnosis.get(rule.diagnosis, 0.0) + weight * rule.depth
+        frequency[rule.diagnosis] = frequency.get(rule.diagnosis, 0.0) + weight
+
+    candidate, after_by_diagnosis, expected_after = build_optimized_tree(rules, weights, question_texts, statistics)
+    verify_equivalent(rules, candidate)
+    improved = expected_after < expected_before - 1e-9
+    if not improved:
+        candidate, after_by_diagnosis, expected_after = knowledge_graph, before_by_diagnosis, expected_before
+
+    nodes_before, depth_before = _tree_shape(knowledge_graph)
+    nodes_after, depth_after = _tree_shape(candidate)
+    report = {
+        'consultations': statistics.consultations,
+        'matched_by_path': statistics.matched_by_path,
+        'matched_by_diagnosis': statistics.matched_by_diagnosis,
+        'skipped': statistics.skipped,
+        'improved': improved,
+        'before': {'expected_questions': round(expected_before, 4), 'nodes': nodes_before, 'max_depth': depth_before},
+        'after': {'expected_questions': round(expected_after, 4), 'nodes': nodes_after, 'max_depth': depth_after},
+        'saved_questions_per_consultation': round(expected_before - expected_after, 4),
+        'diagnoses': [
+            {
+                'diagnosis': diagnosis,
+                'frequency': round(weight, 4),
+                'questions_before': round(before_by_diagnosis[diagnosis] / weight, 3),
+                'questions_after': round(after_by_diagnosis.get(diagnosis, 0.0) / weight, 3)
+            }
+            for diagnosis, weight in sorted(frequency.items(), key=lambda item: -item[1])
+        ]
+    }
+    return candidate, report
@@ -0,0 +1,78 @@
+import os
+import time
+from functools import wraps
+from itsdangerous import BadSignature
+from starlette.responses import Response
+from utils.controller_helpers import splice_json_fragments
+from utils.database import LAST_WRITE_KEY
+
+# Приложение Flask, рядом с которым работает API на ASGI: общие сессия
+# врача (подписанная cookie) и сериализация JSON
+_flask_app = None
+
+def init_asgi_helpers(flask_app):
+    """Привязка к приложению Flask (вызывается при создании ASGI-приложения)"""
+    global _flask_app
+    _flask_app = flask_app
+
+def json_response(success, message, data=None, status_code=200):
+    """JSON ответ в том же формате, что и utils.controller_helpers.json_response"""
+    return json_response_with_fragments(success, message, data, status_code=status_code)
+
+def json_response_with_fragments(success, message, data=None, fragments=None, status_code=200):
+    """JSON ответ с подстановкой заранее сериализованных фрагментов"""
+    response = {'success': success, 'message': message}
+    if data:
+        response.update(data)
+    body = splice_json_fragments(_flask_app.json.dumps(response).encode('utf-8'), fragments)
+    return Response(body, status_code=status_code, media_type='application/json')
+
+async def get_json(request):
+    """Тело запроса JSON или None, как request.get_json(silent=True) во Flask"""
+    try:
+        return await request.json()
+    except ValueError:
+        return None
+
+def _get_serializer():
+    return _flask_app.session_interface.get_signing_serializer(_flask_app)
+
+def load_session(request) -> dict:
+    """Данные сессии Flask из cookie (пустые, если cookie нет или подпись неверна)"""
+    cookie = request.cookies.get(_flask_app.config['SESSION_COOKIE_NAME'])
+    serializer = _get_serializer()
+    if not cookie or serializer is None:
+        return {}
+    try:
+        return serializer.loads(cookie, max_age=int(_flask_app.permanent_session_lifetime.total_seconds()))
+    except BadSignature:
+        return {}
+
+def login_required(handler):
+    """Проверка авторизации по сессии Flask; данные сессии - в request.state.session"""
+    @wraps(handler)
+    async def decorated_function(request):
+        session = load_session(request)
+        if not session.get('logged_in'):
+            return json_response(False, 'Требуется авторизация', status_code=401)
+        request.state.session = session
+        return await handler(request)
+    return decorated_function
+
+def remember_write(request, response):
+    """Отметка записи врача в cookie сессии (окно read-your-writes реплики Flask)"""
+    if not os.getenv('DATABASE_REPLICA_URL'):
+        return response
+    session = dict(request.state.session)
+    session[LAST_WRITE_KEY] = time.time()
+    interface = _flask_app.session_interface
+    response.set_cookie(
+        _flask_app.config['SESSION_COOKIE_NAME'],
+        _get_serializer().dumps(session),
+        path=interface.get_cookie_path(_flask_app),
+        domain=interface.get_cookie_domain(_flask_app),
+        secure=interface.get_cookie_secure(_flask_app),
+        httponly=interface.get_cookie_httponly(_flask_app),
+        samesite=interface.get_cookie_samesite(_flask_app)
+    )
+    return response
@@ -0,0 +1,61 @@
+import os
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from utils.database import get_database_url
+
+# Асинхронный движок процесса для API на ASGI (создается при первом обращении)
+_async_engine = None
+
+# Асинхронные драйверы для синхронных URL из DATABASE_URL
+ASYNC_DRIVERS = {
+    'postgresql': 'postgresql+asyncpg',
+    'sqlite': 'sqlite+aiosqlite'
+}
+
+# Объекты остаются доступными после commit: ленивой загрузки в async нет
+_async_session_factory = async_sessionmaker(class_=AsyncSession, autoflush=False, expire_on_commit=False)
+
+def get_async_database_url():
+    """URL БД с асинхронным драйвером: DATABASE_ASYNC_URL или DATABASE_URL с заменой драйвера"""
+    async_url = os.getenv('DATABASE_ASYNC_URL')
+    if async_url:
+        return async_url
+
+    url = make_url(get_database_url())
+    backend = url.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        raise ValueError(f"Нет асинхронного драйвера для {backend}, задайте DATABASE_ASYNC_URL")
+    return url.set(drivername=ASYNC_DRIVERS[backend]).render_as_string(hide_password=False)
+
+def get_async_engine():
+    """Асинхронный движок процесса с пулом (настройки пула те же, что у синхронного)
+
+    Пул отдельный: при запуске обоих уровней в одном процессе к PostgreSQL
+    открывается до 2 * (DB_POOL_SIZE + DB_MAX_OVERFLOW) соединений.
+    """
+    global _async_engine
+    if _async_engine is None:
+        _async_engine = create_async_engine(
+            get_async_database_url(),
+            poolclass=AsyncAdaptedQueuePool,
+            pool_size=int(os.getenv('DB_POOL_SIZE', '5')),
+            max_overflow=int(os.getenv('DB_MAX_OVERFLOW', '10')),
+            pool_timeout=float(os.getenv('DB_POOL_TIMEOUT', '30')),
+            pool_recycle=int(os.getenv('DB_POOL_RECYCLE', '1800')),
+            pool_pre_ping=os.getenv('DB_POOL_PRE_PING', 'true').lower() == 'true'
+        )
+        _async_session_factory.configure(bind=_async_engine)
+    return _async_engine
+
+def get_async_db_session() -> AsyncSession:
+    """Новая асинхронная сессия (закрывается вызывающим: async with)"""
+    get_async_engine()
+    return _async_session_factory()
+
+async def dispose_async_engine():
+    """Закрытие соединений асинхронного пула при остановке приложения"""
+    global _async_engine
+    if _async_engine is not None:
+        await _async_engine.dispose()
+        _async_engine = None
@@ -17,7 +17,7 @@ def extract_symptoms_for_html(diagnosis_data):
     # Формат 2: answers как словарь вопросов-ответов (основной формат)
     elif 'answers' in diagnosis_data and isinstance(diagnosis_data['answers'], dict):
         for question, answer_data in diagnosis_data['answers'].items():
-            if isinstance(answer_data, dict):
+            if isinstance(answer_data, dict) and answer_data.get('answer') != 'unknown':
                 symptoms.append({
                     'name': answer_data.get('question', question),
                     'present': answer_data.get('answer') == 'yes'
@@ -39,9 +39,14 @@ def extract_symptoms_for_html(diagnosis_data):
     
     return symptoms
 
-def prepare_consultation_data(consultation):
-    """Подготавливает данные консультации для отображения"""
+def prepare_consultation_data(consultation, answers=None):
+    """Подготавливает данные консультации для отображения
+
+    answers - история ответов из журнала consultation_answers.
+    """
     diagnosis_data = consultation.sub_graph_find_diagnosis or {}
+    if answers is not None:
+        diagnosis_data = dict(diagnosis_data, answers={f"q{seq}": qa for seq, qa in enumerate(answers, start=1)})
     
     # Единая логика извлечения симптомов
     symptoms_evidence = extract_symptoms_for_html(diagnosis_data)
@@ -1,4 +1,4 @@
-from flask import jsonify
+from flask import jsonify, current_app
 from utils.database import _calculate_age
 
 def json_response(success, message, data=None, status_code=200):
@@ -8,6 +8,78 @@ def json_response(success, message, data=None, status_code=200):
         response.update(data)
     return jsonify(response), status_code
 
+def splice_json_fragments(body: bytes, fragments=None) -> bytes:
+    """Подстановка заранее сериализованных фрагментов в JSON объект
+
+    fragments - словарь ключ -> готовые UTF-8 JSON байты (или None для null).
+    """
+    if not fragments:
+        return body
+    
+    # Убираем закрывающую скобку и дописываем готовые фрагменты
+    parts = [body[:-1]]
+    for key, fragment in fragments.items():
+        parts.append(b',"' + key.encode('utf-8') + b'":')
+        parts.append(fragment if fragment is not None else b'null')
+    parts.append(b'}')
+    return b''.join(parts)
+
+def json_response_with_fragments(success, message, data=None, fragments=None, status_code=200):
+    """JSON ответ с подстановкой заранее сериализованных фрагментов
+
+    fragments вставляются в тело ответа без повторной сериализации
+    (см. splice_json_fragments).
+    """
+    response = {'success': success, 'message': message}
+    if data:
+        response.update(data)
+    body = splice_json_fragments(current_app.json.dumps(response).encode('utf-8'), fragments)
+    return current_app.response_class(body, status=status_code, mimetype='application/json')
+
+def prepare_answer_response(result):
+    """Данные и готовые фрагменты ответа API по состоянию консультации после ответов"""
+    next_question = result.next_question
+    response_data = {
+        'progress': result.progress,
+        'candidates': result.candidates,
+        'answer_count': result.progress['questions_answered']
+    }
+    
+    if next_question and next_question.is_final:
+        response_data['diagnosis_candidate'] = result.diagnosis_data.get('final_diagnosis_candidate')
+    
+    # Вопрос и поддерево берутся из предвычисленных таблиц уже сериализованными
+    return response_data, {
+        'next_question': next_question.json_bytes if next_question else None,
+        'prefetch': result.prefetch
+    }
+
+def prepare_consultation_response(consultation, answers, current):
+    """Данные и готовые фрагменты ответа API с консультацией и ее текущим состоянием"""
+    current_question = current.next_question if current else None
+    return {
+        'consultation': {
+            'id': consultation.id,
+            'patient_id': consultation.patient_id,
+            'doctor_id': consultation.doctor_id,
+            'status': consultation.status,
+            'final_diagnosis': consultation.final_diagnosis,
+            'sub_graph_find_diagnosis': consultation.sub_graph_find_diagnosis,
+            'answers': answers,
+            'consultation_date': consultation.consultation_date.isoformat() if consultation.consultation_date else None,
+            'patient': {
+                'last_name': consultation.patient.last_name,
+                'first_name': consultation.patient.first_name,
+                'middle_name': consultation.patient.middle_name
+            } if consultation.patient else None
+        },
+        'progress': current.progress if current else None,
+        'answer_count': current.progress['questions_answered'] if current else 0
+    }, {
+        'current_question': current_question.json_bytes if current_question else None,
+        'prefetch': current.prefetch if current else None
+    }
+
 def prepare_patient_data(patient, for_json=True):
     """Подготовка данных пациента для JSON ответов или шаблонов"""
     base_data = {
@@ -23,7 +95,8 @@ def prepare_patient_data(patient, for_json=True):
         'chronic_diseases': patient.chronic_diseases,
         'current_medications': patient.current_medications,
         'family_anamnes': patient.family_anamnes,
-        'notes': patient.notes
+        'notes': patient.notes,
+        'version': patient.version
     }
     
     if for_json:
@@ -77,4 +150,46 @@ def prepare_consultation_result_data(consultation_data, diagnosis_result):
             'notes': consultation_data.notes or ''
         },
         'diagnosis_result': diagnosis_result
-    }
\ No newline at end of file
+    }
+
+def parse_limit(args, default_limit: int, max_limit: int) -> int:
+    """Размер выдачи из параметра limit строки запроса, в пределах 1..max_limit"""
+    try:
+        limit = int(args.get('limit') or default_limit)
+    except (TypeError, ValueError):
+        raise ValueError("Некорректный размер страницы")
+    return max(1, min(limit, max_limit))
+
+def parse_page_args(args, default_limit: int = 20, max_limit: int = 100, default_sort: str = 'name') -> dict:
+    """Параметры страницы списка из строки запроса: порядок, курсоры, размер и фильтры"""
+    sex = args.get('sex') or None
+    if sex not in (None, 'M', 'F'):
+        raise ValueError("Некорректное значение пола. Допустимые значения: M, F")
+
+    return {
+        'sort': args.get('sort') or default_sort,
+        'after': args.get('after') or None,
+        'before': args.get('before') or None,
+        'limit': parse_limit(args, default_limit, max_limit),
+        'search': (args.get('search') or '').strip() or None,
+        'sex': sex
+    }
+
+def prepare_patients_page_data(page) -> dict:
+    """Данные JSON ответа со страницей пациентов и курсорами соседних страниц"""
+    return {
+        'patients': [prepare_patient_data(patient, for_json=True) for patient in page.items],
+        'total': page.total.value if page.total else len(page.items),
+        'total_estimated': page.total.estimated if page.total else False,
+        'next_cursor': page.next_cursor,
+        'prev_cursor': page.prev_cursor
+    }
+
+def prepare_typeahead_data(patient) -> dict:
+    """Подсказка поиска: только то, что нужно для выбора пациента из списка"""
+    return {
+        'id': patient.id,
+        'name': f"{patient.last_name} {patient.first_name} {patient.middle_name or ''}".strip(),
+        'birthday': patient.birthday.isoformat() if patient.birthday else None,
+        'age': _calculate_age(patient.birthday) if patient.birthday else None
+    }
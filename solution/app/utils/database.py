@@ -1,18 +1,163 @@
+import inspect
 import os
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+import threading
+import time
+from contextvars import ContextVar
+from sqlalchemy import create_engine, event, Delete, Insert, Update
+from sqlalchemy.orm import Session, scoped_session, sessionmaker
 from functools import wraps
-from flask import session, jsonify
+from flask import session, jsonify, has_app_context, has_request_context, request
+from flask.globals import app_ctx
+from utils.db_metrics import InstrumentedQueuePool, SessionTracker, instrument_engine
+
+# Движок процесса с пулом соединений (создается при старте приложения)
+_engine = None
+
+# Движок реплики для чтения (None - все запросы идут в основную БД)
+_replica_engine = None
+
+# Создание движков при первом обращении из нескольких потоков
+_engine_lock = threading.Lock()
+
+# Выполняется ли код, помеченный read_only
+_read_only_scope = ContextVar('read_only_scope', default=False)
+
+# Ключ сессии Flask с временем последней записи врача
+LAST_WRITE_KEY = 'db_last_write_at'
+
+def _read_your_writes_seconds():
+    return float(os.getenv('DATABASE_REPLICA_READ_YOUR_WRITES', '5'))
+
+def _wrote_recently():
+    """Врач писал в БД недавно: реплика может еще не содержать его изменений"""
+    if not has_request_context():
+        return False
+    last_write = session.get(LAST_WRITE_KEY)
+    return last_write is not None and time.time() - last_write < _read_your_writes_seconds()
+
+class RoutingSession(Session):
+    """Сессия, направляющая чтения из кода read_only в реплику
+
+    Запись (flush, UPDATE/DELETE/INSERT) всегда идет в основную БД; после
+    записи в этой сессии и в течение окна read-your-writes после записи
+    врача чтения тоже остаются в основной БД.
+    """
+
+    def get_bind(self, mapper=None, clause=None, **kw):
+        if (_replica_engine is not None and _read_only_scope.get()
+                and not self._flushing
+                and not isinstance(clause, (Insert, Update, Delete))
+                and not self.info.get('has_writes')
+                and not _wrote_recently()):
+            return _replica_engine
+        return super().get_bind(mapper=mapper, clause=clause, **kw)
+
+@event.listens_for(RoutingSession, 'after_flush')
+def _mark_flush_write(db_session, flush_context):
+    db_session.info['has_writes'] = True
+
+@event.listens_for(RoutingSession, 'do_orm_execute')
+def _mark_bulk_write(orm_execute_state):
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        orm_execute_state.session.info['has_writes'] = True
+
+@event.listens_for(RoutingSession, 'after_commit')
+def _remember_write(db_session):
+    # Без реплики окно read-your-writes не нужно: cookie сессии не меняется
+    if db_session.info.pop('has_writes', False) and _replica_engine is not None and has_request_context():
+        session[LAST_WRITE_KEY] = time.time()
+
+@event.listens_for(RoutingSession, 'after_rollback')
+def _forget_write(db_session):
+    db_session.info.pop('has_writes', None)
+
+def read_only(f):
+    """Маршрут или метод репозитория только читает: запросы можно отдать реплике"""
+    if inspect.isgeneratorfunction(f):
+        raise TypeError(f"read_only does not support generator {f.__qualname__}")
+
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        token = _read_only_scope.set(True)
+        try:
+            return f(*args, **kwargs)
+        finally:
+            _read_only_scope.reset(token)
+    return decorated_function
+
+_session_factory = sessionmaker(class_=RoutingSession, autocommit=False, autoflush=False)
+
+def _session_scope():
+    """Ключ сессии: контекст приложения Flask, вне его - текущий поток"""
+    if has_app_context():
+        return id(app_ctx._get_current_object())
+    return threading.get_ident()
+
+# Сессия запроса: одна на контекст приложения, закрывается в teardown_appcontext
+SessionLocal = scoped_session(_session_factory, scopefunc=_session_scope)
+
+# Учет сессий, держащих соединение, для поиска незакрытых
+session_tracker = SessionTracker(_session_scope)
+session_tracker.install()
 
 def get_database_url():
     """Получение URL базы данных из переменных окружения"""
     return os.getenv("DATABASE_URL", "postgresql://admin:password@db:5432/ophthalmology_db")
 
+def _create_pooled_engine(database_url: str):
+    return create_engine(
+        database_url,
+        poolclass=InstrumentedQueuePool,
+        pool_size=int(os.getenv('DB_POOL_SIZE', '5')),
+        max_overflow=int(os.getenv('DB_MAX_OVERFLOW', '10')),
+        pool_timeout=float(os.getenv('DB_POOL_TIMEOUT', '30')),
+        pool_recycle=int(os.getenv('DB_POOL_RECYCLE', '1800')),
+        pool_pre_ping=os.getenv('DB_POOL_PRE_PING', 'true').lower() == 'true'
+    )
+
+def get_engine():
+    """Движок БД процесса (создается при первом обращении)
+
+    Размер пула задается на процесс: при нескольких воркерах в PostgreSQL
+    открывается до воркеры * (DB_POOL_SIZE + DB_MAX_OVERFLOW) соединений.
+    """
+    global _engine, _replica_engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                engine = _create_pooled_engine(get_database_url())
+                instrument_engine(engine)
+                replica_url = os.getenv('DATABASE_REPLICA_URL')
+                if replica_url:
+                    # Гейджи пула ведутся по основной БД, время выдачи соединения - общее
+                    _replica_engine = _create_pooled_engine(replica_url)
+                _session_factory.configure(bind=engine)
+                _engine = engine
+    return _engine
+
+def dispose_engines_after_fork():
+    """Новые пулы в дочернем процессе после fork
+
+    Соединения, открытые родителем, не закрываются (close=False): ими
+    продолжает пользоваться он сам, а в дочернем процессе пул открывает свои.
+    """
+    for engine in (_engine, _replica_engine):
+        if engine is not None:
+            engine.dispose(close=False)
+
+def init_db(app):
+    """Создание движка при старте и закрытие сессии по завершении запроса"""
+    get_engine()
+
+    @app.teardown_appcontext
+    def remove_db_session(exception=None):
+        SessionLocal.remove()
+        # Все, что держит соединение после закрытия сессии запроса, - утечка
+        session_tracker.check_scope(_session_scope(), request.endpoint if has_request_context() else None)
+
 def get_db_session():
-    """Создание сессии БД"""
-    database_url = get_database_url()
-    engine = create_engine(database_url)
-    SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    """Сессия БД текущего запроса (соединения берутся из пула процесса)"""
+    get_engine()
     return SessionLocal()
 
 def login_required(f):
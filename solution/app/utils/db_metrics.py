@@ -0,0 +1,113 @@
+import threading
+import time
+import weakref
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import QueuePool
+from utils.metrics import metrics
+
+# Корзины для ожидания соединения: обычно доли миллисекунды, при исчерпании пула - до pool_timeout
+CHECKOUT_BUCKETS = (0.0001, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.5, 1.0, 5.0, 30.0)
+
+pool_checkout_seconds = metrics.histogram(
+    'db_pool_checkout_seconds',
+    'Time to obtain a pooled connection, including waits, pre-ping and new connects',
+    buckets=CHECKOUT_BUCKETS)
+pool_checked_out = metrics.gauge(
+    'db_pool_checked_out',
+    'Connections currently checked out of the pool')
+pool_overflow = metrics.gauge(
+    'db_pool_overflow',
+    'Connections open beyond pool_size (max_overflow in use)')
+pool_connects_total = metrics.counter(
+    'db_pool_connects_total',
+    'New DBAPI connections opened by the pool')
+pool_invalidations_total = metrics.counter(
+    'db_pool_invalidations_total',
+    'Pooled connections invalidated (disconnects, failed pre-ping, errors)')
+session_transaction_seconds = metrics.histogram(
+    'db_session_transaction_seconds',
+    'Time an ORM session held a connection, from first use to commit, rollback or close')
+sessions_open = metrics.gauge(
+    'db_sessions_open',
+    'ORM sessions currently holding a connection')
+sessions_unclosed_total = metrics.counter(
+    'db_sessions_unclosed_total',
+    'ORM sessions still holding a connection after the request that opened them ended')
+
+class InstrumentedQueuePool(QueuePool):
+    """QueuePool, замеряющий время получения соединения"""
+
+    def connect(self):
+        started = time.perf_counter()
+        try:
+            return super().connect()
+        finally:
+            pool_checkout_seconds.observe(time.perf_counter() - started)
+
+def instrument_engine(engine):
+    """Подписка на события пула движка: выдача, возврат, новые и сброшенные соединения"""
+
+    def update_pool_gauges(*args):
+        # Пул берется из движка при каждом событии: dispose() создает новый
+        pool = engine.pool
+        pool_checked_out.set(pool.checkedout())
+        pool_overflow.set(max(0, pool.overflow()))
+
+    def on_invalidate(dbapi_connection, connection_record, exception):
+        pool_invalidations_total.inc()
+
+    event.listen(engine, 'checkout', update_pool_gauges)
+    event.listen(engine, 'checkin', update_pool_gauges)
+    event.listen(engine, 'connect', lambda dbapi_connection, connection_record: pool_connects_total.inc())
+    event.listen(engine, 'invalidate', on_invalidate)
+    event.listen(engine, 'soft_invalidate', on_invalidate)
+
+class SessionTracker:
+    """Учет сессий ORM, держащих соединение
+
+    Сессия попадает в учет при первом использовании соединения и выходит
+    из него при завершении корневой транзакции (commit, rollback, close).
+    По окончании запроса сессии, открытые в нем и все еще держащие
+    соединение, считаются незакрытыми: это сессии в обход сессии запроса,
+    которые никто не закрыл.
+    """
+
+    def __init__(self, scope_func):
+        self.scope_func = scope_func
+        # Сессия, удаленная сборщиком мусора, выпадает из учета сама
+        self._open = weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+
+    def install(self):
+        event.listen(Session, 'after_begin', self._on_begin)
+        event.listen(Session, 'after_transaction_end', self._on_transaction_end)
+
+    def _on_begin(self, session, transaction, connection):
+        with self._lock:
+            if session not in self._open:
+                self._open[session] = (time.perf_counter(), self.scope_func())
+                sessions_open.set(len(self._open))
+
+    def _on_transaction_end(self, session, transaction):
+        if transaction.parent is not None:
+            return
+        with self._lock:
+            entry = self._open.pop(session, None)
+            sessions_open.set(len(self._open))
+        if entry is not None:
+            session_transaction_seconds.observe(time.perf_counter() - entry[0])
+
+    def check_scope(self, scope, endpoint=None) -> int:
+        """Число сессий области scope, не закрытых к концу запроса"""
+        with self._lock:
+            leaked = [session for session, (_, session_scope) in self._open.items()
+                      if session_scope == scope]
+            for session in leaked:
+                # Повторно по окончании следующих запросов не считаем
+                started, _ = self._open[session]
+                self._open[session] = (started, None)
+        if leaked:
+            sessions_unclosed_total.inc(len(leaked))
+            print(f"{len(leaked)} database session(s) left open by {endpoint or 'request'}")
+        return len(leaked)
@@ -0,0 +1,111 @@
+import threading
+from bisect import bisect_left
+
+# Границы корзин гистограмм по умолчанию (секунды)
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+class Counter:
+    """Монотонно возрастающий счетчик"""
+
+    def __init__(self, name: str, description: str):
+        self.name = name
+        self.description = description
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self._lock:
+            self.value += amount
+
+    def render(self):
+        return [f"# HELP {self.name} {self.description}",
+                f"# TYPE {self.name} counter",
+                f"{self.name} {self.value}"]
+
+class Gauge:
+    """Значение, которое может как расти, так и уменьшаться"""
+
+    def __init__(self, name: str, description: str):
+        self.name = name
+        self.description = description
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def set(self, value):
+        self.value = value
+
+    def inc(self, amount=1):
+        with self._lock:
+            self.value += amount
+
+    def dec(self, amount=1):
+        with self._lock:
+            self.value -= amount
+
+    def render(self):
+        return [f"# HELP {self.name} {self.description}",
+                f"# TYPE {self.name} gauge",
+                f"{self.name} {self.value}"]
+
+class Histogram:
+    """Гистограмма наблюдений с фиксированными корзинами"""
+
+    def __init__(self, name: str, description: str, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.description = description
+        self.buckets = tuple(buckets)
+        self.bucket_counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            self.bucket_counts[index] += 1
+            self.sum += value
+            self.count += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.description}",
+                 f"# TYPE {self.name} histogram"]
+        cumulative = 0
+        for bound, bucket_count in zip(self.buckets, self.bucket_counts):
+            cumulative += bucket_count
+            lines.append(f'{self.name}_bucket{{le="{bound}"}} {cumulative}')
+        lines.append(f'{self.name}_bucket{{le="+Inf"}} {self.count}')
+        lines.append(f"{self.name}_sum {self.sum}")
+        lines.append(f"{self.name}_count {self.count}")
+        return lines
+
+class MetricsRegistry:
+    """Реестр метрик процесса"""
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric_class, name, description, **kwargs):
+        with self._lock:
+            if name not in self._metrics:
+                self._metrics[name] = metric_class(name, description, **kwargs)
+            return self._metrics[name]
+
+    def counter(self, name: str, description: str) -> Counter:
+        return self._register(Counter, name, description)
+
+    def gauge(self, name: str, description: str) -> Gauge:
+        return self._register(Gauge, name, description)
+
+    def histogram(self, name: str, description: str, buckets=DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram, name, description, buckets=buckets)
+
+    def render_prometheus(self) -> str:
+        """Текстовый формат экспозиции Prometheus"""
+        lines = []
+        for metric in list(self._metrics.values()):
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+# Глобальный реестр метрик
+metrics = MetricsRegistry()
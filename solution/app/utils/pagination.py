@@ -0,0 +1,53 @@
+import base64
+import binascii
+import json
+from datetime import datetime
+from typing import List, NamedTuple, Optional
+
+class TotalCount(NamedTuple):
+    """Число строк и признак оценки по статистике планировщика"""
+    value: int
+    estimated: bool = False
+
+class Page(NamedTuple):
+    """Страница списка с курсорами соседних страниц (None - страницы нет)"""
+    items: List
+    next_cursor: Optional[str]
+    prev_cursor: Optional[str]
+    total: Optional[TotalCount] = None
+
+def encode_cursor(sort: str, values) -> str:
+    """Курсор страницы: порядок сортировки и значения ключа строки (base64url JSON)"""
+    payload = [sort] + [value.isoformat() if isinstance(value, datetime) else value for value in values]
+    token = base64.urlsafe_b64encode(json.dumps(payload, ensure_ascii=False, separators=(',', ':')).encode('utf-8'))
+    return token.decode('ascii').rstrip('=')
+
+def decode_cursor(token: str, sort: str) -> list:
+    """Значения ключа из курсора; курсор другого порядка сортировки - ошибка"""
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(token + '=' * (-len(token) % 4)))
+    except (ValueError, binascii.Error):
+        raise ValueError("Некорректный курсор страницы")
+    if not isinstance(payload, list) or len(payload) < 2 or payload[0] != sort:
+        raise ValueError("Курсор относится к другому порядку сортировки")
+    return payload[1:]
+
+def build_page(rows: list, limit: int, key, sort: str, after=None, before=None) -> Page:
+    """Страница из limit + 1 строк запроса по ключу
+
+    Лишняя строка означает, что в направлении чтения есть еще страница.
+    При чтении назад (before) строки приходят в обратном порядке.
+    """
+    has_more = len(rows) > limit
+    items = rows[:limit]
+    if before is not None:
+        items.reverse()
+        has_next, has_prev = True, has_more
+    else:
+        has_next, has_prev = has_more, after is not None
+
+    return Page(
+        items=items,
+        next_cursor=encode_cursor(sort, key(items[-1])) if items and has_next else None,
+        prev_cursor=encode_cursor(sort, key(items[0])) if items and has_prev else None
+    )
@@ -0,0 +1,53 @@
+import gc
+import os
+from services.consultation_service import get_consultation_state_cache, get_diagnosis_service
+from services.knowledge_base_watcher import start_knowledge_base_watcher
+from utils.database import dispose_engines_after_fork, get_engine
+
+# Переменная окружения pre-fork режима (ставит gunicorn.conf.py до загрузки приложения)
+PREFORK_ENV = 'APP_PREFORK'
+
+def is_prefork() -> bool:
+    """Приложение загружается в мастере gunicorn до fork воркеров"""
+    return os.getenv(PREFORK_ENV) == '1'
+
+def preload(app):
+    """Загрузка общих для воркеров данных в мастере до fork
+
+    База знаний со структурами консультаций, кэш консультаций,
+    скомпилированные шаблоны и карта URL создаются один раз, воркеры
+    получают их страницы copy-on-write.
+    gc.freeze() убирает эти объекты из обхода сборщика мусора, иначе он
+    пишет в их заголовки и страницы копируются в каждый воркер.
+    """
+    get_diagnosis_service().prepare_consultations()
+    get_consultation_state_cache()
+    for template_name in app.jinja_env.list_templates():
+        app.jinja_env.get_template(template_name)
+    # Первый запрос строит карту URL и провайдер JSON; БД не нужна
+    app.test_client().get('/health')
+    gc.freeze()
+    print(f"Preloaded knowledge base version {get_diagnosis_service().version} "
+          f"and {len(app.jinja_env.list_templates())} templates before fork")
+
+def after_fork():
+    """Подготовка воркера: свои пулы соединений и наблюдение за базой знаний
+
+    Потоки мастера (наблюдение за data.json) через fork не переходят,
+    поэтому наблюдение запускается в каждом воркере.
+    """
+    dispose_engines_after_fork()
+    start_knowledge_base_watcher()
+
+def warm_up(app, connections: int = 1):
+    """Прогрев воркера до приема запросов: соединения пула и первый запрос Flask"""
+    try:
+        engine = get_engine()
+        opened = [engine.connect() for _ in range(max(0, connections))]
+        for connection in opened:
+            connection.exec_driver_sql('SELECT 1')
+            connection.close()
+        app.test_client().get('/health')
+    except Exception as e:
+        # БД может быть еще недоступна: воркер все равно начинает работу
+        print(f"Worker {os.getpid()} warm-up failed: {e}")
@@ -26,6 +26,22 @@ document.addEventListener('DOMContentLoaded', function () {
     const exportPdfBtn = document.getElementById('exportPdfBtn');
 
     // Данные консультации
+    const candidatesList = document.getElementById('candidatesList');
+    const progressFill = document.getElementById('progressFill');
+    const progressAnswered = document.getElementById('progressAnswered');
+    const progressRemaining = document.getElementById('progressRemaining');
+
+    // Подписи ответов в истории
+    const ANSWER_ICONS = { yes: '✅', no: '❌', unknown: '❔' };
+    const ANSWER_LABELS = { yes: 'Да', no: 'Нет', unknown: 'Не знаю' };
+    // Сколько оставшихся диагнозов показывать под вопросом
+    const VISIBLE_CANDIDATES = 5;
+    // Ссылка на отсутствующий переход в компактном поддереве
+    // (отрицательные ссылки ниже - узлы, не вошедшие в поддерево)
+    const NO_NODE = -1;
+    // Пауза после последнего ответа перед фоновой синхронизацией
+    const SYNC_DELAY_MS = 1500;
+
     const consultationId = document.getElementById('consultationId')?.value;
     const patientId = document.getElementById('patientId')?.value;
 
@@ -37,6 +53,21 @@ document.addEventListener('DOMContentLoaded', function () {
         return;
     }
 
+    // Предзагруженное поддерево: ответы внутри него применяются сразу,
+    // а на сервер уходят пакетом (nodes[i] = [текст, yes, no, мин, макс, ожидаемо])
+    let prefetch = JSON.parse(document.getElementById('prefetchData')?.textContent || 'null');
+    let prefetchNode = 0;
+    // Число ответов, подтвержденных сервером
+    let baseCount = parseInt(document.getElementById('answerCount')?.value || '0', 10);
+    let pendingAnswers = [];
+    let inFlightAnswers = [];
+    let syncTimer = null;
+    let syncPromise = null;
+    let diagnosisReached = false;
+
+    // Доступ для обработчиков черновика вне этого блока
+    window.consultationSync = { flush: () => flushAnswers(true) };
+
     // Инициализация - скрываем карточку рекомендаций и секцию завершения
     hideRecommendationsCard();
     hideCompletionSection();
@@ -100,49 +131,178 @@ document.addEventListener('DOMContentLoaded', function () {
     }
 
     async function saveAnswer(answer) {
-        console.log('=== SAVE ANSWER START ===');
-        console.log('Saving answer:', answer, 'for consultation:', consultationId);
+        console.log('Answer:', answer, 'for consultation:', consultationId);
+
+        const next = localNext(answer);
+        if (next !== null) {
+            advanceLocally(answer, next);
+            if (isFinalNode(next)) {
+                // Диагноз подтверждает сервер: синхронизируем сразу
+                await flushAnswers(true);
+            } else {
+                scheduleSync();
+            }
+            return;
+        }
 
-        // Показываем loading state
+        // 'unknown', переход за пределы поддерева или его отсутствие -
+        // ответ уходит на сервер вместе с накопленными
+        pendingAnswers.push(answer);
+        prefetch = null;
+        await flushAnswers(true);
+    }
+
+    function localNext(answer) {
+        if (!prefetch || answer === 'unknown') return null;
+        const node = prefetch.nodes[prefetchNode];
+        const child = answer === 'yes' ? node[1] : node[2];
+        return child >= 0 ? child : null;
+    }
+
+    function isFinalNode(index) {
+        const node = prefetch.nodes[index];
+        return node[1] === NO_NODE && node[2] === NO_NODE;
+    }
+
+    function advanceLocally(answer, next) {
+        const question = prefetch.texts[prefetch.nodes[prefetchNode][0]];
+        pendingAnswers.push(answer);
+        prefetchNode = next;
+
+        const node = prefetch.nodes[next];
+        questionText.textContent = prefetch.texts[node[0]];
+        appendAnswerItem(question, answer);
+
+        // Прогресс по предвычисленным оценкам узла
+        const answered = baseCount + inFlightAnswers.length + pendingAnswers.length;
+        const expected = node[5];
+        updateProgress({
+            questions_answered: answered,
+            remaining_questions: { min: node[3], max: node[4], expected: expected },
+            percent_complete: Math.round(1000 * answered / (answered + expected || 1)) / 10
+        });
+    }
+
+    function scheduleSync() {
+        clearTimeout(syncTimer);
+        syncTimer = setTimeout(() => flushAnswers(false), SYNC_DELAY_MS);
+    }
+
+    function setAnswerButtonsBusy(busy) {
         document.querySelectorAll('.btn-answer').forEach(btn => {
-            btn.disabled = true;
-            btn.style.opacity = '0.6';
+            btn.disabled = busy;
+            btn.style.opacity = busy ? '0.6' : '1';
         });
+    }
 
-        try {
-            const response = await fetch('/api/consultation/save-answer', {
-                method: 'POST',
-                headers: {
-                    'Content-Type': 'application/json',
-                },
-                body: JSON.stringify({
-                    consultation_id: parseInt(consultationId),
-                    answer: answer
-                })
-            });
+    async function flushAnswers(blocking) {
+        clearTimeout(syncTimer);
+        // Запросы синхронизации идут строго по одному
+        while (syncPromise) await syncPromise;
+        if (pendingAnswers.length === 0) return;
 
-            const result = await response.json();
-            console.log('Save answer response:', result);
+        inFlightAnswers = pendingAnswers;
+        pendingAnswers = [];
+        if (blocking) setAnswerButtonsBusy(true);
+
+        syncPromise = (async () => {
+            try {
+                const response = await fetch('/api/consultation/sync-answers', {
+                    method: 'POST',
+                    headers: {
+                        'Content-Type': 'application/json',
+                    },
+                    body: JSON.stringify({
+                        consultation_id: parseInt(consultationId),
+                        base_count: baseCount,
+                        answers: inFlightAnswers
+                    })
+                });
+
+                const result = await response.json();
+                console.log('Sync answers response:', result);
+
+                if (response.status === 409) {
+                    // Консультацию продолжили в другом окне: локальные ответы отбрасываются
+                    pendingAnswers = [];
+                    inFlightAnswers = [];
+                    applyServerState(result);
+                    alert('Консультация была изменена в другом окне. Показан актуальный вопрос.');
+                    return;
+                }
+
+                if (!result.success) {
+                    pendingAnswers = [];
+                    inFlightAnswers = [];
+                    alert('Ошибка: ' + result.message);
+                    await reloadState();
+                    return;
+                }
 
+                inFlightAnswers = [];
+                if (pendingAnswers.length === 0) {
+                    applyServerState(result);
+                } else {
+                    // Пользователь уже ушел дальше по поддереву: вопрос не трогаем
+                    baseCount = result.answer_count;
+                    updateCandidates(result.candidates);
+                }
+            } catch (error) {
+                console.error('Ошибка при сохранении ответов:', error);
+                // Ответы вернутся в очередь и уйдут при следующей синхронизации
+                pendingAnswers = inFlightAnswers.concat(pendingAnswers);
+                inFlightAnswers = [];
+                if (blocking) alert('Ошибка при сохранении ответа');
+            } finally {
+                syncPromise = null;
+                if (blocking && !diagnosisReached) setAnswerButtonsBusy(false);
+            }
+        })();
+        await syncPromise;
+    }
+
+    function applyServerState(data) {
+        if (data.answer_count !== undefined) baseCount = data.answer_count;
+        prefetch = data.prefetch || null;
+        prefetchNode = 0;
+        updateInterface(data);
+    }
+
+    async function reloadState() {
+        try {
+            const response = await fetch(`/api/consultation/${consultationId}`);
+            const result = await response.json();
             if (result.success) {
-                updateInterface(result);
-            } else {
-                console.error('Error saving answer:', result.message);
-                alert('Ошибка: ' + result.message);
+                applyServerState({
+                    next_question: result.current_question,
+                    progress: result.progress,
+                    answer_count: result.answer_count,
+                    prefetch: result.prefetch
+                });
             }
         } catch (error) {
-            console.error('Ошибка при сохранении ответа:', error);
-            alert('Ошибка при сохранении ответа');
-        } finally {
-            // Восстанавливаем кнопки
-            document.querySelectorAll('.btn-answer').forEach(btn => {
-                btn.disabled = false;
-                btn.style.opacity = '1';
-            });
+            console.error('Ошибка при загрузке состояния консультации:', error);
         }
-        console.log('=== SAVE ANSWER COMPLETE ===');
     }
 
+    // Неотправленные ответы уходят и при закрытии страницы
+    window.addEventListener('pagehide', function () {
+        const answers = inFlightAnswers.concat(pendingAnswers);
+        if (answers.length === 0 || inFlightAnswers.length > 0) return;
+        fetch('/api/consultation/sync-answers', {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json',
+            },
+            body: JSON.stringify({
+                consultation_id: parseInt(consultationId),
+                base_count: baseCount,
+                answers: answers
+            }),
+            keepalive: true
+        }).catch(error => console.error('Ошибка синхронизации ответов:', error));
+    });
+
     function updateInterface(data) {
         console.log('Updating interface with data:', data);
 
@@ -159,6 +319,7 @@ document.addEventListener('DOMContentLoaded', function () {
         // Если достигли диагноза, показываем превью и блокируем кнопки
         if (data.next_question && data.next_question.is_final) {
             const diagnosis = data.diagnosis_candidate || data.next_question.text;
+            diagnosisReached = true;
 
             // Сначала показываем все элементы
             showDiagnosisPreview(diagnosis);
@@ -220,10 +381,42 @@ document.addEventListener('DOMContentLoaded', function () {
             });
         }
 
-        // Обновляем историю ответов
+        // Обновляем прогресс, оставшиеся диагнозы и историю ответов
+        updateProgress(data.progress);
+        updateCandidates(data.candidates);
         updateAnswersHistory();
     }
 
+    function updateProgress(progress) {
+        if (!progress || progress.percent_complete === undefined) return;
+
+        if (progressFill) progressFill.style.width = `${progress.percent_complete}%`;
+        if (progressAnswered) progressAnswered.textContent = `Отвечено вопросов: ${progress.questions_answered}`;
+        if (progressRemaining) {
+            const remaining = progress.remaining_questions;
+            progressRemaining.textContent = `Осталось: ${remaining.min}-${remaining.max}`;
+        }
+    }
+
+    function updateCandidates(candidates) {
+        if (!candidatesList) return;
+
+        candidatesList.innerHTML = '';
+        if (!candidates || candidates.length <= 1) return;
+
+        const title = document.createElement('div');
+        title.className = 'candidates-title';
+        title.textContent = `Возможные диагнозы (${candidates.length}):`;
+        candidatesList.appendChild(title);
+
+        candidates.slice(0, VISIBLE_CANDIDATES).forEach(candidate => {
+            const item = document.createElement('div');
+            item.className = 'candidate-item';
+            item.textContent = `${candidate.diagnosis} - ${Math.round(candidate.probability * 100)}%`;
+            candidatesList.appendChild(item);
+        });
+    }
+
     async function completeConsultationAutomatically(diagnosis) {
         console.log('Automatically completing consultation with diagnosis:', diagnosis);
 
@@ -441,8 +634,8 @@ document.addEventListener('DOMContentLoaded', function () {
             const result = await response.json();
             console.log('Answers history response:', result);
 
-            if (result.success && result.consultation.sub_graph_find_diagnosis) {
-                const answers = result.consultation.sub_graph_find_diagnosis.answers || {};
+            if (result.success && result.consultation) {
+                const answers = result.consultation.answers || [];
                 renderAnswersHistory(answers);
             }
         } catch (error) {
@@ -450,6 +643,19 @@ document.addEventListener('DOMContentLoaded', function () {
         }
     }
 
+    function appendAnswerItem(question, answer) {
+        if (!answersList) return;
+        answersList.querySelector('.empty-state')?.remove();
+
+        const answerItem = document.createElement('div');
+        answerItem.className = `answer-item answer-${answer}`;
+        answerItem.innerHTML = `
+            <span class="answer-icon">${ANSWER_ICONS[answer] || '❌'}</span>
+            <span class="answer-text">${question} - ${ANSWER_LABELS[answer] || 'Нет'}</span>
+        `;
+        answersList.appendChild(answerItem);
+    }
+
     function renderAnswersHistory(answers) {
         console.log('Rendering answers history:', answers);
         if (!answersList) return;
@@ -465,15 +671,7 @@ document.addEventListener('DOMContentLoaded', function () {
             return;
         }
 
-        Object.entries(answers).forEach(([key, qa]) => {
-            const answerItem = document.createElement('div');
-            answerItem.className = `answer-item answer-${qa.answer}`;
-            answerItem.innerHTML = `
-                <span class="answer-icon">${qa.answer === 'yes' ? '✅' : '❌'}</span>
-                <span class="answer-text">${qa.question} - ${qa.answer === 'yes' ? 'Да' : 'Нет'}</span>
-            `;
-            answersList.appendChild(answerItem);
-        });
+        Object.values(answers).forEach(qa => appendAnswerItem(qa.question, qa.answer));
     }
 
     async function completeConsultation() {
@@ -601,6 +799,9 @@ document.addEventListener('DOMContentLoaded', function () {
             if (!consultationId) return;
 
             try {
+                // Сначала отправляем ответы, пройденные по предзагруженному поддереву
+                await window.consultationSync?.flush();
+
                 const response = await fetch('/api/consultation/save-draft', {
                     method: 'POST',
                     headers: {